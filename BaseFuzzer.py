@@ -1,21 +1,59 @@
 import os
+import random
 import signal
 import sys
 import time
 import threading
 from abc import ABC, abstractmethod
+from multiprocessing import get_context
+from multiprocessing.connection import wait
 
 import networkx as nx
+from Feedback import Instrumentation
 from Feedback.FeedbackTools import FeedbackTools
+from Feedback.SharedCoverageMap import SharedCoverageMap
+from Mutator.CompactMutator import CompactMutator
 from Mutator.ExtendedMutator import ExtendedMutator
+from Mutator.OperatorScheduler import OperatorScheduler
+from Scheduler.RandomDiskScheduler import RandomDiskScheduler
 from Scheduler.RandomMemScheduler import RandomMemScheduler
-from Utils.FileUtils import save_exception_graphs, update_coveragerc
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from Scheduler.TieredScheduler import TieredScheduler
+from Utils.FileUtils import remove_stale_temporary_files, save_exception_graphs, save_slot_map, update_coveragerc
+from Feedback.Execution import Execution
+from Utils.CompactGraph import CompactGraph
+from Utils.ConversionCache import graph_version
+from Utils.ForkServer import ForkServer
+from Utils.GraphOverlay import overlay_graph
 
 
 class BaseFuzzer(ABC):
+    # What each feedback check type collects while the executor runs; "none" never runs the executor
+    coverage_kinds = {"regular": None, "coverage": "lines", "combination": "lines",
+                      "branch": "branches", "hitcount": "hitcounts", "tiered": None}
+
+    # Fraction of the mutants the tiered check traces although no cheap signal flagged them
+    tiered_sample_rate = 0.02
+
+    # Size of the candidate queue of the asynchronous coverage process; 0 measures coverage in the loop
+    async_coverage_queue = 0
+
+    # Keep the corpus as CompactGraph and mutate those; networkx graphs are only built to execute a mutant
+    compact_graphs = False
+    # Keep the corpus as copy-on-write networkx graphs that mutants share with their parent (see GraphOverlay)
+    overlay_graphs = False
+
+    # Number of mutants drawn at once with stacked_mutate_batch; 1 mutates the graph once per iteration
+    mutation_batch = 1
+
+    # Weight the operators and the stack depth of stacked_mutate by their yield per second (see OperatorScheduler)
+    adaptive_operators = False
+
+    # MutationProfile of the invariants the target needs; fuzzers declare theirs, None mutates freely
+    mutation_profile = None
+
     def __init__(self, num_iterations=60, use_multiple_graphs=False,
-                 feedback_check_type="regular", scheduler=None, timeout_duration=20):
+                 feedback_check_type="regular", scheduler=None, timeout_duration=20, coverage_backend="coverage",
+                 memory_limit_mb=None, rss_limit_mb=2048, workers=1):
         self.corpus_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Corpus_Data')
         self.corpus_path = os.path.join(self.corpus_dir, f'{self.get_corpus_name()}.pkl')
         if not os.path.exists(self.corpus_dir):
@@ -25,73 +63,254 @@ class BaseFuzzer(ABC):
         self.feedback_check_type = feedback_check_type
         update_coveragerc()
         self.start_time = time.time()
-        self.feedback_tool = FeedbackTools(start_time=self.start_time)
+        self.feedback_tool = FeedbackTools(start_time=self.start_time, coverage_backend=coverage_backend)
         self.total_bug_counts = {}
+        self.first_occurrence_times = {}
         self.num_graphs = 0
         self.count = 0
         self.scheduler = scheduler or RandomMemScheduler(start_time=self.start_time)
         self.timeout_duration = timeout_duration
         self.stop_fuzzing = threading.Event()  # Use a threading event to handle stopping the fuzzing process
+        self.current_execution = None  # Execution of the mutant being tested, shared with the tester
+        self.memory_limit_mb = memory_limit_mb  # Address space limit of the sandbox workers
+        self.rss_limit_mb = rss_limit_mb  # Sandbox workers are recycled once their RSS goes past this
+        self.sandbox = None  # Fork server running process_test_results, started by run()
+        self.workers = workers  # Number of worker processes; 1 fuzzes in this process
+        self.traced_count = 0  # Mutants the tiered check sent to the traced run
+        self.operator_scheduler = None  # Set by new_mutator with adaptive_operators
+        self.worker_operator_weights = {}  # Worker connection -> last operator weights it reported
+        self.worker_coverage = None  # SharedCoverageMap the coordinator publishes to for its workers, if it made one
+        self.compact_fallbacks = 0  # Corpus graphs kept as networkx graphs because a CompactGraph cannot hold them
 
     def _timeout_handler(self, signum, frame):
         raise TimeoutError("Test execution exceeded the time limit")
 
+    def record_timeout(self, mutated_graph, timestamp):
+        exception_message = f"Timeout Error: Exceeded {self.timeout_duration} seconds."
+        if exception_message not in self.feedback_tool.other_exceptions:
+            self.feedback_tool.other_exceptions.add(exception_message)
+            self.feedback_tool.exception_graphs[mutated_graph] = exception_message
+        print(f"Timeout occurred while processing graph at {timestamp} seconds.")
+
+    def execute(self, graph):
+        """Run the executor once on the graph under the collector of the active feedback check.
+
+        Returns the Execution, or None when the feedback check does not use the
+        executor. In the main thread the run is bounded by timeout_duration and a
+        TimeoutError is raised when it is exceeded.
+        """
+        if self.feedback_check_type not in self.coverage_kinds:
+            return None
+        if self.uses_async_coverage():
+            return self.run_executor(graph, None)  # Line coverage is measured by the side process
+        return self.run_executor(graph, self.coverage_kinds[self.feedback_check_type])
+
+    def uses_async_coverage(self):
+        return self.feedback_tool.async_process is not None and self.feedback_check_type in ("coverage", "combination")
+
+    def run_executor(self, graph, coverage_kind):
+        if threading.current_thread() is not threading.main_thread():
+            # Signals can only be handled by the main thread
+            return self.feedback_tool.execute(graph, self.executor, coverage_kind)
+
+        previous_handler = signal.signal(signal.SIGALRM, self._timeout_handler)
+        signal.setitimer(signal.ITIMER_REAL, self.timeout_duration)
+        try:
+            return self.feedback_tool.execute(graph, self.executor, coverage_kind)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    def executor_result(self, graph):
+        """Return what the executor computed for the graph being tested, or None if it is not available."""
+        execution = self.current_execution
+        if execution is None or execution.graph is not graph or execution.exception is not None:
+            return None
+        return execution.result
+
+    def start_sandbox(self, tester):
+        """Fork the server that runs process_test_results, once the tester is set up."""
+        def handler(job):
+            return self.process_test_results_in_worker(tester, *job)
+
+        self.sandbox = ForkServer(handler, timeout=self.timeout_duration, batch_size=self.num_iterations,
+                                  memory_limit_mb=self.memory_limit_mb, rss_limit_mb=self.rss_limit_mb)
+        self.sandbox.start()
+
+    def stop_sandbox(self):
+        sandbox, self.sandbox = self.sandbox, None
+        if sandbox is not None:
+            print(f"Sandbox workers started: {sandbox.workers_started}, killed on timeout: {sandbox.workers_killed}")
+            sandbox.close()
+
+    def process_test_results_in_worker(self, tester, mutated_graph, executor_result, first_occurrence_times, timestamp):
+        """Run process_test_results inside a sandbox worker and return what it added to the bug statistics."""
+        execution = Execution(mutated_graph)
+        execution.result = executor_result
+        self.current_execution = execution
+        known_messages = set(first_occurrence_times)
+        total_bug_counts = {}  # Starts empty so that it only holds this graph's counts
+        self.process_test_results(mutated_graph, tester, first_occurrence_times, total_bug_counts, timestamp)
+        new_occurrences = {msg: occurrence for msg, occurrence in first_occurrence_times.items()
+                           if msg not in known_messages}
+        return new_occurrences, total_bug_counts
+
+    def prepare_test_graph(self, graph):
+        """Make in place the changes the tester makes to a graph, before it gets a copy of it in the sandbox.
+
+        What the tester fills in (default weights, ...) would otherwise be
+        lost with the sandbox's copy, and the graph kept and saved here would
+        not be the one the tester compared. A fuzzer that changes the graph
+        bumps its version, so that a compact mutant is rebuilt from the graph
+        tested (see tested_mutant).
+        """
+        pass
+
+    def tested_mutant(self, mutant, mutated_graph):
+        """Return the mutant to keep, with the changes prepare_test_graph made to its networkx graph."""
+        if mutated_graph is not mutant and graph_version(mutated_graph) != graph_version(mutant):
+            return self.corpus_graph(mutated_graph)
+        return mutant
+
     def process_test_results_with_timeout(self, mutated_graph, tester, first_occurrence_times, total_bug_counts, timestamp):
-        """Wrapper method to add a timeout around process_test_results using ThreadPoolExecutor."""
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(self.process_test_results, mutated_graph, tester, first_occurrence_times, total_bug_counts, timestamp)
-            
-            try:
-                # Wait for the process to complete or raise a timeout
-                future.result(timeout=self.timeout_duration)
-                return True  # Success, no timeout
-            except FutureTimeoutError:  # Catch TimeoutError from futures
-                exception_message = f"Timeout Error: Exceeded {self.timeout_duration} seconds."
-                if exception_message not in self.feedback_tool.other_exceptions:
-                    self.feedback_tool.other_exceptions.add(exception_message)
-                    self.feedback_tool.exception_graphs[mutated_graph] = exception_message
-                print(f"Timeout occurred while processing graph at {timestamp} seconds.")
-                return False  # Timeout occurred
-            except Exception as e:
-                # Handle other exceptions from the process
-                exception_message = f"Error: {str(e)}"
-                if exception_message not in self.feedback_tool.other_exceptions:
-                    self.feedback_tool.other_exceptions.add(exception_message)
-                    self.feedback_tool.exception_graphs[mutated_graph] = exception_message
-                print(f"Error occurred while processing graph at {timestamp} seconds.")
-                return False  # Some other error occurred
-
-
-    def regular_feedback_check(self, mutated_graph):
-        return self.feedback_tool.is_new_and_interesting(mutated_graph, self.executor, self.interesting_check)
-
-    def coverage_feedback_check(self, mutated_graph):
-        return self.feedback_tool.is_new_and_interesting_coverage_updated(mutated_graph, self.executor)
-
-    def combination_feedback_check(self, mutated_graph):
-        if self.feedback_tool.is_new_and_interesting(mutated_graph, self.executor, self.interesting_check):
+        """Run process_test_results in a sandbox worker that is killed when it exceeds timeout_duration."""
+        if self.sandbox is None:
+            self.start_sandbox(tester)
+        self.prepare_test_graph(mutated_graph)
+        job = (mutated_graph, self.executor_result(mutated_graph), first_occurrence_times, timestamp)
+        status, value = self.sandbox.run(job)
+        if status == "ok":
+            new_occurrences, bug_counts = value
+            first_occurrence_times.update(new_occurrences)
+            for msg, count in bug_counts.items():
+                total_bug_counts[msg] = total_bug_counts.get(msg, 0) + count
+            return True  # Success, no timeout
+        if status == "timeout":
+            self.record_timeout(mutated_graph, timestamp)
+            return False  # Timeout occurred, the worker was killed
+        if status == "crash":
+            exception_message = "Crash: sandbox worker died."
+        else:
+            # Handle other exceptions from the process
+            exception_message = f"Error: {value}"
+        if exception_message not in self.feedback_tool.other_exceptions:
+            self.feedback_tool.other_exceptions.add(exception_message)
+            self.feedback_tool.exception_graphs[mutated_graph] = exception_message
+        print(f"Error occurred while processing graph at {timestamp} seconds.")
+        return False  # Some other error occurred
+
+    def regular_feedback_check(self, execution):
+        return self.feedback_tool.is_new_result(execution, self.interesting_check)
+
+    def coverage_feedback_check(self, execution):
+        if self.uses_async_coverage():
+            # Admission is decided later by the side process, see admit_async_coverage
+            self.feedback_tool.submit_async_coverage(execution.graph)
+            return False
+        return self.feedback_tool.is_new_lines(execution)
+
+    def combination_feedback_check(self, execution):
+        if self.uses_async_coverage():
+            if self.feedback_tool.is_new_result(execution, self.interesting_check):
+                return True
+            self.feedback_tool.submit_async_coverage(execution.graph)
+            return False
+        # Both checks read the same execution, which was collected with line coverage
+        if self.feedback_tool.is_new_result(execution, self.interesting_check):
             return True
-        elif self.feedback_tool.is_new_and_interesting_coverage_updated(mutated_graph, self.executor):
+        elif self.feedback_tool.is_new_lines(execution):
             return True
         return False
 
-    def no_feedback_check(self, mutated_graph):
+    def no_feedback_check(self, execution):
         return False  # Always return False to indicate no feedback check is needed
 
-    def branch_coverage_feedback_check(self, mutated_graph):
-        return self.feedback_tool.is_new_branch_triggered(mutated_graph, self.executor)
-
-    def perform_feedback_checks(self, mutated_graph):
+    def branch_coverage_feedback_check(self, execution):
+        return self.feedback_tool.is_new_branches(execution)
+
+    def hitcount_feedback_check(self, execution):
+        return self.feedback_tool.is_new_hitcounts(execution)
+
+    def structural_features(self, G):
+        """Coarse shape of a graph, cheap to compute and stable under most single mutations."""
+        weights = [weight for _, _, weight in G.edges(data='weight')]
+        return (G.is_directed(), G.is_multigraph(),
+                G.number_of_nodes().bit_length(), G.number_of_edges().bit_length(),
+                nx.number_of_selfloops(G) > 0,
+                any(weight is None for weight in weights),
+                any(weight is not None and weight < 0 for weight in weights),
+                any(weight != weight for weight in weights))  # NaN weights
+
+    def result_signature(self, execution):
+        """Coarse shape of the executor's result (or of the exception it raised)."""
+        if execution.exception is not None:
+            return "exception", type(execution.exception).__name__
+        result = execution.result
+        if isinstance(result, dict):
+            return "dict", len(result).bit_length()
+        elif isinstance(result, (list, set, tuple)):
+            if all(isinstance(x, (set, frozenset)) for x in result):
+                # Component-like results: how many parts and which part sizes occur
+                return "parts", len(result).bit_length(), tuple(sorted({len(x).bit_length() for x in result}))
+            return "sequence", len(result).bit_length()
+        elif isinstance(result, nx.Graph):
+            return "graph", result.number_of_nodes().bit_length(), result.number_of_edges().bit_length()
+        elif isinstance(result, (int, float)):
+            if result != result or result in (float('inf'), float('-inf')):
+                return "number", str(result)
+            return "number", result < 0, int(abs(result)).bit_length()
+        return type(result).__name__,
+
+    def is_promising(self, execution):
+        """Tell whether cheap signals flag an untraced execution as worth tracing."""
+        feedback_tool = self.feedback_tool
+        # New output or exception (nothing is recorded here, the traced check does it)
+        promising = feedback_tool.novelty(execution, self.interesting_check) is not None
+        if feedback_tool.is_new_signature(("structure", self.structural_features(execution.graph))):
+            promising = True
+        if feedback_tool.is_new_signature(("result", self.result_signature(execution))):
+            promising = True
+        # A small random sample keeps the coverage state honest for mutants the cheap signals miss
+        return promising or random.random() < self.tiered_sample_rate
+
+    def tiered_execution(self, execution):
+        """Return a traced run of the mutant if it is promising, otherwise the untraced execution."""
+        if not self.is_promising(execution):
+            return execution
+        try:
+            traced = self.run_executor(execution.graph, "lines")
+        except TimeoutError:
+            self.record_timeout(execution.graph, time.time() - self.start_time)
+            return execution
+        self.traced_count += 1
+        return traced
+
+    def tiered_feedback_check(self, execution):
+        traced = self.tiered_execution(execution)
+        if traced.coverage_kind == "lines":
+            interesting = self.combination_feedback_check(traced)
+            execution.new_coverage = traced.new_coverage
+            return interesting
+        return self.regular_feedback_check(traced)
+
+    def perform_feedback_checks(self, mutated_graph, execution=None):
+        """Run the active feedback check on the execution of the graph, executing it first if needed."""
+        if execution is None and self.feedback_check_type in self.coverage_kinds:
+            execution = self.execute(mutated_graph)
         if self.feedback_check_type == "regular":
-            return self.regular_feedback_check(mutated_graph)
+            return self.regular_feedback_check(execution)
         elif self.feedback_check_type == "coverage":
-            return self.coverage_feedback_check(mutated_graph)
+            return self.coverage_feedback_check(execution)
         elif self.feedback_check_type == "combination":
-            return self.combination_feedback_check(mutated_graph)
+            return self.combination_feedback_check(execution)
         elif self.feedback_check_type == "none":
-            return self.no_feedback_check(mutated_graph)
+            return self.no_feedback_check(execution)
         elif self.feedback_check_type == "branch":
-            return self.branch_coverage_feedback_check(mutated_graph)
+            return self.branch_coverage_feedback_check(execution)
+        elif self.feedback_check_type == "hitcount":
+            return self.hitcount_feedback_check(execution)
+        elif self.feedback_check_type == "tiered":
+            return self.tiered_feedback_check(execution)
         else:
             raise ValueError(f"Unknown feedback check type: {self.feedback_check_type}")
 
@@ -155,12 +374,39 @@ class BaseFuzzer(ABC):
 
     def finalize_process(self):
         print('Finalizing process...')
+        self.stop_sandbox()
+        self.scheduler.close_current_file()  # Commits what a disk scheduler has not written out yet
+        self.feedback_tool.stop_async_coverage()
+        if self.worker_coverage is not None:
+            self.feedback_tool.shared_coverage = None
+            self.worker_coverage.close()
+            self.worker_coverage = None
         print(f'count {self.count}')
+        if self.feedback_check_type == "tiered":
+            print(f'traced {self.traced_count}')
         print(f"There were {self.num_graphs} graphs saved in the corpus.")
         print(f'Time spent: {round((time.time() - self.start_time) / 60, 3)} minutes.')
         print(f'Exception: {self.feedback_tool.exception_graphs}')
+        if isinstance(self.scheduler, RandomDiskScheduler):
+            print(f"Corpus cache: {self.scheduler.cache_hits} hits, {self.scheduler.cache_misses} misses, "
+                  f"{len(self.scheduler.cache)} graphs cached.")
+            if self.scheduler.seed_query:
+                print(f"Seed query: {self.scheduler.query_misses} picks matched no graph.")
+        if isinstance(self.scheduler, TieredScheduler):
+            print(f"Corpus tiers: {len(self.scheduler.hot)} graphs in memory, {self.scheduler.spills} spills, "
+                  f"{self.scheduler.promotions} promotions, {self.scheduler.hot_hits} hits in memory.")
         if self.feedback_tool.exception_graphs:
             save_exception_graphs(self.feedback_tool.exception_graphs, self.get_corpus_name())
+        if Instrumentation.is_installed():
+            save_slot_map(Instrumentation.slot_locations, self.get_corpus_name(), Instrumentation.MAP_SIZE)
+        if self.operator_scheduler is not None:
+            print("Operator weights:")
+            for line in self.operator_scheduler.summary():
+                print(f"  {line}")
+        for number, lines in enumerate(self.worker_operator_weights.values(), 1):
+            print(f"Operator weights of worker {number}:")
+            for line in lines:
+                print(f"  {line}")
         print("Total Bugs Found:")
         for category, total in self.total_bug_counts.items():
             print(f"{category}: {total}")
@@ -172,49 +418,320 @@ class BaseFuzzer(ABC):
         else:
             return self.create_single_graph()
 
-    def run(self):
+    def prepare_corpus(self):
+        """Load the initial graphs into the scheduler and run the feedback check on them."""
         generated_graphs = self.create_initial_graphs()
+        if not isinstance(generated_graphs, list):
+            generated_graphs = [generated_graphs]  # create_single_graph returns the graph itself
         print(f"Loaded {len(generated_graphs)} valid graphs.")
+        if self.mutation_profile is not None:
+            print(f"Conforming the initial graphs to {self.mutation_profile}.")
+            generated_graphs = [self.mutation_profile.conform(graph) for graph in generated_graphs]
+        self.scheduler.add_to_corpus([self.corpus_graph(graph) for graph in generated_graphs])
+
+        # Perform feedback check once at the beginning on the initial graphs
+        print("Performing initial feedback checks...")
+        for graph in generated_graphs:
+            self.num_graphs += 1
+            try:
+                if self.perform_feedback_checks(graph):
+                    print(f"Initial feedback check passed for graph {self.num_graphs}.")
+            except TimeoutError:
+                self.record_timeout(graph, time.time() - self.start_time)
+        return generated_graphs
+
+    def run(self):
+        remove_stale_temporary_files()
+        if self.workers > 1:
+            return self.run_workers()
 
-        feedback_tool = self.feedback_tool
         scheduler = self.scheduler
-        scheduler.add_to_corpus(generated_graphs)
-        mutator = ExtendedMutator(scheduler)
+        mutator = self.new_mutator(scheduler)
         tester = self.get_tester()
+        # Fork the sandbox before any coverage collector is started
+        self.start_sandbox(tester)
 
         total_bug_counts = self.total_bug_counts
-        first_occurrence_times = {}
+        first_occurrence_times = self.first_occurrence_times
 
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
 
-        # Perform feedback check once at the beginning on the initial graphs
-        print("Performing initial feedback checks...")
-        for graph in generated_graphs:
-            self.num_graphs += 1
-            if self.perform_feedback_checks(graph):
-                print(f"Initial feedback check passed for graph {self.num_graphs}.")
+        self.prepare_corpus()
+        if self.async_coverage_queue and self.feedback_check_type in ("coverage", "combination"):
+            self.feedback_tool.start_async_coverage(self.executor, self.async_coverage_queue, self.timeout_duration)
 
+        pending = []
         while not self.stop_fuzzing.is_set():  # Use the event to check whether to continue
-            graph = scheduler.get_graph()
+            parent, graph = self.pick_graph()
+            self.drop_batch(pending)  # The rest of the batch mutated the previous graph
 
             for i in range(self.num_iterations):
                 if self.stop_fuzzing.is_set():  # Check if we need to stop mid-iteration
                     break
+                self.admit_async_coverage()
 
-                mutated_graph = mutator.stacked_mutate(graph.copy())
+                started = time.perf_counter()
+                mutant = self.next_mutant(mutator, graph, pending)
+                mutated_graph = self.materialize(mutant)
                 self.count += 1
 
                 timestamp = time.time() - self.start_time
+                # Run the implementation under test once; the tester and the feedback check share this run
+                try:
+                    execution = self.execute(mutated_graph)
+                except TimeoutError:
+                    self.record_timeout(mutated_graph, timestamp)
+                    self.record_operators(started, False)
+                    continue
+                self.current_execution = execution
+
+                known_messages = len(first_occurrence_times)
                 # Call the timeout-wrapped version of process_test_results
                 result_success = self.process_test_results_with_timeout(mutated_graph, tester, first_occurrence_times, total_bug_counts, timestamp)
 
                 # Only perform the feedback check if the process was successful (no timeout or error)
+                found = False
                 if result_success:
-                    if self.perform_feedback_checks(mutated_graph):
+                    if self.perform_feedback_checks(mutated_graph, execution):
                         self.num_graphs += 1
-                        scheduler.add_to_corpus(mutated_graph)
-                        graph = mutated_graph
+                        mutant = self.tested_mutant(mutant, mutated_graph)
+                        parent = self.add_to_corpus(mutant, execution, parent)
+                        graph = mutant
+                        self.drop_batch(pending)  # The rest of the batch mutated the previous graph
+                        found = True
+                self.record_operators(started, found or len(first_occurrence_times) > known_messages)
 
         print("Fuzzing stopped. Good bye!")
         self.finalize_process()
+
+    def pick_graph(self):
+        """Return (number, graph) of the graph to mutate; the number is None unless the corpus is indexed."""
+        if isinstance(self.scheduler, RandomDiskScheduler):
+            return self.scheduler.pick_seed()
+        return None, self.scheduler.get_graph()
+
+    def add_to_corpus(self, mutant, execution, parent):
+        """Add a mutant to the corpus and return its number, with its metadata if the corpus is indexed."""
+        if not isinstance(self.scheduler, RandomDiskScheduler):
+            self.scheduler.add_to_corpus(mutant)
+            return None
+        if execution is None:
+            return self.scheduler.add_to_corpus(mutant, parent=parent)
+        return self.scheduler.add_to_corpus(mutant, execution.duration, execution.new_coverage, parent)
+
+    def admit_async_coverage(self):
+        """Add to the corpus the mutants the asynchronous coverage process found to reach new lines."""
+        if self.feedback_tool.async_process is None:
+            return
+        for graph in self.feedback_tool.poll_async_coverage():
+            self.num_graphs += 1
+            self.scheduler.add_to_corpus(self.corpus_graph(graph))
+
+    def new_mutator(self, corpus):
+        mutator = CompactMutator(corpus) if self.compact_graphs else ExtendedMutator(corpus)
+        if self.adaptive_operators:
+            self.operator_scheduler = mutator.operator_scheduler = OperatorScheduler()
+        if self.mutation_profile is not None:
+            if self.compact_graphs:
+                print(f"{self.mutation_profile} is not kept with compact graphs.")
+            else:
+                mutator.profile = self.mutation_profile
+        return mutator
+
+    def record_operators(self, started, found):
+        """Credit the operators of the last mutant with the time since `started` and whether it found something."""
+        if self.operator_scheduler is not None:
+            self.operator_scheduler.record(time.perf_counter() - started, found)
+
+    def drop_batch(self, pending):
+        """Discard the mutants left in pending, with the operator stacks waiting to be credited for them."""
+        pending.clear()
+        if self.operator_scheduler is not None:
+            self.operator_scheduler.drop_pending()
+
+    def next_mutant(self, mutator, graph, pending):
+        """Return the next mutant of graph, taking it from pending and refilling it a batch at a time."""
+        if self.mutation_batch <= 1:
+            return mutator.stacked_mutate(mutator.copy(graph))
+        if not pending:
+            pending.extend(reversed(mutator.stacked_mutate_batch(graph, self.mutation_batch)))
+        return pending.pop()
+
+    def corpus_graph(self, graph):
+        """Return a networkx graph in the form the corpus keeps it."""
+        if self.compact_graphs:
+            try:
+                return CompactGraph.from_networkx(graph)
+            except (ValueError, TypeError) as e:
+                # Attributes or node ids a CompactGraph cannot hold: keep the networkx graph
+                self.compact_fallbacks += 1
+                if self.compact_fallbacks == 1:
+                    print(f"Keeping corpus graphs a CompactGraph cannot hold as networkx graphs ({e}).")
+                return graph
+        if self.overlay_graphs:
+            # Mutants then share the dicts of their parent copy-on-write instead of copying them
+            return overlay_graph(graph)
+        return graph
+
+    def materialize(self, mutant):
+        """Return the networkx graph of a mutant to execute and test it."""
+        return mutant.to_networkx() if isinstance(mutant, CompactGraph) else mutant
+
+    def checks_results(self):
+        # Whether the active feedback check looks at the executor's result, not only at coverage
+        return self.feedback_check_type in ("regular", "combination", "tiered")
+
+    def start_worker(self, context, initial_graphs):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=self.worker_main, args=(child_conn, initial_graphs), daemon=True)
+        process.start()
+        child_conn.close()
+        return parent_conn, process
+
+    def run_workers(self):
+        """Fuzz with worker processes sharing this process's corpus and coverage state.
+
+        This process is the coordinator: it owns the scheduler and the global
+        feedback state and hands each idle worker a corpus graph. A worker
+        mutates, tests and measures num_iterations mutants of that graph and
+        returns only the mutants that were new to its local state, each with the
+        novelty delta that made it new. The coordinator merges the deltas,
+        adds the mutants that are still new globally to the corpus, and sends
+        the accepted deltas to every worker with its next graph so that the
+        local states stay close to the global one.
+        """
+        initial_graphs = self.prepare_corpus()
+        if self.feedback_tool.shared_coverage is None:
+            # Workers look up what the coordinator accepted here, so they do not report it again
+            self.feedback_tool.shared_coverage = self.worker_coverage = SharedCoverageMap()
+        # Workers are forked after the initial checks so they start from the same state
+        context = get_context("fork")
+        workers = {}
+        for _ in range(self.workers):
+            conn, process = self.start_worker(context, initial_graphs)
+            workers[conn] = process
+        print(f"Started {self.workers} workers.")
+
+        signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+
+        accepted = []  # (graph, delta) accepted by the coordinator, in order
+        cursors = {}  # worker connection -> number of accepted deltas it has been sent
+
+        def dispatch(conn):
+            start = cursors[conn]
+            cursors[conn] = len(accepted)
+            conn.send((self.scheduler.get_graph(), accepted[start:]))
+
+        for conn in workers:
+            cursors[conn] = 0
+            dispatch(conn)
+
+        while not self.stop_fuzzing.is_set():
+            for conn in wait(list(workers)):
+                try:
+                    findings, count, traced, exceptions, first_occurrences, bug_counts, operator_weights = conn.recv()
+                except EOFError:
+                    # The worker died; replace it with one forked from the current state
+                    print("A worker exited unexpectedly, starting a new one.")
+                    workers.pop(conn).join()
+                    del cursors[conn]
+                    conn, process = self.start_worker(context, initial_graphs)
+                    workers[conn] = process
+                    cursors[conn] = len(accepted)
+                    dispatch(conn)
+                    continue
+
+                self.count += count
+                self.traced_count += traced
+                if operator_weights is not None:
+                    self.worker_operator_weights[conn] = operator_weights
+                for graph, exception_message in exceptions:
+                    self.feedback_tool.record_exception_message(graph, exception_message)
+                for msg, occurrence in first_occurrences.items():
+                    self.first_occurrence_times.setdefault(msg, occurrence)
+                for msg, bug_count in bug_counts.items():
+                    self.total_bug_counts[msg] = self.total_bug_counts.get(msg, 0) + bug_count
+                for graph, delta in findings:
+                    if self.feedback_tool.merge_novelty(graph, delta, count_exceptions=self.checks_results()):
+                        self.num_graphs += 1
+                        self.scheduler.add_to_corpus(self.corpus_graph(graph))
+                        accepted.append((graph, delta))
+                dispatch(conn)
+
+        print("Fuzzing stopped. Good bye!")
+        self.finalize_process()
+
+    def worker_main(self, conn, initial_graphs):
+        # Only the coordinator reacts to Ctrl+C; a worker exits when its connection is closed
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        random.seed()  # Do not repeat the mutations of the other workers
+        # Only the coordinator publishes to the shared coverage; workers skip what it already holds
+        self.feedback_tool.publish_coverage = False
+        # Graphs to combine with come from a local pool, the coordinator's scheduler may live on disk
+        pool = RandomMemScheduler(start_time=self.start_time)
+        pool.add_to_corpus([self.corpus_graph(graph) for graph in initial_graphs])
+        mutator = self.new_mutator(pool)
+        tester = self.get_tester()
+        self.start_sandbox(tester)
+        first_occurrence_times = {}
+        try:
+            while True:
+                try:
+                    graph, accepted = conn.recv()
+                except EOFError:
+                    break
+                for accepted_graph, delta in accepted:
+                    self.feedback_tool.merge_novelty(accepted_graph, delta, verbose=False)
+                    pool.add_to_corpus(self.corpus_graph(accepted_graph))
+                conn.send(self.fuzz_batch(graph, mutator, tester, first_occurrence_times))
+        finally:
+            self.stop_sandbox()
+
+    def fuzz_batch(self, graph, mutator, tester, first_occurrence_times):
+        """Fuzz num_iterations mutants of a graph in a worker and return what the coordinator needs."""
+        feedback_tool = self.feedback_tool
+        check_func = self.interesting_check if self.checks_results() else None
+        known_messages = set(first_occurrence_times)
+        known_exceptions = len(feedback_tool.exception_graphs)
+        known_traced = self.traced_count
+        total_bug_counts = {}
+        findings = []
+        pending = []
+        self.drop_batch(pending)  # Mutants of the previous batch that were never run
+        for i in range(self.num_iterations):
+            started = time.perf_counter()
+            mutant = self.next_mutant(mutator, graph, pending)
+            mutated_graph = self.materialize(mutant)
+
+            timestamp = time.time() - self.start_time
+            try:
+                execution = self.execute(mutated_graph)
+            except TimeoutError:
+                self.record_timeout(mutated_graph, timestamp)
+                self.record_operators(started, False)
+                continue
+            self.current_execution = execution
+
+            messages = len(first_occurrence_times)
+            found = False
+            if self.process_test_results_with_timeout(mutated_graph, tester, first_occurrence_times, total_bug_counts, timestamp):
+                if self.feedback_check_type == "tiered":
+                    execution = self.tiered_execution(execution)
+                delta = feedback_tool.novelty(execution, check_func) if execution is not None else None
+                if delta and feedback_tool.merge_novelty(mutated_graph, delta, count_exceptions=check_func is not None,
+                                                         verbose=False):
+                    findings.append((mutated_graph, delta))
+                    graph = self.tested_mutant(mutant, mutated_graph)
+                    self.drop_batch(pending)
+                    found = True
+            self.record_operators(started, found or len(first_occurrence_times) > messages)
+
+        exceptions = list(feedback_tool.exception_graphs.items())[known_exceptions:]
+        first_occurrences = {msg: occurrence for msg, occurrence in first_occurrence_times.items()
+                             if msg not in known_messages}
+        operator_weights = self.operator_scheduler.summary() if self.operator_scheduler is not None else None
+        return (findings, self.num_iterations, self.traced_count - known_traced, exceptions, first_occurrences,
+                total_bug_counts, operator_weights)
@@ -0,0 +1,52 @@
+import os
+
+import coverage
+import networkx as nx
+
+
+class CoverageCollector:
+    """Long-lived coverage collector that keeps its data in memory.
+
+    One collector is created per fuzzer process and reused for every execution.
+    The data is never written to disk; each call to collect_lines or
+    collect_branches hands back what was hit since the previous collection.
+    """
+
+    def __init__(self, branch=False, source_dir=None):
+        self.branch = branch
+        self.source_dir = source_dir or os.path.dirname(os.path.abspath(nx.__file__))
+        # data_file=None keeps the data in memory, and matching on the package
+        # directory (instead of source=networkx) skips the search for unexecuted
+        # files that coverage otherwise repeats on every flush.
+        self.cov = coverage.Coverage(data_file=None, branch=branch, config_file=False,
+                                     include=[os.path.join(self.source_dir, '*')])
+
+    def start(self):
+        self.cov.start()
+
+    def stop(self):
+        self.cov.stop()
+
+    def collect_lines(self):
+        """Return the (filename, line) pairs hit since the last collection."""
+        data = self.cov.get_data()
+        executed_lines = set()
+        for filename in data.measured_files():
+            lines = data.lines(filename)
+            if lines:
+                for line in lines:
+                    executed_lines.add((filename, line))
+        data.erase()
+        return executed_lines
+
+    def collect_branches(self):
+        """Return the (filename, arc) pairs hit since the last collection."""
+        data = self.cov.get_data()
+        executed_branches = set()
+        for filename in data.measured_files():
+            file_arcs = data.arcs(filename)
+            if file_arcs:
+                for arc in file_arcs:
+                    executed_branches.add((filename, arc))
+        data.erase()
+        return executed_branches
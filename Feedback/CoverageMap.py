@@ -0,0 +1,58 @@
+import numpy as np
+
+# AFL-style hit count buckets: 1, 2, 3, 4-7, 8-15, 16-31, 32-127, 128+ each map to one bit
+COUNT_CLASS_LOOKUP = np.zeros(256, dtype=np.uint8)
+COUNT_CLASS_LOOKUP[1] = 1
+COUNT_CLASS_LOOKUP[2] = 2
+COUNT_CLASS_LOOKUP[3] = 4
+COUNT_CLASS_LOOKUP[4:8] = 8
+COUNT_CLASS_LOOKUP[8:16] = 16
+COUNT_CLASS_LOOKUP[16:32] = 32
+COUNT_CLASS_LOOKUP[32:128] = 64
+COUNT_CLASS_LOOKUP[128:] = 128
+
+
+def classify_counts(counts):
+    """Map raw hit counts to their bucket bit."""
+    return COUNT_CLASS_LOOKUP[np.minimum(counts, 255)]
+
+
+class CoverageMap:
+    """Fixed-size virgin map of the hit count buckets seen so far.
+
+    A byte starts at 0xFF and loses the bit of every bucket observed for its
+    slot, so novelty is a vectorized AND between the classified counts of an
+    execution and the virgin map.
+    """
+
+    def __init__(self, map_size):
+        self.virgin = np.full(map_size, 0xFF, dtype=np.uint8)
+
+    def has_new_bits(self, counts):
+        """Return how many slots reached a new bucket and clear those buckets from the virgin map."""
+        trace = classify_counts(counts)
+        virgin = self.virgin[:len(trace)]
+        new_bits = trace & virgin
+        if not new_bits.any():
+            return 0
+        np.bitwise_and(virgin, ~trace, out=virgin)
+        return int(np.count_nonzero(new_bits))
+
+    def new_bits(self, counts):
+        """Return the slots that reached a new bucket and their new bits, without updating the virgin map."""
+        trace = classify_counts(counts)
+        new_bits = trace & self.virgin[:len(trace)]
+        slots = np.flatnonzero(new_bits)
+        return slots, new_bits[slots]
+
+    def clear_bits(self, slots, bits):
+        """Clear bits returned by new_bits (possibly in another process); return how many slots were still new."""
+        still_new = self.virgin[slots] & bits
+        if not still_new.any():
+            return 0
+        self.virgin[slots] &= ~bits
+        return int(np.count_nonzero(still_new))
+
+    def covered_slots(self):
+        """Return the number of slots that have been hit at least once."""
+        return int(np.count_nonzero(self.virgin != 0xFF))
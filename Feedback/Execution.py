@@ -0,0 +1,15 @@
+class Execution:
+    """Outcome of a single run of the implementation under test on a graph.
+
+    The fuzzer runs its executor once per mutant and every feedback check, as
+    well as testers that compute the same thing, read the outcome from here.
+    """
+
+    def __init__(self, graph, coverage_kind=None):
+        self.graph = graph
+        self.coverage_kind = coverage_kind  # None, "lines", "branches" or "hitcounts"
+        self.result = None
+        self.exception = None  # Exception raised by the executor, if any
+        self.coverage = None  # Executed lines, executed arcs or hit counts, depending on the collector
+        self.duration = None  # Seconds the executor ran for
+        self.new_coverage = 0  # Lines, arcs or hit count slots the feedback check found new
@@ -7,8 +7,17 @@ import sys
 import time
 import coverage
 import networkx as nx
+import queue
+import signal
 import threading
-from multiprocessing import Lock
+from multiprocessing import get_context
+
+from Feedback import Instrumentation
+from Feedback.CoverageCollector import CoverageCollector
+from Feedback.CoverageMap import CoverageMap
+from Feedback.Execution import Execution
+from Feedback.InstrumentedCollector import InstrumentedCollector
+from Feedback.SelfDisablingTracer import SelfDisablingTracer
 
 def get_executed_lines(cov):
     """Retrieve executed lines from coverage data."""
@@ -73,7 +82,7 @@ def track_branch_coverage(algorithm, graph):
 
 
 class FeedbackTools:
-    def __init__(self, start_time=None, line_counts=None, lock=None):
+    def __init__(self, start_time=None, line_counts=None, coverage_backend="coverage", shared_coverage=None):
         self.observed_outputs = set()
         self.networkx_exceptions = set()
         self.other_exceptions = set()
@@ -83,41 +92,365 @@ class FeedbackTools:
         self.start_time = start_time
         self.observed_executed_lines = set()  # Tracks executed lines of code
         self.observed_branches = set()  # Tracks branches that have been covered
-        self.lock = lock or Lock()  # Use a shared lock or create a new one for single instance
+        self.observed_signatures = set()  # Cheap graph and result signatures seen by the tiered check
+        self.shared_coverage = shared_coverage  # SharedCoverageMap of the instances fuzzing together, if any
+        self.publish_coverage = True  # False in --workers workers, which only read what the coordinator published
+        self.coverage_backend = coverage_backend  # Backend used to collect line coverage
+        self.line_collector = None  # Created on first use and kept for the lifetime of the process
+        self.branch_collector = None
+        self.hitcount_collector = None
+        self.coverage_map = None  # Virgin map of the hit count buckets seen so far
+        self.async_process = None  # Side process measuring line coverage, see start_async_coverage
+        self.async_candidates = None
+        self.async_admitted = None
+        self.async_submitted = 0
+        self.async_dropped = 0
+
+    def get_line_collector(self):
+        if self.line_collector is None:
+            if self.coverage_backend == "coverage":
+                self.line_collector = CoverageCollector(branch=False)
+            elif self.coverage_backend == "self_disabling":
+                self.line_collector = SelfDisablingTracer()
+            elif self.coverage_backend == "instrument":
+                self.line_collector = InstrumentedCollector()
+            else:
+                raise ValueError(f"Unknown coverage backend: {self.coverage_backend}")
+        return self.line_collector
+
+    def get_branch_collector(self):
+        if self.branch_collector is None:
+            self.branch_collector = CoverageCollector(branch=True)
+        return self.branch_collector
+
+    def get_hitcount_collector(self):
+        if self.hitcount_collector is None:
+            # Hit counts come from the instrumented counters, whatever the line coverage backend is
+            self.hitcount_collector = InstrumentedCollector()
+            self.coverage_map = CoverageMap(Instrumentation.MAP_SIZE)
+        return self.hitcount_collector
+
+    def execute(self, graph, algorithm, coverage_kind=None):
+        """Run the algorithm once on the graph and return its Execution.
+
+        coverage_kind selects what is collected during the run: None, "lines",
+        "branches" or "hitcounts". Exceptions raised by the algorithm are kept on
+        the Execution, except TimeoutError which is left to the caller.
+        """
+        execution = Execution(graph, coverage_kind)
+        if coverage_kind is None:
+            started = time.perf_counter()
+            try:
+                execution.result = algorithm(graph)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                execution.exception = e
+            execution.duration = time.perf_counter() - started
+            return execution
+
+        if coverage_kind == "lines":
+            collector = self.get_line_collector()
+        elif coverage_kind == "branches":
+            collector = self.get_branch_collector()
+        elif coverage_kind == "hitcounts":
+            collector = self.get_hitcount_collector()
+        else:
+            raise ValueError(f"Unknown coverage kind: {coverage_kind}")
 
-    def is_new_and_interesting(self, graph, algorithm, check_func):
+        # Start coverage measurement
+        collector.start()
+        started = time.perf_counter()
         try:
-            # Run the algorithm on the graph
-            result = algorithm(graph)
-            
-            # Check if the result is interesting
-            interesting_result = check_func(result)
-            
-            # If it's new and hasn't been observed yet
-            if interesting_result not in self.observed_outputs:
-                self.observed_outputs.add(interesting_result)
-                return True
-            
-            return False
-        
-        except nx.NetworkXException as e:
+            execution.result = algorithm(graph)
+        except TimeoutError:
+            raise
+        except Exception as e:
+            execution.exception = e
+        finally:
+            execution.duration = time.perf_counter() - started
+            # Stop coverage measurement
+            collector.stop()
+            if coverage_kind == "lines":
+                execution.coverage = collector.collect_lines()
+            elif coverage_kind == "branches":
+                execution.coverage = collector.collect_branches()
+            else:
+                # Copy the counters, the tester may run instrumented code before the check
+                execution.coverage = collector.hit_counts().copy()
+        return execution
+
+    @staticmethod
+    def exception_message(exception):
+        if isinstance(exception, nx.NetworkXException):
             # Handle NetworkX-specific exceptions
-            exception_message = "NetworkX Error: " + str(e)
-            if exception_message not in self.networkx_exceptions:
-                self.networkx_exceptions.add(exception_message)
-                self.exception_graphs[graph] = exception_message
-                return True  # Treat this as a new "interesting" result by returning True
-        
+            return "NetworkX Error: " + str(exception)
+        # Handle any other general exceptions
+        return "Error: " + str(exception)
+
+    def is_observed_exception(self, exception_message):
+        return exception_message in self.networkx_exceptions or exception_message in self.other_exceptions
+
+    def record_exception_message(self, graph, exception_message):
+        """Record an exception message; return True if it was not seen before."""
+        if exception_message.startswith("NetworkX Error: "):
+            observed_exceptions = self.networkx_exceptions
+        else:
+            observed_exceptions = self.other_exceptions
+        if exception_message not in observed_exceptions:
+            observed_exceptions.add(exception_message)
+            self.exception_graphs[graph] = exception_message
+            return True
+        return False
+
+    def record_exception(self, graph, exception):
+        """Record an exception raised by the algorithm; return True if it was not seen before."""
+        return self.record_exception_message(graph, self.exception_message(exception))
+
+    def novelty(self, execution, check_func=None):
+        """Return what an execution would add to the observed state, without recording it.
+
+        The delta is a small dict holding only the new parts: "exception" (the
+        message), "output" (when check_func is given), and "lines", "branches" or
+        "hitcounts" depending on the coverage the execution was collected with.
+        Returns None when nothing is new. merge_novelty records a delta, so a
+        delta computed in one process can be merged into the state of another.
+        """
+        delta = {}
+        if execution.exception is not None:
+            exception_message = self.exception_message(execution.exception)
+            if not self.is_observed_exception(exception_message):
+                delta["exception"] = exception_message
+        elif check_func is not None:
+            try:
+                interesting_result = check_func(execution.result)
+            except Exception as e:
+                interesting_result = None
+                exception_message = self.exception_message(e)
+                if not self.is_observed_exception(exception_message):
+                    delta["exception"] = exception_message
+            if interesting_result is not None and interesting_result not in self.observed_outputs:
+                delta["output"] = interesting_result
+
+        if execution.coverage_kind == "lines":
+            new_executed_lines = execution.coverage - self.observed_executed_lines
+            if new_executed_lines:
+                delta["lines"] = new_executed_lines
+        elif execution.coverage_kind == "branches":
+            new_branches = execution.coverage - self.observed_branches
+            if new_branches:
+                delta["branches"] = new_branches
+        elif execution.coverage_kind == "hitcounts":
+            slots, bits = self.coverage_map.new_bits(execution.coverage)
+            if len(slots):
+                delta["hitcounts"] = (slots, bits)
+        return delta or None
+
+    def merge_novelty(self, graph, delta, count_exceptions=True, verbose=True):
+        """Record a delta returned by novelty; return True if part of it was still new.
+
+        A new exception only makes the delta interesting when count_exceptions
+        is set, like in is_new_result. With verbose the new coverage is printed
+        the same way as by the is_new_* checks.
+        """
+        interesting = False
+        if "exception" in delta:
+            if self.record_exception_message(graph, delta["exception"]) and count_exceptions:
+                interesting = True
+        if "output" in delta and delta["output"] not in self.observed_outputs:
+            self.observed_outputs.add(delta["output"])
+            interesting = True
+        if "lines" in delta:
+            new_executed_lines = delta["lines"] - self.observed_executed_lines
+            if new_executed_lines:
+                self.observed_executed_lines.update(new_executed_lines)
+                if verbose:
+                    print(f"{len(new_executed_lines)}, {time.time() - self.start_time}")
+                if self.is_new_to_shared_coverage(new_executed_lines):
+                    interesting = True
+        if "branches" in delta:
+            new_branches = delta["branches"] - self.observed_branches
+            if new_branches:
+                self.observed_branches.update(new_branches)
+                if verbose:
+                    print(f"Total new branches executed: {len(new_branches)}, Time: {time.time() - self.start_time}")
+                if self.is_new_to_shared_coverage(new_branches):
+                    interesting = True
+        if "hitcounts" in delta:
+            if self.coverage_map is None:
+                self.coverage_map = CoverageMap(Instrumentation.MAP_SIZE)
+            new_slots = self.coverage_map.clear_bits(*delta["hitcounts"])
+            if new_slots:
+                if verbose:
+                    print(f"{new_slots}, {time.time() - self.start_time}")
+                if self.is_new_to_shared_buckets(*delta["hitcounts"]):
+                    interesting = True
+        return interesting
+
+    def is_new_result(self, execution, check_func):
+        """Check whether the result (or the exception) of an execution has not been observed yet."""
+        if execution.exception is not None:
+            # Treat a new exception as a new "interesting" result
+            return self.record_exception(execution.graph, execution.exception)
+        try:
+            # Check if the result is interesting
+            interesting_result = check_func(execution.result)
         except Exception as e:
-            # Handle any other general exceptions
-            exception_message = "Error: " + str(e)
-            if exception_message not in self.other_exceptions:
-                self.other_exceptions.add(exception_message)
-                self.exception_graphs[graph] = exception_message
-                return True  # Treat this as a new "interesting" result by returning True
-        
+            return self.record_exception(execution.graph, e)
+
+        # If it's new and hasn't been observed yet
+        if interesting_result not in self.observed_outputs:
+            self.observed_outputs.add(interesting_result)
+            return True
+        return False
+
+    def start_async_coverage(self, algorithm, queue_size=64, timeout=20):
+        """Measure line coverage in a side process instead of in the fuzzing loop.
+
+        Candidates handed to submit_async_coverage are replayed under the line
+        collector by a forked side process, which sends back the ones that
+        reached new lines with their novelty delta; poll_async_coverage merges
+        these deltas and returns the graphs to add to the corpus. The candidate
+        queue is bounded, so admission lags by at most queue_size candidates and
+        candidates submitted while it is full are dropped.
+        """
+        context = get_context("fork")
+        self.async_candidates = context.Queue(maxsize=queue_size)
+        self.async_admitted = context.Queue()
+        self.async_process = context.Process(target=self.async_coverage_loop,
+                                             args=(algorithm, timeout), daemon=True)
+        self.async_process.start()
+
+    def async_coverage_loop(self, algorithm, timeout):
+        # Stopping is up to the fuzzing process, which terminates this one
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # The fuzzing process merges the deltas and is the one publishing them
+        self.shared_coverage = None
+
+        def timeout_handler(signum, frame):
+            raise TimeoutError("Coverage replay exceeded the time limit")
+
+        signal.signal(signal.SIGALRM, timeout_handler)
+        while True:
+            graph = self.async_candidates.get()
+            if graph is None:
+                break
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                execution = self.execute(graph, algorithm, "lines")
+            except TimeoutError:
+                continue
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            delta = self.novelty(execution)
+            if delta and "lines" in delta:
+                self.merge_novelty(graph, delta, count_exceptions=False, verbose=False)
+                self.async_admitted.put((graph, delta))
+
+    def submit_async_coverage(self, graph):
+        """Queue a graph for coverage measurement; return False if it was dropped because the queue is full."""
+        try:
+            self.async_candidates.put_nowait(graph)
+        except queue.Full:
+            self.async_dropped += 1
+            return False
+        self.async_submitted += 1
+        return True
+
+    def poll_async_coverage(self):
+        """Merge what the side process found since the last poll and return the graphs that reached new lines."""
+        admitted = []
+        while True:
+            try:
+                graph, delta = self.async_admitted.get_nowait()
+            except queue.Empty:
+                return admitted
+            if self.merge_novelty(graph, delta, count_exceptions=False):
+                admitted.append(graph)
+
+    def stop_async_coverage(self):
+        if self.async_process is None:
+            return
+        print(f"Async coverage: {self.async_submitted} candidates queued, {self.async_dropped} dropped.")
+        self.async_candidates.cancel_join_thread()  # Do not wait to flush candidates nobody will read
+        self.async_process.terminate()
+        self.async_process.join()
+        self.async_process = None
+
+    def is_new_signature(self, signature):
+        if signature in self.observed_signatures:
+            return False
+        self.observed_signatures.add(signature)
+        return True
+
+    def is_new_to_shared_coverage(self, new_items):
+        """Publish lines or arcs new to this instance; return True unless another instance already covered all of them."""
+        if self.shared_coverage is None:
+            return True
+        unseen = self.shared_coverage.unseen(new_items)
+        if self.publish_coverage:
+            self.shared_coverage.publish(unseen)
+        return bool(unseen)
+
+    def is_new_to_shared_buckets(self, slots, bits):
+        """Same as is_new_to_shared_coverage for hit count buckets, given as the (slots, bits) of new_bits."""
+        if self.shared_coverage is None:
+            return True
+        slots, bits = self.shared_coverage.unseen_buckets(slots, bits)
+        if self.publish_coverage:
+            self.shared_coverage.publish_buckets(slots, bits)
+        return len(slots) > 0
+
+    def is_new_lines(self, execution):
+        """Check whether an execution collected with coverage_kind="lines" reached new lines."""
+        if execution.exception is not None:
+            self.record_exception(execution.graph, execution.exception)
+
+        # Determine if there are new executed lines
+        new_executed_lines = execution.coverage - self.observed_executed_lines
+        if new_executed_lines:
+            self.observed_executed_lines.update(new_executed_lines)
+            execution.new_coverage = len(new_executed_lines)
+            print(f"{len(new_executed_lines)}, {time.time() - self.start_time}")
+            # print(f"New lines executed: {new_executed_lines}")
+            return self.is_new_to_shared_coverage(new_executed_lines)  # New lines are executed
+        return False
+
+    def is_new_branches(self, execution):
+        """Check whether an execution collected with coverage_kind="branches" triggered new branches."""
+        if execution.exception is not None:
+            self.record_exception(execution.graph, execution.exception)
+
+        # Find new branches that were triggered
+        new_branches = execution.coverage - self.observed_branches
+        if new_branches:
+            # Update the observed branches
+            self.observed_branches.update(new_branches)
+            execution.new_coverage = len(new_branches)
+
+            # Print and log new branches triggered
+            print(f"Total new branches executed: {len(new_branches)}, Time: {time.time() - self.start_time}")
+            return self.is_new_to_shared_coverage(new_branches)  # New branches are triggered
+        return False  # No new branches were triggered
+
+    def is_new_hitcounts(self, execution):
+        """Check whether an execution collected with coverage_kind="hitcounts" reached a new hit count bucket."""
+        if execution.exception is not None:
+            self.record_exception(execution.graph, execution.exception)
+
+        # Compare the bucketed hit counts against the virgin map
+        slots, bits = self.coverage_map.new_bits(execution.coverage)
+        if len(slots):
+            self.coverage_map.clear_bits(slots, bits)
+            execution.new_coverage = len(slots)
+            print(f"{len(slots)}, {time.time() - self.start_time}")
+            return self.is_new_to_shared_buckets(slots, bits)  # New blocks or new hit count buckets
         return False
 
+    def is_new_and_interesting(self, graph, algorithm, check_func):
+        return self.is_new_result(self.execute(graph, algorithm), check_func)
+
     def parse_missing_lines(self, report_content):
         missing_lines = set()
         current_file_index = 0
@@ -173,52 +506,7 @@ class FeedbackTools:
         return new_lines_covered
 
     def is_new_and_interesting_coverage_updated(self, graph, algorithm):
-        with self.lock:  # Acquire the lock
-            # Create a Coverage object with the instance-specific coverage file
-            cov = coverage.Coverage(config_file='.coveragerc')
-            cov.erase()
-
-            # Start coverage measurement
-            cov.start()
-
-            try:
-                # Now import networkx
-                # import networkx as nx
-                # nx = importlib.reload(nx)
-
-                algorithm(graph)
-
-            except nx.NetworkXError as e:
-                exception_message = str(e)
-                if exception_message not in self.networkx_exceptions:
-                    self.networkx_exceptions.add(exception_message)
-                    self.exception_graphs[graph] = exception_message
-
-            except Exception as e:
-                exception_message = str(e)
-                if exception_message not in self.other_exceptions:
-                    self.other_exceptions.add(exception_message)
-                    self.exception_graphs[graph] = exception_message
-
-            finally:
-                # Stop coverage measurement
-                cov.stop()
-
-                # Save the data collected
-                cov.save()
-
-                # Get executed lines from this run
-                current_executed_lines = get_executed_lines(cov)
-
-                # Determine if there are new executed lines
-                new_executed_lines = current_executed_lines - self.observed_executed_lines
-                if new_executed_lines:
-                    self.observed_executed_lines.update(new_executed_lines)
-                    print(f"{len(new_executed_lines)}, {time.time() - self.start_time}")
-                    # print(f"New lines executed: {new_executed_lines}")
-                    return True  # New lines are executed
-
-            return False
+        return self.is_new_lines(self.execute(graph, algorithm, "lines"))
 
     def is_new_and_interesting_coverage(self, graph, algorithm):
         try:
@@ -285,52 +573,11 @@ class FeedbackTools:
 
     def is_new_branch_triggered(self, graph, algorithm):
         """Track branch coverage and check if any new branches are triggered."""
-        with self.lock:  # Acquire the lock
-            # Create a Coverage object to track branch coverage
-            cov = coverage.Coverage(branch=True)
-            cov.erase()  # Clear previous coverage data
-
-            # Start coverage measurement
-            cov.start()
-
-            try:
-                # Execute the algorithm
-                algorithm(graph)
-
-            except nx.NetworkXError as e:
-                exception_message = str(e)
-                if exception_message not in self.networkx_exceptions:
-                    self.networkx_exceptions.add(exception_message)
-                    self.exception_graphs[graph] = exception_message
-
-            except Exception as e:
-                exception_message = str(e)
-                if exception_message not in self.other_exceptions:
-                    self.other_exceptions.add(exception_message)
-                    self.exception_graphs[graph] = exception_message
-
-            finally:
-                # Stop coverage measurement
-                cov.stop()
-
-                # Save the data collected
-                cov.save()
-
-                # Get the executed branches from the current run
-                current_executed_branches = get_executed_branches(cov)
-
-                # Find new branches that were triggered
-                new_branches = current_executed_branches - self.observed_branches
-                if new_branches:
-                    # Update the observed branches
-                    self.observed_branches.update(new_branches)
-
-                    # Print and log new branches triggered
-                    print(f"Total new branches executed: {len(new_branches)}, Time: {time.time() - self.start_time}")
-                    return True  # New branches are triggered
-
-            return False  # No new branches were triggered
+        return self.is_new_branches(self.execute(graph, algorithm, "branches"))
 
+    def is_new_hitcount_triggered(self, graph, algorithm):
+        """Check whether the execution reached a new AFL-style hit count bucket for any block."""
+        return self.is_new_hitcounts(self.execute(graph, algorithm, "hitcounts"))
 
 
 # Example function that runs the algorithm
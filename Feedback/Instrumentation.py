@@ -0,0 +1,156 @@
+import ast
+import importlib.abc
+import importlib.machinery
+import os
+import sys
+from array import array
+
+# Name under which the counter buffer is injected into every instrumented module
+COUNTER_NAME = "__graphfuzz_counters__"
+
+# Number of counter slots; blocks past this limit share slots modulo MAP_SIZE
+MAP_SIZE = 1 << 17
+
+# Preallocated counter buffer shared by all instrumented modules (64-bit so it never overflows)
+COUNTERS = array('Q', bytes(8 * MAP_SIZE))
+
+# slot -> (filename, line) of the block the slot counts
+slot_locations = []
+
+_finder = None
+
+
+def allocate_slot(filename, line):
+    slot = len(slot_locations) % MAP_SIZE
+    slot_locations.append((filename, line))
+    return slot
+
+
+class CounterInserter(ast.NodeTransformer):
+    """Insert `__graphfuzz_counters__[slot] += 1` at the start of every block of a module.
+
+    Function bodies and both arms of every branch (if/else, loop body and loop
+    exit, try/except/else/finally, match cases) get their own slot. A missing
+    else arm is materialized so that "condition was false" is counted as well.
+    Module and class bodies only run at import time and are left untouched.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def make_counter(self, line):
+        slot = allocate_slot(self.filename, line)
+        counter = ast.AugAssign(
+            target=ast.Subscript(value=ast.Name(id=COUNTER_NAME, ctx=ast.Load()),
+                                 slice=ast.Constant(value=slot), ctx=ast.Store()),
+            op=ast.Add(),
+            value=ast.Constant(value=1))
+        for node in ast.walk(counter):
+            node.lineno = node.end_lineno = line
+            node.col_offset = node.end_col_offset = 0
+        return counter
+
+    def count_block(self, body, line, skip_docstring=False):
+        if not body:
+            return [self.make_counter(line)]
+        start = 0
+        if skip_docstring and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            start = 1  # Keep the docstring as the first statement
+        first_line = body[start].lineno if start < len(body) else line
+        return body[:start] + [self.make_counter(first_line)] + body[start:]
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+        node.body = self.count_block(node.body, node.lineno, skip_docstring=True)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_If(self, node):
+        self.generic_visit(node)
+        node.body = self.count_block(node.body, node.lineno)
+        node.orelse = self.count_block(node.orelse, node.lineno)
+        return node
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        node.body = self.count_block(node.body, node.lineno)
+        node.orelse = self.count_block(node.orelse, node.lineno)
+        return node
+
+    visit_AsyncFor = visit_For
+    visit_While = visit_For
+
+    def visit_Try(self, node):
+        self.generic_visit(node)
+        node.body = self.count_block(node.body, node.lineno)
+        for handler in node.handlers:
+            handler.body = self.count_block(handler.body, handler.lineno)
+        if node.orelse:
+            node.orelse = self.count_block(node.orelse, node.lineno)
+        if node.finalbody:
+            node.finalbody = self.count_block(node.finalbody, node.lineno)
+        return node
+
+    visit_TryStar = visit_Try
+
+    def visit_match_case(self, node):
+        self.generic_visit(node)
+        node.body = self.count_block(node.body, node.pattern.lineno)
+        return node
+
+
+class InstrumentingLoader(importlib.machinery.SourceFileLoader):
+    """Source loader that compiles modules through CounterInserter instead of using cached bytecode."""
+
+    def get_code(self, fullname):
+        path = self.get_filename(fullname)
+        source = self.get_data(path)
+        tree = ast.parse(source, filename=path)
+        tree = CounterInserter(os.path.realpath(path)).visit(tree)
+        return compile(tree, path, 'exec', dont_inherit=True)
+
+    def exec_module(self, module):
+        module.__dict__[COUNTER_NAME] = COUNTERS
+        super().exec_module(module)
+
+
+class InstrumentingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, package):
+        self.package = package
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname != self.package and not fullname.startswith(self.package + '.'):
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is None or type(spec.loader) is not importlib.machinery.SourceFileLoader:
+            return None  # Leave extension modules and anything unusual to the regular finders
+        spec.loader = InstrumentingLoader(fullname, spec.origin)
+        return spec
+
+
+def install(package="networkx"):
+    """Instrument `package` when it is imported.
+
+    Must run before the fuzzer modules are imported. Modules of the package that
+    are already loaded are dropped from sys.modules so that the next import goes
+    through the hook; code that imported the package earlier keeps its
+    uninstrumented copy.
+    """
+    global _finder
+    if _finder is not None:
+        return
+    _finder = InstrumentingFinder(package)
+    sys.meta_path.insert(0, _finder)
+    for name in list(sys.modules):
+        if name == package or name.startswith(package + '.'):
+            del sys.modules[name]
+
+
+def is_installed():
+    return _finder is not None
+
+
+def is_instrumented(module):
+    return module.__dict__.get(COUNTER_NAME) is COUNTERS
@@ -0,0 +1,44 @@
+import networkx as nx
+import numpy as np
+
+from Feedback import Instrumentation
+
+
+class InstrumentedCollector:
+    """Coverage collector reading the counter buffer filled by instrumented networkx code.
+
+    networkx has to be imported through Instrumentation.install(). The counters
+    are bumped by the instrumented code itself, so nothing is traced at runtime:
+    start() clears the buffer and the collection methods read what the last
+    execution left in it.
+    """
+
+    def __init__(self):
+        if not Instrumentation.is_instrumented(nx):
+            raise RuntimeError("networkx was imported without instrumentation; "
+                               "call Feedback.Instrumentation.install() before importing the fuzzer.")
+        # Zero-copy view of the shared counter buffer
+        self.counters = np.frombuffer(Instrumentation.COUNTERS, dtype=np.uint64)
+
+    def used_counters(self):
+        # Only the slots allocated so far can be non-zero, so skip the tail of the buffer
+        return self.counters[:min(len(Instrumentation.slot_locations), Instrumentation.MAP_SIZE)]
+
+    def start(self):
+        self.used_counters().fill(0)
+
+    def stop(self):
+        pass
+
+    def hit_counts(self):
+        """Return the per-slot hit counts of the last execution (a view, valid until the next start)."""
+        return self.used_counters()
+
+    def hit_slots(self):
+        """Return the indices of the slots hit since the last start."""
+        return np.flatnonzero(self.used_counters())
+
+    def collect_lines(self):
+        """Return the (filename, line) pairs of the blocks hit since the last start."""
+        slot_locations = Instrumentation.slot_locations
+        return {slot_locations[slot] for slot in self.hit_slots().tolist()}
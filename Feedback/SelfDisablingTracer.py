@@ -0,0 +1,128 @@
+import os
+import sys
+
+import networkx as nx
+
+
+class SelfDisablingTracer:
+    """Line collector that stops paying for networkx lines it has already recorded.
+
+    Every line is reported at most once per process. On Python 3.12+ the
+    sys.monitoring callback returns DISABLE for each location after recording
+    it, so a location costs nothing once it has been seen. On older versions
+    the sys.settrace fallback removes the local tracer of a frame as soon as
+    every line of its code object has been recorded, and stops tracing that
+    code object altogether.
+
+    The lines handed back by collect_lines are therefore only the ones that
+    had not been recorded before, which is all FeedbackTools needs to tell
+    whether an execution reached new code.
+    """
+
+    def __init__(self, source_dir=None):
+        self.source_dir = os.path.realpath(source_dir or os.path.dirname(os.path.abspath(nx.__file__)))
+        self.executed_lines = set()
+        self.source_files = {}  # co_filename -> canonical filename, or None outside the source dir
+        self.use_monitoring = hasattr(sys, 'monitoring')
+        if self.use_monitoring:
+            self.tool_id = self.acquire_tool_id()
+            sys.monitoring.register_callback(self.tool_id, sys.monitoring.events.LINE, self.monitor_line)
+        else:
+            self.local_tracers = {}  # code object -> its local tracer, or None once nothing is left to record
+            self.previous_trace = None
+
+    @staticmethod
+    def acquire_tool_id():
+        # Prefer the id reserved for coverage tools, but share nicely with debuggers and profilers
+        candidates = [sys.monitoring.COVERAGE_ID] + [tool_id for tool_id in range(6)
+                                                     if tool_id != sys.monitoring.COVERAGE_ID]
+        for tool_id in candidates:
+            if sys.monitoring.get_tool(tool_id) is None:
+                sys.monitoring.use_tool_id(tool_id, "graphfuzz")
+                return tool_id
+        raise RuntimeError("No free sys.monitoring tool id available.")
+
+    def source_file(self, co_filename):
+        """Return the canonical filename if it belongs to the measured package, otherwise None."""
+        try:
+            return self.source_files[co_filename]
+        except KeyError:
+            filename = os.path.realpath(co_filename)
+            if not filename.startswith(self.source_dir + os.sep):
+                filename = None
+            self.source_files[co_filename] = filename
+            return filename
+
+    def start(self):
+        if self.use_monitoring:
+            sys.monitoring.set_events(self.tool_id, sys.monitoring.events.LINE)
+        else:
+            self.previous_trace = sys.gettrace()
+            sys.settrace(self.global_trace)
+
+    def stop(self):
+        if self.use_monitoring:
+            sys.monitoring.set_events(self.tool_id, 0)
+        else:
+            sys.settrace(self.previous_trace)
+            self.previous_trace = None
+
+    def collect_lines(self):
+        """Return the (filename, line) pairs recorded for the first time since the last collection."""
+        executed_lines = set(self.executed_lines)
+        self.executed_lines.clear()
+        return executed_lines
+
+    def monitor_line(self, code, line_number):
+        filename = self.source_file(code.co_filename)
+        if filename is not None:
+            self.executed_lines.add((filename, line_number))
+        # Lines outside networkx are switched off as well, they are never interesting
+        return sys.monitoring.DISABLE
+
+    @staticmethod
+    def code_lines(code):
+        lines = {line for _, _, line in code.co_lines() if line is not None}
+        # The first line of a function only carries the entry instructions and
+        # never produces a line event, so it must not keep the code object traced
+        if len(lines) > 1:
+            lines.discard(code.co_firstlineno)
+        return lines
+
+    def global_trace(self, frame, event, arg):
+        code = frame.f_code
+        try:
+            return self.local_tracers[code]
+        except KeyError:
+            local_trace = self.local_tracers[code] = self.make_local_trace(code)
+            return local_trace
+
+    def make_local_trace(self, code):
+        """Build the local tracer of a code object, or None if it has nothing left to record."""
+        filename = self.source_file(code.co_filename)
+        if filename is None:
+            return None
+        pending = self.code_lines(code)
+        if not pending:
+            return None
+        first_line = code.co_firstlineno
+        executed_lines = self.executed_lines
+        local_tracers = self.local_tracers
+
+        def local_trace(frame, event, arg):
+            if event == 'line':
+                line_number = frame.f_lineno
+                if line_number in pending:
+                    pending.discard(line_number)
+                    executed_lines.add((filename, line_number))
+                    if not pending:
+                        # Every line of this code object is known: drop the local tracer of
+                        # the frame and do not trace new frames of the code object any more
+                        local_tracers[code] = None
+                        frame.f_trace = None
+                        return None
+                elif line_number == first_line:
+                    executed_lines.add((filename, line_number))
+            return local_trace
+
+        return local_trace
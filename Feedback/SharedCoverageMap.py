@@ -0,0 +1,93 @@
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# One byte per slot; networkx has a few tens of thousands of lines, so collisions are rare
+SHARED_MAP_SIZE = 1 << 20
+
+
+class SharedCoverageMap:
+    """Coverage map in shared memory that several fuzzer processes publish to without locking.
+
+    Every covered item (a (filename, line) pair or a (filename, arc) pair) is
+    hashed to one byte of the map, and the byte is set to 1 once some instance
+    has covered the item. Writers only ever store 1 into single bytes, so
+    concurrent writers cannot undo each other and no lock is needed; a reader
+    may at worst miss an item that is being published at the same moment.
+
+    Hit count buckets are not hashed: the bucket bit b of counter slot s
+    gets byte s * 8 + b, so a map of SHARED_MAP_SIZE bytes holds every bucket
+    of Instrumentation.MAP_SIZE slots. A group of instances uses a single
+    feedback type, so the two kinds of keys never meet in one map.
+
+    Create the map in the parent before starting the fuzzer processes and let
+    the children inherit it (fork), or attach to it by name.
+    """
+
+    def __init__(self, name=None, size=SHARED_MAP_SIZE):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.size = self.shm.size
+        self.bytes = np.ndarray((self.size,), dtype=np.uint8, buffer=self.shm.buf)
+        if self.owner:
+            self.bytes.fill(0)
+
+    def __reduce__(self):
+        # Processes started with spawn attach to the same segment instead of copying it
+        return SharedCoverageMap, (self.name, self.size)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def slots(self, items):
+        size = self.size
+        return np.fromiter((zlib.crc32(f"{item[0]}:{item[1]}".encode()) % size for item in items),
+                           dtype=np.int64, count=len(items))
+
+    def unseen(self, items):
+        """Return the items no instance has published yet."""
+        items = list(items)
+        if not items:
+            return []
+        seen = self.bytes[self.slots(items)]
+        return [item for item, hit in zip(items, seen) if not hit]
+
+    def publish(self, items):
+        items = list(items)
+        if items:
+            self.bytes[self.slots(items)] = 1
+
+    def bucket_indexes(self, slots, bits):
+        # Row in slots, bit position and byte of every bucket bit set in bits
+        rows, positions = np.nonzero(np.unpackbits(np.asarray(bits, dtype=np.uint8)[:, None], axis=1,
+                                                   bitorder='little'))
+        return rows, positions, (np.asarray(slots, dtype=np.int64)[rows] * 8 + positions) % self.size
+
+    def unseen_buckets(self, slots, bits):
+        """Return the (slots, bits) of the hit count buckets no instance has published yet."""
+        slots = np.asarray(slots)
+        rows, positions, indexes = self.bucket_indexes(slots, bits)
+        unseen = self.bytes[indexes] == 0
+        new_bits = np.zeros(len(slots), dtype=np.uint8)
+        np.bitwise_or.at(new_bits, rows[unseen], np.left_shift(1, positions[unseen]).astype(np.uint8))
+        keep = np.flatnonzero(new_bits)
+        return slots[keep], new_bits[keep]
+
+    def publish_buckets(self, slots, bits):
+        if len(slots):
+            self.bytes[self.bucket_indexes(slots, bits)[2]] = 1
+
+    def covered_slots(self):
+        return int(np.count_nonzero(self.bytes))
+
+    def close(self):
+        self.bytes = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -3,10 +3,14 @@ import time
 import networkx as nx
 from BaseFuzzer import BaseFuzzer
 from Generator.SmokeGenerator import SmokeGenerator
+from Mutator.MutationProfile import MutationProfile
 from Tester.HarmonicCentralityTester import HarmonicCentralityTester
 from Utils.FileUtils import create_single_node_graph, save_graphs, load_graphs
 
 class HarmonicCentralityFuzzer(BaseFuzzer):
+    # The tester only compares graphs whose weights are all positive distances
+    mutation_profile = MutationProfile(positive_weights=True)
+
     def get_corpus_name(self):
         return "hc_corpus"
 
@@ -27,7 +31,9 @@ class HarmonicCentralityFuzzer(BaseFuzzer):
         return load_graphs("hc_corpus")
 
     def process_test_results(self, mutated_graph, tester, first_occurrence_times, total_bug_counts, timestamp):
-        discrepancy_msg, _, discrepancy_count = tester.test_single_graph(mutated_graph)
+        # The executor already computed the networkx centrality of this graph
+        nx_centrality = self.executor_result(mutated_graph)
+        discrepancy_msg, _, discrepancy_count = tester.test_single_graph(mutated_graph, nx_centrality)
         if discrepancy_msg:
             if discrepancy_msg not in first_occurrence_times:
                 first_occurrence_times[discrepancy_msg] = time.time() - self.start_time
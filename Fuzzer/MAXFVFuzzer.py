@@ -8,8 +8,10 @@ import uuid
 
 class MAXFVFuzzer(BaseFuzzer):
     def __init__(self, num_iterations=100, use_multiple_graphs=False,
-                 feedback_check_type="regular", scheduler=None, timeout_duration=15):
-        super().__init__(num_iterations, use_multiple_graphs, feedback_check_type, scheduler, timeout_duration)
+                 feedback_check_type="regular", scheduler=None, timeout_duration=15, coverage_backend="coverage",
+                 memory_limit_mb=None, rss_limit_mb=2048, workers=1):
+        super().__init__(num_iterations, use_multiple_graphs, feedback_check_type, scheduler, timeout_duration,
+                         coverage_backend, memory_limit_mb, rss_limit_mb, workers)
         self.uuid = uuid.uuid4().hex[:8]
 
     def get_corpus_name(self):
@@ -2,6 +2,7 @@ import networkx as nx
 from BaseFuzzer import BaseFuzzer
 from Generator.SmokeGenerator import SmokeGenerator
 from Tester.MSTTester import MSTTester
+from Utils.ConversionCache import bump_version
 from Utils.FileUtils import create_single_node_graph, save_graphs, load_graphs
 import math
 
@@ -19,6 +20,19 @@ class MSTFuzzer(BaseFuzzer):
     def executor(self, G):
         return nx.minimum_spanning_tree(G)
 
+    def prepare_test_graph(self, G):
+        # The tester weighs every edge of an unweighted graph 1 and turns NaN weights into 0. On a multigraph it
+        # writes into the dicts of the edge keys instead, which changes no weight, so multigraphs are left as they are
+        if G.is_multigraph():
+            return
+        if not nx.is_weighted(G):
+            changed = [(u, v, 1) for u, v in G.edges()]
+        else:
+            changed = [(u, v, 0) for u, v, weight in G.edges(data='weight') if math.isnan(weight)]
+        if changed:
+            G.add_weighted_edges_from(changed)  # Through the graph methods, which keep overlay parents untouched
+            bump_version(G)
+
     def get_tester(self):
         return MSTTester(self.corpus_path)
 
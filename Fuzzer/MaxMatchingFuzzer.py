@@ -3,11 +3,15 @@ import time
 import networkx as nx
 from BaseFuzzer import BaseFuzzer
 from Generator.CustomGenerator import CustomGenerator
+from Mutator.MutationProfile import MutationProfile
 from Tester.MaxMatchingTester import MaxMatchingTester
 from Utils.FileUtils import create_single_node_digraph, save_graphs, load_graphs
 
 
 class MaxMatchingFuzzer(BaseFuzzer):
+    # bipartite.sets, which every matching needs, only takes a connected bipartite graph
+    mutation_profile = MutationProfile(bipartite=True, connected=True)
+
     def get_corpus_name(self):
         return "max_matching_corpus"
 
@@ -1,11 +1,16 @@
 import networkx as nx
 from BaseFuzzer import BaseFuzzer
 from Generator.SmokeGenerator import SmokeGenerator
+from Mutator.MutationProfile import MutationProfile
 from Tester.STPLTester import STPLTester
+from Utils.ConversionCache import bump_version
 from Utils.FileUtils import create_single_node_digraph, save_graphs, load_graphs
 
 
 class STPLFuzzer(BaseFuzzer):
+    # igraph is only compared on graphs without a negative cycle
+    mutation_profile = MutationProfile(no_negative_cycles=True)
+
     def get_corpus_name(self):
         return "stpl_corpus"
 
@@ -23,6 +28,14 @@ class STPLFuzzer(BaseFuzzer):
         except nx.NetworkXNoPath:
             return float('inf')  # Return infinity if no path exists
 
+    def prepare_test_graph(self, G):
+        # The tester gives a weight of 1 to the edges without one
+        edges = G.edges(keys=True, data=True) if G.is_multigraph() else G.edges(data=True)
+        missing = [edge[:-1] for edge in edges if 'weight' not in edge[-1]]
+        if missing:
+            G.add_edges_from(missing, weight=1)  # Through the graph methods, which keep overlay parents untouched
+            bump_version(G)
+
     def get_tester(self):
         return STPLTester(self.corpus_path)
 
@@ -3,7 +3,8 @@ import itertools
 import networkx as nx
 import random
 import os
-import pickle
+
+from Utils import GraphFormat
 
 
 class SmokeGenerator:
@@ -201,9 +202,9 @@ class SmokeGenerator:
         # Generate a unique name for this run
         run_name = f"run_{len(os.listdir(corpus_dir)) + 1}.pkl"
 
-        # Save the graphs using pickle
+        # Save the graphs as compact graph records
         with open(os.path.join(corpus_dir, run_name), 'wb') as f:
-            pickle.dump(graphs, f)
+            GraphFormat.dump(graphs, f, compress=True)
 
         print(f"Saved graphs to {run_name}")
 
@@ -0,0 +1,471 @@
+import random
+import weakref
+
+import numpy as np
+
+from Mutator.ExtendedMutator import (ExtendedMutator, MAX_NODES_THRESHOLD, MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT,
+                                     MIN_POSITIVE_WEIGHT, MAX_POSITIVE_WEIGHT)
+from Scheduler.RandomDiskScheduler import RandomDiskScheduler
+from Scheduler.RandomDiskSchedulerUpdated import RandomDiskSchedulerUpdated
+from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Scheduler.TieredScheduler import TieredScheduler
+from Utils.CompactGraph import CompactGraph
+from Utils.ConversionCache import bump_version, graph_version
+
+# Uniform numbers drawn up front for each operation of stacked_mutate_batch; combine_graphs needs the most
+# (the corpus pick, 8 for trimming, 3 weights, the number of additional edges and 3 per additional edge)
+DRAWS_PER_OPERATION = 28
+
+
+def pick(draw, n):
+    """Turn a uniform number in [0, 1) into an index in range(n)."""
+    return min(int(draw * n), n - 1)
+
+
+class CompactMutator:
+    """The mutations of ExtendedMutator, applied to CompactGraph instead of networkx graphs.
+
+    Every operator makes the same decisions as its ExtendedMutator (or
+    SimpleMutator) counterpart, so switching the graph format does not change
+    what the fuzzer explores, only what a mutation costs. The corpus keeps
+    as networkx graphs those a CompactGraph cannot hold (attributes, node
+    ids, ...); they are mutated by an ExtendedMutator over the same corpus.
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.is_disk_scheduler = isinstance(corpus, (RandomMemScheduler, RandomDiskSchedulerUpdated, RandomDiskScheduler,
+                                                     TieredScheduler))
+        # id(networkx corpus graph) -> (weakref, (id, mutation version, size), CompactGraph or None),
+        # for stacked_mutate_batch
+        self.compact_corpus = {}
+        self.operator_scheduler = None  # OperatorScheduler weighting the operations of stacked_mutate, if any
+        self.networkx_mutator = None  # ExtendedMutator for the networkx graphs of the corpus, made on first use
+
+    def copy(self, graph):
+        return graph.copy()
+
+    def networkx_fallback(self):
+        if self.networkx_mutator is None:
+            self.networkx_mutator = ExtendedMutator(self.corpus)
+        self.networkx_mutator.operator_scheduler = self.operator_scheduler
+        return self.networkx_mutator
+
+    def stacked_mutate(self, graph):
+        if not isinstance(graph, CompactGraph):
+            return self.networkx_fallback().stacked_mutate(graph)
+        mutation_operations = [
+            self.add_node,
+            self.delete_node,
+            self.add_edge,
+            self.delete_edge,
+            self.modify_edge_weight,
+            self.trim_graph_advanced,
+            self.combine_graphs
+        ]
+        if self.operator_scheduler is not None:
+            return bump_version(self.operator_scheduler.stack(graph, mutation_operations))
+
+        # Generate a random number of mutations to apply
+        num_mutations = random.randint(1, 5) + 1
+
+        # Apply each mutation in turn
+        for _ in range(num_mutations):
+            mutation = random.choice(mutation_operations)
+            graph = mutation(graph)
+
+        return bump_version(graph)
+
+    def mutate(self, graph):
+        if not isinstance(graph, CompactGraph):
+            return self.networkx_fallback().mutate(graph)
+        mutation_operations = [
+            self.add_node,
+            self.delete_node,
+            self.add_edge,
+            self.delete_edge,
+            self.modify_edge_weight,
+            self.trim_graph_advanced,
+            self.combine_graphs
+        ]
+        mutation = random.choice(mutation_operations)
+        return bump_version(mutation(graph))
+
+    def add_node(self, graph):
+        new_node = int(graph.nodes.max()) + 1 if len(graph) else 0
+        graph.add_node(new_node)
+        return graph
+
+    def delete_node(self, graph):
+        if len(graph):
+            node_to_remove = random.choice(graph.nodes)
+            graph.remove_nodes([node_to_remove])
+        return graph
+
+    def add_edge(self, graph):
+        nodes = graph.nodes
+        if not len(nodes):
+            graph.add_node(0)
+            graph.add_node(1)
+            node1, node2 = 0, 1
+        elif len(nodes) == 1:
+            graph.add_node(int(nodes.max()) + 1)
+            node1, node2 = int(nodes[0]), int(nodes.max())
+        else:
+            attempts = 0
+            max_attempts = 100
+            # Sampling positions draws the same random numbers as sampling the nodes
+            node1, node2 = nodes[random.sample(range(len(nodes)), 2)]
+            # Skip the edge existence check if the graph is a multigraph
+            if not graph.multigraph:
+                while graph.has_edge(node1, node2) and attempts < max_attempts:
+                    node1, node2 = nodes[random.sample(range(len(nodes)), 2)]
+                    attempts += 1
+            if attempts == max_attempts:
+                # Handle the case where a new edge couldn't be added after max_attempts
+                new_node = int(graph.nodes.max()) + 1
+                graph.add_node(new_node)
+                node1 = new_node
+                node2 = random.choice(nodes)
+
+        # If the graph has edge weights, assign a weight
+        weight = random.randint(1, 500)
+        if graph.has_negative_weight():
+            weight *= random.choice([-1, 1])
+        graph.add_edge(node1, node2, weight=weight)
+        return graph
+
+    def delete_edge(self, graph):
+        if graph.number_of_edges():
+            graph.remove_edge(random.randrange(graph.number_of_edges()))
+        return graph
+
+    def modify_edge_weight(self, graph):
+        if graph.number_of_edges():
+            # Check if the graph has weights
+            if not graph.all_edges_weighted():
+                return graph
+
+            # Check if there are negative weights in the graph
+            has_negative_weights = graph.has_negative_weight()
+
+            # Randomly select an edge
+            edge = random.randrange(graph.number_of_edges())
+
+            # Randomly decide whether to assign a numerical weight or NaN
+            if random.random() < 0.995:
+                if has_negative_weights:
+                    new_weight = random.randint(MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT)
+                else:
+                    new_weight = random.randint(MIN_POSITIVE_WEIGHT, MAX_NEGATIVE_WEIGHT)
+            else:
+                new_weight = random.randint(MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT)
+
+            if graph.multigraph:
+                # networkx's add_edge adds a parallel edge to a multigraph instead of updating one
+                graph.add_edge(graph.src[edge], graph.dst[edge], weight=new_weight)
+            else:
+                graph.set_weight(edge, new_weight)
+
+        return graph
+
+    def trim_graph_advanced(self, graph):
+        if len(graph) <= 2:
+            return graph
+
+        # Sort nodes by degree, highest first (stable, like sorted())
+        sorted_nodes = graph.nodes[np.argsort(-graph.degrees(), kind='stable')]
+
+        # Determine the number of nodes to remove
+        num_nodes_to_remove = random.randint(len(graph) // 5, 2 * len(graph) // 5)
+
+        # Remove nodes with the lowest degree
+        graph.remove_nodes(sorted_nodes[-num_nodes_to_remove:])
+
+        return graph
+
+    def combine_graphs(self, graph):
+        # Fetch a graph based on the type of corpus
+        if self.is_disk_scheduler:
+            other_graph = self.corpus.get_graph()
+        else:
+            other_graph = random.choice(self.corpus)
+        if not isinstance(other_graph, CompactGraph):
+            # A networkx corpus graph is converted (and then left as it is instead of being trimmed in place)
+            other_graph = self.compact_corpus_graph(other_graph)
+            if other_graph is None:
+                return graph
+            other_graph = other_graph.copy()
+
+        # ExtendedMutator skips the combination as soon as one of the graphs is a multigraph
+        if graph.multigraph or other_graph.multigraph:
+            return graph
+
+        if not len(graph):
+            graph.add_node(0)
+
+        # The disk scheduler hands out its cached graph, which has to keep matching its file
+        if isinstance(self.corpus, RandomDiskScheduler) and (
+                not len(other_graph) or len(graph) + len(other_graph) > MAX_NODES_THRESHOLD):
+            other_graph = other_graph.copy()
+
+        if not len(other_graph):
+            bump_version(other_graph).add_node(0)
+
+        while len(graph) + len(other_graph) > MAX_NODES_THRESHOLD:
+            graph = self.trim_graph_advanced(graph)
+            other_graph = bump_version(self.trim_graph_advanced(other_graph))  # Trimmed in place in the corpus
+
+        combined_graph = graph.disjoint_union(other_graph)
+        offset = len(graph)
+
+        # Check if either graph has weighted edges
+        has_weights = graph.all_edges_weighted() or other_graph.all_edges_weighted()
+        has_negative_weights = has_weights and (graph.has_negative_weight() or other_graph.has_negative_weight())
+
+        # Connecting nodes based on node degree
+        graph_degrees = graph.degrees()
+        other_degrees = other_graph.degrees()
+        graph_order = np.argsort(-graph_degrees, kind='stable')
+        other_order = np.argsort(-other_degrees, kind='stable')
+        nodes_from_graph = graph.nodes[graph_order]
+        nodes_from_other_graph = other_graph.nodes[other_order] + offset
+
+        # Connecting top 3 nodes with highest degree from each graph with or without weights
+        for i in range(min(3, len(nodes_from_graph), len(nodes_from_other_graph))):
+            if graph_degrees[graph_order[i]] > 0 and other_degrees[other_order[i]] > 0:
+                weight = None
+                if has_weights:
+                    # Assign a random weight within the specified ranges
+                    weight_range = (MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT) if has_negative_weights else (
+                        MIN_POSITIVE_WEIGHT, MAX_POSITIVE_WEIGHT)
+                    weight = random.randint(*weight_range)
+                combined_graph.add_edge(nodes_from_graph[i], nodes_from_other_graph[i], weight=weight)
+
+        # Adding additional edges with or without weights
+        additional_edges = random.randint(1, 5)  # add 1-5 additional edges
+        for _ in range(additional_edges):
+            if not len(graph) or not len(other_graph):
+                # Skip edge addition if either graph has no nodes
+                continue
+
+            node_from_graph = random.choice(graph.nodes)
+            node_from_other_graph = random.choice(other_graph.nodes) + offset
+            weight = None
+            if has_weights:
+                weight_range = (MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT) if has_negative_weights else (
+                    MIN_POSITIVE_WEIGHT, MAX_POSITIVE_WEIGHT)
+                weight = random.randint(*weight_range)
+            combined_graph.add_edge(node_from_graph, node_from_other_graph, weight=weight)
+
+        return combined_graph
+
+    def stacked_mutate_batch(self, parent, k):
+        """Return k stacked mutants of parent, with all their random decisions drawn up front as NumPy arrays.
+
+        Like stacked_mutate, every mutant gets 2 to 6 operations. Each
+        operation gets a row of uniform numbers that it turns into its node and
+        edge picks, counts and weights, so building a mutant makes no
+        random.* call. The mutants follow the distributions of stacked_mutate,
+        not its exact choices, and the corpus graphs they are combined with
+        are left as they are instead of being trimmed in place.
+        """
+        if not isinstance(parent, CompactGraph):
+            return self.networkx_fallback().stacked_mutate_batch(parent, k)
+        batch_operations = [
+            self.add_node_batched,
+            self.delete_node_batched,
+            self.add_edge_batched,
+            self.delete_edge_batched,
+            self.modify_edge_weight_batched,
+            self.trim_graph_batched,
+            self.combine_graphs_batched
+        ]
+        # Seeded from random so that runs seeded with random.seed() stay reproducible
+        rng = np.random.default_rng(random.getrandbits(64))
+        counts = rng.integers(2, 7, size=k)
+        operations = rng.integers(0, len(batch_operations), size=int(counts.sum())).tolist()
+        draws = rng.random((int(counts.sum()), DRAWS_PER_OPERATION))
+
+        mutants = []
+        row = 0
+        for count in counts.tolist():
+            graph = self.copy(parent)
+            for _ in range(count):
+                graph = batch_operations[operations[row]](graph, draws[row].tolist())
+                row += 1
+            mutants.append(bump_version(graph))
+        return mutants
+
+    def add_node_batched(self, graph, draws):
+        return self.add_node(graph)
+
+    def delete_node_batched(self, graph, draws):
+        if len(graph):
+            graph.remove_nodes([graph.nodes[pick(draws[0], len(graph))]])
+        return graph
+
+    def free_pair(self, graph, draw):
+        """Pick an ordered pair of distinct nodes uniformly among those not joined by an edge, or return None.
+
+        This is the distribution add_edge gets by sampling pairs until it finds
+        one without an edge, in one vectorized step.
+        """
+        n = len(graph)
+        src, dst = graph.positions(graph.src), graph.positions(graph.dst)
+        if not graph.directed:
+            src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+        loops = src == dst
+        codes = np.unique(src[~loops] * n + dst[~loops])
+        free = (n - 1) - np.bincount(codes // n, minlength=n)
+        total = int(free.sum())
+        if not total:
+            return None
+        target = pick(draw, total)
+        cumulative = np.cumsum(free)
+        first = int(np.searchsorted(cumulative, target, side='right'))
+        candidates = np.ones(n, dtype=bool)
+        candidates[first] = False
+        candidates[codes[codes // n == first] % n] = False
+        second = np.flatnonzero(candidates)[target - (int(cumulative[first]) - int(free[first]))]
+        return int(graph.nodes[first]), int(graph.nodes[second])
+
+    def add_edge_batched(self, graph, draws):
+        nodes = graph.nodes
+        n = len(nodes)
+        if not n:
+            graph.add_node(0)
+            graph.add_node(1)
+            node1, node2 = 0, 1
+        elif n == 1:
+            # Like add_edge: a new node is added but the edge is a self-loop on the existing one
+            graph.add_node(int(nodes.max()) + 1)
+            node1 = node2 = int(nodes[0])
+        elif graph.multigraph:
+            # Parallel edges are allowed, any two distinct nodes do
+            first = pick(draws[0], n)
+            second = pick(draws[1], n - 1)
+            node1, node2 = int(nodes[first]), int(nodes[second + (second >= first)])
+        else:
+            pair = self.free_pair(graph, draws[0])
+            if pair is None:
+                # Every pair is joined already: connect a new node instead
+                node1 = int(nodes.max()) + 1
+                graph.add_node(node1)
+                pair = node1, int(nodes[pick(draws[1], n)])
+            node1, node2 = pair
+
+        weight = 1 + pick(draws[2], 500)
+        if graph.has_negative_weight() and draws[3] < 0.5:
+            weight = -weight
+        graph.add_edge(node1, node2, weight=weight)
+        return graph
+
+    def delete_edge_batched(self, graph, draws):
+        if graph.number_of_edges():
+            graph.remove_edge(pick(draws[0], graph.number_of_edges()))
+        return graph
+
+    def modify_edge_weight_batched(self, graph, draws):
+        if not graph.number_of_edges() or not graph.all_edges_weighted():
+            return graph
+        edge = pick(draws[0], graph.number_of_edges())
+        if graph.has_negative_weight() or draws[1] >= 0.995:
+            low = MIN_NEGATIVE_WEIGHT
+        else:
+            low = MIN_POSITIVE_WEIGHT
+        new_weight = low + pick(draws[2], MAX_NEGATIVE_WEIGHT - low + 1)
+        if graph.multigraph:
+            graph.add_edge(graph.src[edge], graph.dst[edge], weight=new_weight)
+        else:
+            graph.set_weight(edge, new_weight)
+        return graph
+
+    def trim_graph_batched(self, graph, draws):
+        n = len(graph)
+        if n <= 2:
+            return graph
+        sorted_nodes = graph.nodes[np.argsort(-graph.degrees(), kind='stable')]
+        num_nodes_to_remove = n // 5 + pick(draws[0], 2 * n // 5 - n // 5 + 1)
+        graph.remove_nodes(sorted_nodes[-num_nodes_to_remove:])
+        return graph
+
+    def batch_corpus_graph(self, draw):
+        if self.is_disk_scheduler:
+            other_graph = self.corpus.get_graph()
+        else:
+            other_graph = self.corpus[pick(draw, len(self.corpus))]
+        if isinstance(other_graph, CompactGraph):
+            return other_graph.copy()
+        compact = self.compact_corpus_graph(other_graph)
+        return compact.copy() if compact is not None else None
+
+    def compact_corpus_graph(self, other_graph):
+        """Return the CompactGraph of a networkx corpus graph, or None if a CompactGraph cannot hold it."""
+        # Batches combine with the same networkx corpus graphs over and over; convert each version once
+        key = id(other_graph), graph_version(other_graph), len(other_graph)
+        entry = self.compact_corpus.get(key[0])
+        if entry is not None and entry[0]() is other_graph and entry[1] == key:
+            compact = entry[2]
+        else:
+            try:
+                compact = CompactGraph.from_networkx(other_graph)
+            except (ValueError, TypeError):
+                compact = None  # Attributes or node ids a CompactGraph cannot hold
+            # The entry goes away with the graph, e.g. one a disk scheduler loaded for this call
+            self.compact_corpus[key[0]] = (weakref.ref(other_graph, self.forget_corpus_graph(key[0])), key, compact)
+        return compact
+
+    def forget_corpus_graph(self, graph_id):
+        def forget(ref):
+            entry = self.compact_corpus.get(graph_id)
+            if entry is not None and entry[0] is ref:
+                del self.compact_corpus[graph_id]
+        return forget
+
+    def combine_graphs_batched(self, graph, draws):
+        other_graph = self.batch_corpus_graph(draws[0])
+        if other_graph is None or graph.multigraph or other_graph.multigraph:
+            return graph
+
+        if not len(graph):
+            graph.add_node(0)
+        if not len(other_graph):
+            other_graph.add_node(0)
+
+        trims = 0
+        while len(graph) + len(other_graph) > MAX_NODES_THRESHOLD:
+            graph = self.trim_graph_batched(graph, draws[1 + (2 * trims) % 8:])
+            other_graph = self.trim_graph_batched(other_graph, draws[2 + (2 * trims) % 8:])
+            trims += 1
+
+        combined_graph = graph.disjoint_union(other_graph)
+        offset = len(graph)
+
+        has_weights = graph.all_edges_weighted() or other_graph.all_edges_weighted()
+        has_negative_weights = has_weights and (graph.has_negative_weight() or other_graph.has_negative_weight())
+        low, high = (MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT) if has_negative_weights else (
+            MIN_POSITIVE_WEIGHT, MAX_POSITIVE_WEIGHT)
+
+        graph_degrees = graph.degrees()
+        other_degrees = other_graph.degrees()
+        graph_order = np.argsort(-graph_degrees, kind='stable')
+        other_order = np.argsort(-other_degrees, kind='stable')
+        nodes_from_graph = graph.nodes[graph_order]
+        nodes_from_other_graph = other_graph.nodes[other_order] + offset
+
+        for i in range(min(3, len(nodes_from_graph), len(nodes_from_other_graph))):
+            if graph_degrees[graph_order[i]] > 0 and other_degrees[other_order[i]] > 0:
+                weight = low + pick(draws[9 + i], high - low + 1) if has_weights else None
+                combined_graph.add_edge(nodes_from_graph[i], nodes_from_other_graph[i], weight=weight)
+
+        for j in range(1 + pick(draws[12], 5)):
+            if not len(graph) or not len(other_graph):
+                # Skip edge addition if either graph has no nodes
+                continue
+            node_from_graph = graph.nodes[pick(draws[13 + 3 * j], len(graph))]
+            node_from_other_graph = other_graph.nodes[pick(draws[14 + 3 * j], len(other_graph))] + offset
+            weight = low + pick(draws[15 + 3 * j], high - low + 1) if has_weights else None
+            combined_graph.add_edge(node_from_graph, node_from_other_graph, weight=weight)
+
+        return combined_graph
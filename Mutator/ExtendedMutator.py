@@ -8,6 +8,9 @@ from Mutator.SimpleMutator import SimpleMutator
 from Scheduler.RandomDiskScheduler import RandomDiskScheduler
 from Scheduler.RandomDiskSchedulerUpdated import RandomDiskSchedulerUpdated
 from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Scheduler.TieredScheduler import TieredScheduler
+from Utils.CompactGraph import CompactGraph
+from Utils.GraphOverlay import GraphOverlay
 
 MAX_NODES_THRESHOLD = 300
 MIN_NEGATIVE_WEIGHT = -200
@@ -21,7 +24,9 @@ class ExtendedMutator(SimpleMutator):
         super().__init__()
         self.corpus = corpus
         # Check if the corpus is an instance of RandomDiskScheduler or RandomMemScheduler
-        self.is_disk_scheduler = isinstance(corpus, (RandomMemScheduler, RandomDiskSchedulerUpdated, RandomDiskScheduler))
+        self.is_disk_scheduler = isinstance(corpus, (RandomMemScheduler, RandomDiskSchedulerUpdated, RandomDiskScheduler,
+                                                     TieredScheduler))
+        self.batch_mutator = None  # CompactMutator over the same corpus, for stacked_mutate_batch
 
     def stacked_mutate(self, graph):
         mutation_operations = [
@@ -33,6 +38,9 @@ class ExtendedMutator(SimpleMutator):
             self.trim_graph_advanced,
             self.combine_graphs  
         ]
+        if self.operator_scheduler is not None:
+            return self.bump(self.keep_profile(self.operator_scheduler.stack(graph, mutation_operations)))
+
         # Generate a random number of mutations to apply
         num_mutations = random.randint(1, 5) + 1
 
@@ -41,8 +49,25 @@ class ExtendedMutator(SimpleMutator):
             mutation = random.choice(mutation_operations)
             graph = mutation(graph)
 
-        return graph
-
+        return self.bump(self.keep_profile(graph))
+
+    def stacked_mutate_batch(self, parent, k):
+        """Return k stacked mutants of parent, built on a CompactGraph by CompactMutator.stacked_mutate_batch."""
+        # Imported here: CompactMutator imports the weight ranges of this module
+        from Mutator.CompactMutator import CompactMutator
+
+        if self.profile is not None or isinstance(parent, GraphOverlay):
+            # CompactMutator does not keep profiles, and a CompactGraph round trip would give every mutant
+            # of an overlay graph its own dicts instead of sharing the parent's
+            return [self.stacked_mutate(self.copy(parent)) for _ in range(k)]
+        try:
+            compact = CompactGraph.from_networkx(parent)
+        except (ValueError, TypeError):
+            # Edge attributes or node ids a CompactGraph cannot hold: mutate copies one by one
+            return [self.stacked_mutate(self.copy(parent)) for _ in range(k)]
+        if self.batch_mutator is None:
+            self.batch_mutator = CompactMutator(self.corpus)
+        return [self.bump(mutant.to_networkx()) for mutant in self.batch_mutator.stacked_mutate_batch(compact, k)]
 
     def mutate(self, graph):
         mutation_operations = [
@@ -55,7 +80,7 @@ class ExtendedMutator(SimpleMutator):
             self.combine_graphs  
         ]
         mutation = random.choice(mutation_operations)
-        return mutation(graph)
+        return self.bump(self.keep_profile(mutation(graph)))
 
     def nx_has_weighted_edges(self, nx_graph):
         for _, _, data in nx_graph.edges(data=True):
@@ -64,17 +89,17 @@ class ExtendedMutator(SimpleMutator):
         return True  # All edges have weights
 
     def modify_edge_weight(self, graph):
-        if graph.edges():
+        context = self.context(graph)
+        if context.edges:
             # Check if the graph has weights
-            if not self.nx_has_weighted_edges(graph):
+            if not context.all_edges_weighted():
                 return graph
 
             # Check if there are negative weights in the graph
-            edge_weights = nx.get_edge_attributes(graph, 'weight').values()
-            has_negative_weights = any(weight < 0 for weight in edge_weights)
+            has_negative_weights = context.has_negative_weight()
 
             # Randomly select an edge
-            edge = random.choice(list(graph.edges()))
+            edge = context.random_edge()
 
             # Randomly decide whether to assign a numerical weight or NaN
             if random.random() < 0.995:
@@ -91,7 +116,7 @@ class ExtendedMutator(SimpleMutator):
 
             # Modify the weight of the edge
             # graph[edge[0]][edge[1]]['weight'] = new_weight
-            graph.add_edge(edge[0], edge[1], weight=new_weight)
+            self.profiled_edge(graph, edge[0], edge[1], weight=new_weight)
         # else:
         #     print("Graph has no edges, exiting mutation.")
 
@@ -111,8 +136,11 @@ class ExtendedMutator(SimpleMutator):
         num_nodes_to_remove = random.randint(len(graph) // 5, 2 * len(graph) // 5)
 
         # Remove nodes with the lowest degree
-        for node in sorted_nodes[-num_nodes_to_remove:]:
-            graph.remove_node(node)
+        context = self.known_context(graph)
+        if context is None:
+            graph.remove_nodes_from(sorted_nodes[-num_nodes_to_remove:])
+        else:
+            context.remove_nodes(graph, sorted_nodes[-num_nodes_to_remove:])
 
         return graph
 
@@ -126,10 +154,11 @@ class ExtendedMutator(SimpleMutator):
         # Calculate the target number of nodes after trimming
         target_num_nodes = len(graph.nodes()) // 2
 
+        context = self.context(graph)
         while len(graph.nodes()) > target_num_nodes:
             # Randomly select a node to remove
-            node_to_remove = random.choice(list(graph.nodes()))
-            graph.remove_node(node_to_remove)
+            node_to_remove = context.random_node()
+            context.remove_node(graph, node_to_remove)
 
         return graph
 
@@ -140,6 +169,9 @@ class ExtendedMutator(SimpleMutator):
             other_graph = self.corpus.get_graph()
         else:
             other_graph = random.choice(self.corpus)
+        if isinstance(other_graph, CompactGraph):
+            # With --compact_graphs, the graphs a CompactGraph cannot hold share the corpus with CompactGraphs
+            other_graph = other_graph.to_networkx()
 
         # Skip combination if one is a (Di)Graph and the other is a Multi(Di)Graph
         if ((isinstance(graph, nx.Graph) or isinstance(graph, nx.DiGraph)) and
@@ -148,33 +180,33 @@ class ExtendedMutator(SimpleMutator):
                  (isinstance(other_graph, nx.Graph) or isinstance(other_graph, nx.DiGraph))):
             return graph
 
+        # The edges of a directed graph joined to an undirected one can break any invariant of the profile
+        if self.profile is not None and graph.is_directed() != other_graph.is_directed():
+            return graph
+
         if not graph.nodes():
-            graph.add_node(0)
+            self.context(graph).add_node(graph, 0)
+
+        # The disk scheduler hands out its cached graph, which has to keep matching its file
+        if isinstance(self.corpus, RandomDiskScheduler) and (
+                not other_graph.nodes() or len(graph) + len(other_graph) > MAX_NODES_THRESHOLD):
+            other_graph = other_graph.copy()
 
         if not other_graph.nodes():
-            other_graph.add_node(0)
+            self.context(other_graph).add_node(other_graph, 0)
+            self.bump(other_graph)  # Changed in place in the corpus
 
         while len(graph.nodes()) + len(other_graph.nodes()) > MAX_NODES_THRESHOLD:
             graph = self.trim_graph_advanced(graph)
-            other_graph = self.trim_graph_advanced(other_graph)
+            other_graph = self.bump(self.trim_graph_advanced(other_graph))  # Trimmed in place in the corpus
 
         combined_graph = nx.disjoint_union(graph, other_graph)
 
         # Check if either graph has weighted edges
-        has_weights = self.nx_has_weighted_edges(graph) or self.nx_has_weighted_edges(other_graph)
-        has_negative_weights = False
+        has_weights = self.all_edges_weighted(graph) or self.all_edges_weighted(other_graph)
 
         # If weights are present, check for negative weights
-        if has_weights:
-            for _, _, data in graph.edges(data=True):
-                if data.get('weight', 0) < 0:
-                    has_negative_weights = True
-                    break
-            if not has_negative_weights:
-                for _, _, data in other_graph.edges(data=True):
-                    if data.get('weight', 0) < 0:
-                        has_negative_weights = True
-                        break
+        has_negative_weights = has_weights and (self.has_negative_weight(graph) or self.has_negative_weight(other_graph))
 
         # Connecting nodes based on node degree
         nodes_from_graph = sorted(graph.nodes(), key=graph.degree, reverse=True)
@@ -190,10 +222,10 @@ class ExtendedMutator(SimpleMutator):
                     weight_range = (MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT) if has_negative_weights else (
                         MIN_POSITIVE_WEIGHT, MAX_POSITIVE_WEIGHT)
                     weight = random.randint(*weight_range)
-                    combined_graph.add_edge(nodes_from_graph[i], nodes_from_other_graph[i], weight=weight)
+                    self.profiled_edge(combined_graph, nodes_from_graph[i], nodes_from_other_graph[i], weight=weight)
                 else:
                     # Add edge without weight
-                    combined_graph.add_edge(nodes_from_graph[i], nodes_from_other_graph[i])
+                    self.profiled_edge(combined_graph, nodes_from_graph[i], nodes_from_other_graph[i])
 
         # Adding additional edges with or without weights
         additional_edges = random.randint(1, 5)  # add 1-5 additional edges
@@ -213,10 +245,10 @@ class ExtendedMutator(SimpleMutator):
                     weight_range = (MIN_NEGATIVE_WEIGHT, MAX_NEGATIVE_WEIGHT) if has_negative_weights else (
                         MIN_POSITIVE_WEIGHT, MAX_POSITIVE_WEIGHT)
                     weight = random.randint(*weight_range)
-                    combined_graph.add_edge(node_from_graph, node_from_other_graph, weight=weight)
+                    self.profiled_edge(combined_graph, node_from_graph, node_from_other_graph, weight=weight)
                 else:
                     # Add edge without weight
-                    combined_graph.add_edge(node_from_graph, node_from_other_graph)
+                    self.profiled_edge(combined_graph, node_from_graph, node_from_other_graph)
 
         # Delete the original graphs
         del graph
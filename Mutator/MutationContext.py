@@ -0,0 +1,177 @@
+import random
+
+from Utils.ConversionCache import graph_version
+
+
+class MutationContext:
+    """Indexes of a networkx graph that the mutation operators keep up to date instead of rescanning the graph.
+
+    Nodes and edges are kept in lists for O(1) uniform sampling, with a dict
+    from each entry to its position so that removing one is an O(1) swap with
+    the last entry. Next to them the context counts the edges without a
+    weight and the edges with a negative weight, and tracks the largest node
+    id. Multigraph edges are (u, v, key) triples; an undirected edge is stored
+    in one orientation and found in either.
+
+    The operators change the graph through the context (add_node, add_edge,
+    remove_edge, remove_node) so both stay in sync. matches() tells whether
+    the graph was changed behind the context's back (a new mutation version or
+    another number of nodes).
+    """
+
+    def __init__(self, graph):
+        self.directed = graph.is_directed()
+        self.multigraph = graph.is_multigraph()
+        self.nodes = list(graph.nodes())
+        self.node_positions = {node: position for position, node in enumerate(self.nodes)}
+        if self.multigraph:
+            edges = list(graph.edges(keys=True, data=True))
+            self.edges = [(u, v, key) for u, v, key, _ in edges]
+            edge_data = [data for _, _, _, data in edges]
+        else:
+            edges = list(graph.edges(data=True))
+            self.edges = [(u, v) for u, v, _ in edges]
+            edge_data = [data for _, _, data in edges]
+        self.edge_positions = {edge: position for position, edge in enumerate(self.edges)}
+        self.unweighted_edges = 0
+        self.negative_edges = 0
+        for data in edge_data:
+            self.count_edge(data, 1)
+        self.largest_node = max(self.nodes) if self.nodes else None
+        self.largest_node_removed = False
+        self.version = graph_version(graph)
+
+    def copy(self):
+        """Return a context for graph.copy(), without rescanning the copy."""
+        other = MutationContext.__new__(MutationContext)
+        other.__dict__.update(self.__dict__)
+        other.nodes = list(self.nodes)
+        other.node_positions = dict(self.node_positions)
+        other.edges = list(self.edges)
+        other.edge_positions = dict(self.edge_positions)
+        return other
+
+    def matches(self, graph):
+        # number_of_edges() walks every node, so changes made without a version bump are only caught on nodes
+        return self.version == graph_version(graph) and len(self.nodes) == graph.number_of_nodes()
+
+    def max_node(self):
+        if self.largest_node_removed:
+            self.largest_node = max(self.nodes) if self.nodes else None
+            self.largest_node_removed = False
+        return self.largest_node
+
+    def all_edges_weighted(self):
+        return self.unweighted_edges == 0
+
+    def has_negative_weight(self):
+        return self.negative_edges > 0
+
+    def random_node(self):
+        return random.choice(self.nodes)
+
+    def random_edge(self):
+        return random.choice(self.edges)
+
+    def count_edge(self, data, sign):
+        if 'weight' not in data:
+            self.unweighted_edges += sign
+        elif data['weight'] < 0:
+            self.negative_edges += sign
+
+    def index_node(self, node):
+        if node in self.node_positions:
+            return
+        self.node_positions[node] = len(self.nodes)
+        self.nodes.append(node)
+        if self.largest_node is None or node > self.largest_node:
+            self.largest_node = node
+
+    def add_node(self, graph, node):
+        graph.add_node(node)
+        self.index_node(node)
+
+    def add_edge(self, graph, u, v, **attr):
+        """Add an edge like graph.add_edge does, updating an existing edge of a simple graph."""
+        self.index_node(u)
+        self.index_node(v)
+        if self.multigraph:
+            key = graph.add_edge(u, v, **attr)
+            edge = (u, v, key)
+        else:
+            if graph.has_edge(u, v):
+                self.count_edge(graph[u][v], -1)
+                # Through add_edge, so that a copy-on-write graph gets its own attribute dict first
+                graph.add_edge(u, v, **attr)
+                self.count_edge(graph[u][v], 1)
+                return
+            graph.add_edge(u, v, **attr)
+            edge = (u, v)
+        self.edge_positions[edge] = len(self.edges)
+        self.edges.append(edge)
+        self.count_edge(attr, 1)
+
+    def stored_edge(self, edge):
+        # An undirected edge may be stored in the other orientation
+        if edge in self.edge_positions or self.directed:
+            return edge
+        return (edge[1], edge[0]) + tuple(edge[2:])
+
+    def unindex_edge(self, edge):
+        edge = self.stored_edge(edge)
+        position = self.edge_positions.pop(edge)
+        last = self.edges.pop()
+        if last != edge:
+            self.edges[position] = last
+            self.edge_positions[last] = position
+
+    def remove_edge(self, graph, edge):
+        self.count_edge(graph.get_edge_data(*edge), -1)
+        graph.remove_edge(*edge)
+        self.unindex_edge(edge)
+
+    def incident_edges(self, graph, node):
+        # Read from the adjacency dicts, the edge views cost more than the rest of remove_node
+        if self.multigraph:
+            edges = [((node, v, key), data) for v, keys in graph._adj[node].items() for key, data in keys.items()]
+            if self.directed:
+                edges += [((u, node, key), data) for u, keys in graph._pred[node].items() if u != node
+                          for key, data in keys.items()]
+            return edges
+        edges = [((node, v), data) for v, data in graph._adj[node].items()]
+        if self.directed:
+            edges += [((u, node), data) for u, data in graph._pred[node].items() if u != node]
+        return edges
+
+    def remove_node(self, graph, node):
+        counted = self.unweighted_edges or self.negative_edges
+        for edge, data in self.incident_edges(graph, node):
+            if counted:
+                self.count_edge(data, -1)
+            self.unindex_edge(edge)
+        graph.remove_node(node)
+        position = self.node_positions.pop(node)
+        last = self.nodes.pop()
+        if last != node:
+            self.nodes[position] = last
+            self.node_positions[last] = position
+        if node == self.largest_node:
+            self.largest_node_removed = True
+
+    def remove_nodes(self, graph, nodes):
+        """Remove many nodes at once, filtering the indexes in one pass instead of one swap per edge."""
+        removed = set(nodes)
+        if len(removed) <= 1:
+            for node in removed:
+                self.remove_node(graph, node)
+            return
+        if self.unweighted_edges or self.negative_edges:
+            for edge in [edge for edge in self.edges if edge[0] in removed or edge[1] in removed]:
+                self.count_edge(graph.get_edge_data(*edge), -1)
+        graph.remove_nodes_from(removed)
+        self.edges = [edge for edge in self.edges if edge[0] not in removed and edge[1] not in removed]
+        self.edge_positions = {edge: position for position, edge in enumerate(self.edges)}
+        self.nodes = [node for node in self.nodes if node not in removed]
+        self.node_positions = {node: position for position, node in enumerate(self.nodes)}
+        if self.largest_node in removed:
+            self.largest_node_removed = True
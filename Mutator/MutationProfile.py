@@ -0,0 +1,233 @@
+import math
+import random
+
+import networkx as nx
+
+# Node attribute holding the side of a node in a bipartite graph, as set by the generators
+SIDE = 'bipartite'
+# Range of the weights given to edges that need a positive weight and have none
+MIN_REPAIR_WEIGHT = 1
+MAX_REPAIR_WEIGHT = 100
+
+
+class MutationProfile:
+    """Invariants a fuzzer's target needs, kept by the mutators so that mutants reach every implementation.
+
+    A target that rejects or short-circuits invalid inputs (a matching on a
+    graph that is not bipartite, a centrality with non-positive distances,
+    igraph skipped on a negative cycle, ...) wastes the execution of every
+    mutant that breaks its precondition. With a profile the mutators check
+    each edge they add or re-weight against the invariants of the profile and
+    raise its weight or drop it when it would break one. The bipartite and
+    positive_weights checks only look at the edge and its endpoints, but
+    no_negative_cycles runs Bellman-Ford from the head of the edge back to
+    its tail, O(V * E) over the part of the graph reachable from the head.
+    Removing nodes or edges keeps every invariant but connectivity, which is
+    restored after each stack of mutations. conform() makes an initial graph
+    satisfy the profile once, before it joins the corpus.
+
+    Invariants:
+    - bipartite: every node has a side in its 'bipartite' attribute and every
+      edge joins the two sides.
+    - connected: the graph is (weakly) connected and not empty.
+    - positive_weights: every edge has a weight > 0.
+    - no_negative_cycles: no cycle has a negative total weight.
+    """
+
+    def __init__(self, bipartite=False, connected=False, positive_weights=False, no_negative_cycles=False):
+        self.bipartite = bipartite
+        self.connected = connected
+        self.positive_weights = positive_weights
+        self.no_negative_cycles = no_negative_cycles
+
+    def __repr__(self):
+        names = [name for name, value in vars(self).items() if value]
+        return f"MutationProfile({', '.join(names)})"
+
+    @staticmethod
+    def positive(weight):
+        """Return a positive weight for an edge weighted `weight` (None when it has none)."""
+        if weight is not None and weight < 0:
+            return -weight
+        return random.randint(MIN_REPAIR_WEIGHT, MAX_REPAIR_WEIGHT)
+
+    @staticmethod
+    def side(graph, node):
+        return graph.nodes[node].get(SIDE) if node in graph else None
+
+    def admit_edge(self, graph, u, v, attr):
+        """Return the edge (u, v, attr) to add to graph in place of the one asked for, or None to drop it."""
+        if u == v and self.bipartite:
+            return None
+        if self.bipartite:
+            side_u, side_v = self.side(graph, u), self.side(graph, v)
+            if side_u is not None and side_u == side_v:
+                return None
+        weight = attr.get('weight')
+        if self.positive_weights and (weight is None or weight <= 0):
+            attr = dict(attr, weight=self.positive(weight))
+        if self.no_negative_cycles:
+            bound = self.cycle_bound(graph, u, v)
+            if bound is None:
+                return None
+            # An edge without a weight counts as weight 1, like networkx does
+            if not (1 if weight is None else weight) >= bound:
+                attr = dict(attr, weight=bound)
+        return u, v, attr
+
+    @staticmethod
+    def cycle_bound(graph, u, v):
+        """Return the lowest weight an edge u -> v can take without closing a negative cycle, None for no weight.
+
+        Every cycle through the edge is the edge and a path from v back to u,
+        so without a negative cycle so far the bound is -d(v, u). It holds for
+        edges that are added and for edges that are re-weighted, since no
+        shortest path from v to u goes through u -> v itself. An undirected
+        edge is a cycle on its own and needs a weight >= 0.
+        """
+        if not graph.is_directed():
+            return 0
+        if u not in graph or v not in graph:
+            return 0 if u == v else -math.inf
+        try:
+            return -nx.bellman_ford_path_length(graph, v, u, weight='weight')
+        except nx.NetworkXNoPath:
+            return -math.inf
+        except nx.NetworkXUnbounded:
+            return None  # The graph has a negative cycle already, add nothing that could make another one
+
+    def edge_added(self, graph, u, v):
+        """Give the endpoints of a new edge of a bipartite graph a side if they have none."""
+        if not self.bipartite:
+            return
+        side_u, side_v = self.side(graph, u), self.side(graph, v)
+        if side_u is None:
+            side_u = 0 if side_v is None else 1 - side_v
+            graph.add_node(u, **{SIDE: side_u})
+        if side_v is None:
+            graph.add_node(v, **{SIDE: 1 - side_u})
+
+    def node_added(self, graph, node):
+        if self.bipartite and self.side(graph, node) is None:
+            graph.add_node(node, **{SIDE: random.randint(0, 1)})
+
+    def connecting_edges(self, graph):
+        """Return the edges (u, v) that join the components of graph to its largest one."""
+        if not self.connected or len(graph) < 2:
+            return []
+        components = nx.weakly_connected_components(graph) if graph.is_directed() else \
+            nx.connected_components(graph)
+        components = sorted(components, key=len, reverse=True)
+        if len(components) == 1:
+            return []
+        main = list(components[0])
+        sides = {}
+        if self.bipartite:
+            for node in main:
+                sides.setdefault(self.side(graph, node), []).append(node)
+        edges = []
+        for component in components[1:]:
+            component = list(component)
+            random.shuffle(component)
+            for node in component:
+                side = self.side(graph, node) if self.bipartite else None
+                others = main if side is None else sides.get(1 - side)
+                if others:
+                    edges.append((node, random.choice(others)))
+                    break
+            else:
+                # Both components are single nodes on the same side; a lone node can change sides
+                graph.add_node(component[0], **{SIDE: 1 - self.side(graph, component[0])})
+                edges.append((component[0], random.choice(main)))
+        return edges
+
+    def conform(self, graph):
+        """Make a graph satisfy the profile, changing it in place, and return it."""
+        if self.bipartite:
+            if all(self.side(graph, node) is None for node in graph) and nx.is_bipartite(graph):
+                # Sides from a 2-coloring keep every edge
+                for node, side in nx.bipartite.color(graph).items():
+                    graph.add_node(node, **{SIDE: side})
+            for node in list(graph.nodes()):
+                self.node_added(graph, node)
+            graph.remove_edges_from([(u, v) for u, v in graph.edges()
+                                     if self.side(graph, u) == self.side(graph, v)])
+        if self.positive_weights:
+            edges = graph.edges(keys=True, data=True) if graph.is_multigraph() else graph.edges(data=True)
+            for *edge, data in list(edges):
+                weight = data.get('weight')
+                if weight is None or not weight > 0:
+                    self.reweight(graph, edge, self.positive(weight))
+        if self.no_negative_cycles:
+            self.break_negative_cycles(graph)
+        if self.connected:
+            if not len(graph):
+                graph.add_node(0)
+                self.node_added(graph, 0)
+            for u, v in self.connecting_edges(graph):
+                edge = self.admit_edge(graph, u, v, {'weight': random.randint(MIN_REPAIR_WEIGHT, MAX_REPAIR_WEIGHT)})
+                if edge is not None:
+                    graph.add_edge(edge[0], edge[1], **edge[2])
+                    self.edge_added(graph, edge[0], edge[1])
+        return graph
+
+    @staticmethod
+    def break_negative_cycles(graph):
+        if not graph.is_directed():
+            edges = graph.edges(keys=True, data=True) if graph.is_multigraph() else graph.edges(data=True)
+            for *edge, data in list(edges):
+                if data.get('weight', 0) < 0:
+                    MutationProfile.reweight(graph, edge, -data['weight'])
+            return
+        # Flip the most negative edge of a negative cycle until none is left
+        cycle = MutationProfile.find_negative_cycle(graph)
+        while cycle:
+            edge, weight = min((MutationProfile.lightest_edge(graph, u, v) for u, v in zip(cycle, cycle[1:])),
+                               key=lambda item: item[1])
+            MutationProfile.reweight(graph, edge, -weight)
+            cycle = MutationProfile.find_negative_cycle(graph)
+
+    @staticmethod
+    def lightest_edge(graph, u, v):
+        """Return the edge u -> v of lowest weight, (u, v, key) on a multigraph, with its weight."""
+        if graph.is_multigraph():
+            key, data = min(graph[u][v].items(), key=lambda item: item[1].get('weight', 1))
+            return (u, v, key), data.get('weight', 1)
+        return (u, v), graph[u][v].get('weight', 1)
+
+    @staticmethod
+    def reweight(graph, edge, weight):
+        """Set the weight of an edge given as (u, v), or (u, v, key) on a multigraph."""
+        if len(edge) == 3:
+            graph.add_edge(edge[0], edge[1], key=edge[2], weight=weight)
+        else:
+            graph.add_edge(edge[0], edge[1], weight=weight)
+
+    @staticmethod
+    def find_negative_cycle(graph):
+        """Return the nodes of a negative cycle of a directed graph, first node repeated last, or [] if it has none."""
+        # Bellman-Ford from a virtual source joined to every node; nx.find_negative_cycle misses some cycles
+        distance = dict.fromkeys(graph, 0)
+        predecessor = {}
+        relaxed = None
+        for _ in range(len(graph)):
+            relaxed = None
+            for u, v, weight in graph.edges(data='weight', default=1):
+                if distance[u] + weight < distance[v]:
+                    distance[v] = distance[u] + weight
+                    predecessor[v] = u
+                    relaxed = v
+            if relaxed is None:
+                break
+        if relaxed is None:
+            return []
+        # A node still relaxed after len(graph) rounds leads back into a cycle within len(graph) predecessors
+        for _ in range(len(graph)):
+            relaxed = predecessor[relaxed]
+        cycle = [relaxed]
+        node = predecessor[relaxed]
+        while node != relaxed:
+            cycle.append(node)
+            node = predecessor[node]
+        cycle.append(relaxed)
+        return cycle[::-1]
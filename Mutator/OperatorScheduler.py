@@ -0,0 +1,106 @@
+import random
+import time
+from collections import deque
+
+# Stack depths of stacked_mutate (random.randint(1, 5) + 1)
+DEPTHS = (2, 3, 4, 5, 6)
+# Mutants recorded between two reweightings
+UPDATE_PERIOD = 100
+# Share of the statistics kept at each reweighting, so the weights follow the campaign as it moves on
+DECAY = 0.9
+# Share of the probability spread evenly over all arms, so that no operator or depth starves
+EXPLORATION = 0.1
+
+
+class OperatorScheduler:
+    """Bandit that picks the operators and the stack depth of stacked_mutate by their yield per second.
+
+    For every operator and every depth it records how many mutants it was
+    used in, the seconds they cost and how many of them found something (new
+    coverage, a new discrepancy, ... whatever the fuzzer counts as a find).
+    An operator is charged its own mutation time plus an equal share of the
+    time spent executing and checking the mutant, and gets an equal share of
+    the find. The stacks of a batch of mutants wait in a queue and are
+    credited in the order the mutants were built. Every UPDATE_PERIOD
+    mutants the weights are set in proportion to the smoothed finds per
+    second of each arm, an arm without data scoring like the average of all
+    of them, and the statistics decay.
+    """
+
+    def __init__(self):
+        self.operators = {}  # operator name -> [uses, seconds, finds]
+        self.depths = {depth: [0, 0.0, 0.0] for depth in DEPTHS}
+        self.operator_weights = {}
+        self.depth_weights = {depth: 1.0 for depth in DEPTHS}
+        self.pending = deque()  # (operator names, depth, mutation seconds per operator) of the stacks not recorded yet
+        self.recorded = 0
+
+    def stack(self, graph, operations):
+        """Apply a stack of weighted random operations to graph and return the result."""
+        for operation in operations:
+            if operation.__name__ not in self.operators:
+                self.operators[operation.__name__] = [0, 0.0, 0.0]
+                self.operator_weights[operation.__name__] = 1.0
+        depth = random.choices(DEPTHS, weights=[self.depth_weights[depth] for depth in DEPTHS])[0]
+        chosen = random.choices(operations, weights=[self.operator_weights[operation.__name__]
+                                                     for operation in operations], k=depth)
+        spent = []
+        for operation in chosen:
+            start = time.perf_counter()
+            graph = operation(graph)
+            spent.append(time.perf_counter() - start)
+        self.pending.append(([operation.__name__ for operation in chosen], depth, spent))
+        return graph
+
+    def record(self, seconds, found):
+        """Credit the oldest stack not recorded yet with the seconds its mutant cost and whether it found something."""
+        if not self.pending:
+            return  # The mutant did not come from stack(), e.g. from a CompactMutator batch
+        names, depth, spent = self.pending.popleft()
+        shared_seconds = max(seconds - sum(spent), 0.0) / len(names)
+        find = (1.0 if found else 0.0) / len(names)
+        for name, mutation_seconds in zip(names, spent):
+            stats = self.operators[name]
+            stats[0] += 1
+            stats[1] += mutation_seconds + shared_seconds
+            stats[2] += find
+        stats = self.depths[depth]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += 1.0 if found else 0.0
+        self.recorded += 1
+        if self.recorded % UPDATE_PERIOD == 0:
+            self.reweight()
+
+    def drop_pending(self):
+        """Forget the stacks of mutants that are discarded without being recorded, e.g. the rest of a batch."""
+        self.pending.clear()
+
+    @staticmethod
+    def weights(arms):
+        total_seconds = sum(stats[1] for stats in arms.values())
+        if total_seconds <= 0:
+            return {arm: 1.0 for arm in arms}
+        # One pseudo-find at the average rate: arms without data score like the average
+        rate = (sum(stats[2] for stats in arms.values()) + 1) / total_seconds
+        scores = {arm: (stats[2] + 1) / (stats[1] + 1 / rate) for arm, stats in arms.items()}
+        total_score = sum(scores.values())
+        return {arm: (1 - EXPLORATION) * score / total_score + EXPLORATION / len(arms)
+                for arm, score in scores.items()}
+
+    def reweight(self):
+        self.operator_weights = self.weights(self.operators)
+        self.depth_weights = self.weights(self.depths)
+        for stats in list(self.operators.values()) + list(self.depths.values()):
+            stats[:] = [value * DECAY for value in stats]
+
+    def summary(self):
+        """Return the normalized weights with the statistics behind them, for the stats output."""
+        lines = []
+        for title, arms, weights in (("operator", self.operators, self.operator_weights),
+                                     ("depth", self.depths, self.depth_weights)):
+            total_weight = sum(weights.values()) or 1.0
+            for arm, (uses, seconds, finds) in arms.items():
+                lines.append(f"{title} {arm}: weight {weights[arm] / total_weight:.3f}, "
+                             f"{uses:.0f} uses, {finds:.1f} finds, {seconds:.1f} s")
+        return lines
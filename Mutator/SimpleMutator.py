@@ -1,9 +1,72 @@
 import random
+import weakref
+from collections import OrderedDict
+
 import networkx as nx
 
+from Mutator.MutationContext import MutationContext
+from Utils.ConversionCache import bump_version, graph_version
+from Utils.GraphOverlay import GraphOverlay
+
+# Number of graphs whose mutation context is kept (the mutant being built, its parent, corpus graphs combined with)
+MAX_CONTEXTS = 8
+
+
 class SimpleMutator:
     def __init__(self):
-        pass
+        self.contexts = OrderedDict()  # id(graph) -> (weakref to the graph, MutationContext), most recent last
+        self.operator_scheduler = None  # OperatorScheduler weighting the operations of stacked_mutate, if any
+        self.profile = None  # MutationProfile of the fuzzer's target, whose invariants every mutant keeps
+
+    def known_context(self, graph):
+        """Return the mutation context kept for a graph, or None if there is none or it is out of date."""
+        entry = self.contexts.get(id(graph))
+        if entry is not None and entry[0]() is graph and entry[1].matches(graph):
+            self.contexts.move_to_end(id(graph))
+            return entry[1]
+        return None
+
+    def context(self, graph):
+        """Return the mutation context of a graph, building it if the graph has none or changed without it."""
+        context = self.known_context(graph)
+        if context is None:
+            context = self.remember(graph, MutationContext(graph))
+        return context
+
+    def all_edges_weighted(self, graph):
+        # A single check does not pay for building the indexes of a graph that has none
+        context = self.known_context(graph)
+        if context is None:
+            return all('weight' in data for _, _, data in graph.edges(data=True))
+        return context.all_edges_weighted()
+
+    def has_negative_weight(self, graph):
+        context = self.known_context(graph)
+        if context is None:
+            return any(data.get('weight', 0) < 0 for _, _, data in graph.edges(data=True))
+        return context.has_negative_weight()
+
+    def remember(self, graph, context):
+        self.contexts[id(graph)] = (weakref.ref(graph), context)
+        self.contexts.move_to_end(id(graph))
+        while len(self.contexts) > MAX_CONTEXTS:
+            self.contexts.popitem(last=False)
+        return context
+
+    def copy(self, graph):
+        """Copy a graph to mutate it; the copy starts with a copy of the graph's context instead of a rescan."""
+        context = self.context(graph)
+        copied = graph.share() if isinstance(graph, GraphOverlay) else graph.copy()
+        self.remember(copied, context.copy())
+        return copied
+
+    def bump(self, graph):
+        """Bump the mutation version of a graph the operators changed, keeping its context valid."""
+        bump_version(graph)
+        entry = self.contexts.get(id(graph))
+        if entry is not None and entry[0]() is graph:
+            entry[1].version = graph_version(graph)
+        return graph
 
     def mutate(self, graph):
         mutation_operations = [
@@ -13,7 +76,32 @@ class SimpleMutator:
             self.delete_edge
         ]
         mutation = random.choice(mutation_operations)
-        return mutation(graph)
+        return self.bump(self.keep_profile(mutation(graph)))
+
+    def keep_profile(self, graph):
+        """Reconnect a mutant that removals split, when the profile asks for a connected graph."""
+        if self.profile is None or not self.profile.connected:
+            return graph
+        if not len(graph):
+            self.add_node(graph)
+        for u, v in self.profile.connecting_edges(graph):
+            self.profiled_edge(graph, u, v, weight=random.randint(1, 500))
+        return graph
+
+    def profiled_edge(self, graph, u, v, **attr):
+        """Add an edge as the profile admits it, through the graph's context if it has one."""
+        if self.profile is not None:
+            edge = self.profile.admit_edge(graph, u, v, attr)
+            if edge is None:
+                return
+            u, v, attr = edge
+        context = self.known_context(graph)
+        if context is not None:
+            context.add_edge(graph, u, v, **attr)
+        else:
+            graph.add_edge(u, v, **attr)
+        if self.profile is not None:
+            self.profile.edge_added(graph, u, v)
 
     def nx_has_weighted_edges(self, nx_graph):
         for _, _, data in nx_graph.edges(data=True):
@@ -22,25 +110,38 @@ class SimpleMutator:
         return False
 
     def add_node(self, graph):
-        new_node = max(graph.nodes) + 1 if graph.nodes else 0
-        graph.add_node(new_node)
+        context = self.known_context(graph)
+        if context is None:
+            # Node operators do not pay for building the indexes of a graph that has none
+            new_node = max(graph.nodes) + 1 if graph.nodes else 0
+            graph.add_node(new_node)
+        else:
+            new_node = context.max_node() + 1 if context.nodes else 0
+            context.add_node(graph, new_node)
+        if self.profile is not None:
+            self.profile.node_added(graph, new_node)
         return graph
 
     def delete_node(self, graph):
-        if graph.nodes:
-            node_to_remove = random.choice(list(graph.nodes))
-            graph.remove_node(node_to_remove)
+        context = self.known_context(graph)
+        if context is None:
+            if graph.nodes:
+                graph.remove_node(random.choice(list(graph.nodes)))
+        elif context.nodes:
+            node_to_remove = context.random_node()
+            context.remove_node(graph, node_to_remove)
         return graph
 
     def add_edge(self, graph):
-        nodes = list(graph.nodes)
+        context = self.context(graph)
+        nodes = context.nodes
         if not nodes:
-            graph.add_node(0)
-            graph.add_node(1)
+            context.add_node(graph, 0)
+            context.add_node(graph, 1)
             node1, node2 = 0, 1
         elif len(nodes) == 1:
-            graph.add_node(max(nodes) + 1)
-            node1, node2 = nodes[0], max(nodes)
+            node1 = node2 = nodes[0]
+            context.add_node(graph, node1 + 1)
         else:
             attempts = 0
             max_attempts = 100
@@ -52,20 +153,21 @@ class SimpleMutator:
                     attempts += 1
             if attempts == max_attempts:
                 # Handle the case where a new edge couldn't be added after max_attempts
-                new_node = max(graph.nodes) + 1
-                graph.add_node(new_node)
+                new_node = context.max_node() + 1
                 node1 = new_node
                 node2 = random.choice(nodes)
+                context.add_node(graph, new_node)
 
         # If the graph has edge weights, assign a weight
         weight = random.randint(1, 500)
-        if any(data.get('weight', 0) < 0 for _, _, data in graph.edges(data=True)):
+        if context.has_negative_weight():
             weight *= random.choice([-1, 1])
-        graph.add_edge(node1, node2, weight=weight)
+        self.profiled_edge(graph, node1, node2, weight=weight)
         return graph
 
     def delete_edge(self, graph):
-        if graph.edges:
-            edge_to_remove = random.choice(list(graph.edges))
-            graph.remove_edge(*edge_to_remove)
+        context = self.context(graph)
+        if context.edges:
+            edge_to_remove = context.random_edge()
+            context.remove_edge(graph, edge_to_remove)
         return graph
\ No newline at end of file
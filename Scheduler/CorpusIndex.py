@@ -0,0 +1,184 @@
+import os
+import time
+import random
+import sqlite3
+
+# Name of the index in the folder of the corpus, next to its segments
+INDEX_NAME = "corpus.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS graphs (
+    id INTEGER PRIMARY KEY,         -- Number of the graph in the scheduler, from 1
+    record INTEGER NOT NULL,        -- Record of the SegmentStore holding the graph
+    nodes INTEGER NOT NULL,
+    edges INTEGER NOT NULL,
+    directed INTEGER NOT NULL,
+    multigraph INTEGER NOT NULL,
+    weighted INTEGER NOT NULL,      -- Every edge has a weight
+    negative INTEGER NOT NULL,      -- Some edge has a negative weight
+    exec_time REAL,                 -- Seconds the executor ran on the graph, NULL if it was not run
+    new_coverage INTEGER,           -- Lines, arcs or hit count slots it was the first to reach
+    parent INTEGER,                 -- Graph it was mutated from, NULL for the initial graphs
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS graphs_size ON graphs (nodes, edges);
+CREATE INDEX IF NOT EXISTS graphs_exec_time ON graphs (exec_time);
+CREATE INDEX IF NOT EXISTS graphs_new_coverage ON graphs (new_coverage);
+CREATE INDEX IF NOT EXISTS graphs_timestamp ON graphs (timestamp);
+"""
+
+# Filters accepted by select and random_id, and the condition each one adds
+FILTERS = {
+    'max_nodes': 'nodes <= ?',
+    'max_edges': 'edges <= ?',
+    'max_exec_time': 'exec_time <= ?',
+    'min_new_coverage': 'new_coverage >= ?',
+    'directed': 'directed = ?',
+    'multigraph': 'multigraph = ?',
+    'weighted': 'weighted = ?',
+    'negative': 'negative = ?',
+    'since': 'timestamp >= ?',
+    'until': 'timestamp < ?',
+}
+
+
+def index_path(folder):
+    return os.path.join(folder, INDEX_NAME)
+
+
+def parse_query(text):
+    """Parse filters written as "max_nodes=50,max_exec_time=0.01,min_new_coverage=1"."""
+    filters = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name not in FILTERS or not value:
+            raise ValueError(f"Unknown corpus filter: {item}")
+        filters[name] = float(value)
+    return filters
+
+
+def graph_metadata(graph):
+    """Return (nodes, edges, directed, multigraph, weighted, negative) of a networkx graph or a CompactGraph."""
+    if hasattr(graph, 'all_edges_weighted'):
+        weighted = graph.all_edges_weighted()
+        negative = graph.has_negative_weight()
+    else:
+        weights = [weight for *_, weight in graph.edges(data='weight')]
+        weighted = None not in weights
+        negative = any(weight is not None and weight < 0 for weight in weights)
+    return (graph.number_of_nodes(), graph.number_of_edges(), graph.is_directed(), graph.is_multigraph(),
+            weighted, negative)
+
+
+class CorpusIndex:
+    """SQLite table with the metadata of every graph of a corpus, and where its payload is.
+
+    The graphs themselves stay in the SegmentStore: a row holds the record
+    number of its graph next to the size, shape and weight flags of the graph,
+    how long the executor ran on it, how much new coverage it brought, the
+    graph it was mutated from and when it was added. The columns a scheduler
+    filters on are indexed, so that small, fast or productive graphs are
+    found without unpickling any of them, and time ranges are read without
+    walking the corpus. random_id keeps the numbers matching each set of
+    filters it was asked for, and a new row is checked against them by its
+    primary key, so that a pick does not query the table.
+
+    Rows are committed in groups, every commit_records rows or commit_seconds
+    seconds and when the index is closed; the store stays the source of truth
+    and a run that is killed loses only the rows of its last group.
+    """
+
+    def __init__(self, folder, commit_records=64, commit_seconds=1.0, read_only=False):
+        self.path = index_path(folder)
+        self.commit_records = commit_records
+        self.commit_seconds = commit_seconds
+        if read_only:
+            self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            os.makedirs(folder, exist_ok=True)
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+        self.matches = {}  # Sorted filters of random_id -> numbers of the graphs matching them
+
+    @staticmethod
+    def exists(folder):
+        return os.path.exists(index_path(folder))
+
+    @staticmethod
+    def clear(folder):
+        """Remove the index of a corpus, so that a new index starts empty."""
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(index_path(folder) + suffix):
+                os.remove(index_path(folder) + suffix)
+
+    def add(self, number, record, graph, timestamp, exec_time=None, new_coverage=None, parent=None):
+        self.connection.execute("INSERT INTO graphs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (number, record) + graph_metadata(graph) +
+                                (exec_time, new_coverage, parent, timestamp))
+        for key, numbers in self.matches.items():
+            clause, values = self.where(dict(key))
+            clause += " AND id = ?" if clause else " WHERE id = ?"
+            if self.connection.execute(f"SELECT 1 FROM graphs{clause}", values + [number]).fetchone():
+                numbers.append(number)
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_records or time.monotonic() - self.last_commit >= self.commit_seconds:
+            self.commit()
+
+    def commit(self):
+        if self.uncommitted:
+            self.connection.commit()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    @staticmethod
+    def where(filters):
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown corpus filters: {', '.join(sorted(unknown))}")
+        names = [name for name in FILTERS if filters.get(name) is not None]
+        clause = " WHERE " + " AND ".join(FILTERS[name] for name in names) if names else ""
+        return clause, [filters[name] for name in names]
+
+    def select(self, order_by="id", limit=None, **filters):
+        """Return the numbers of the graphs matching the filters, e.g. select(max_nodes=50, min_new_coverage=1)."""
+        clause, values = self.where(filters)
+        query = f"SELECT id FROM graphs{clause} ORDER BY {order_by}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [number for number, in self.connection.execute(query, values)]
+
+    def random_id(self, **filters):
+        """Return the number of a graph picked uniformly among those matching the filters, or None."""
+        key = tuple(sorted(filters.items()))
+        numbers = self.matches.get(key)
+        if numbers is None:
+            # ORDER BY random() would sort every match on each pick
+            numbers = self.matches[key] = self.select(**filters)
+        return random.choice(numbers) if numbers else None
+
+    def first_timestamp(self):
+        return self.connection.execute("SELECT MIN(timestamp) FROM graphs").fetchone()[0]
+
+    def time_range(self, since=None, until=None):
+        """Return (number, record, timestamp) of the graphs added in [since, until), in the order they were added."""
+        clause, values = self.where({'since': since, 'until': until})
+        return self.connection.execute(f"SELECT id, record, timestamp FROM graphs{clause} ORDER BY id",
+                                       values).fetchall()
+
+    def metadata(self, number):
+        """Return the row of graph `number` as a dict, or None."""
+        cursor = self.connection.execute("SELECT * FROM graphs WHERE id = ?", (number,))
+        row = cursor.fetchone()
+        return dict(zip((column[0] for column in cursor.description), row)) if row is not None else None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM graphs").fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -1,48 +1,137 @@
-import os
 import time
 import random
+from collections import OrderedDict
+
 import networkx as nx
 import pickle
 
+from Scheduler.CorpusIndex import CorpusIndex
+from Scheduler.SegmentStore import SegmentStore
+from Utils import GraphFormat
+from Utils.GraphOverlay import GraphOverlay
+
 
 class RandomDiskScheduler:
-    def __init__(self, folder_name):
+    """Corpus kept on disk in a SegmentStore, with an LRU of the graphs it unpickled.
+
+    The graphs are packed into a few append-only segment files of the folder
+    rather than written to one file each, which long parallel campaigns turned
+    into tens of thousands of files. A new scheduler clears the segments of a
+    previous run in its folder.
+
+    Disk is the source of truth: every graph is written when it is added, and
+    the cache only saves reading and unpickling it again. It is bounded by a
+    number of graphs and by the size of their pickles, and the most recently
+    added graphs are pinned in it since they are the most likely to be picked.
+    get_graph hands out the cached graph itself: callers copy it before they
+    change it (the fuzzing loop mutates a copy, combine_graphs copies the
+    graph it would trim), so that it keeps matching its file.
+
+    The metadata of every graph goes to a CorpusIndex next to the segments.
+    With a seed_query (filters of CorpusIndex.select), pick_seed picks the
+    graph to mutate among the ones matching it, and uniformly when none does
+    yet. get_graph, which combine_graphs uses for its second graph, always
+    picks uniformly.
+    """
+
+    def __init__(self, folder_name, cache_entries=256, cache_mb=64, pinned_graphs=16, seed_query=None):
         self.folder_name = folder_name
-        os.makedirs(self.folder_name, exist_ok=True)
+        SegmentStore.clear(self.folder_name)
+        CorpusIndex.clear(self.folder_name)
+        self.store = SegmentStore(self.folder_name)
+        self.index = CorpusIndex(self.folder_name)
+        self.seed_query = seed_query or {}
+        self.query_misses = 0  # Seed picks that fell back to a uniform choice because no graph matched seed_query
         self.start_time = time.time()
         self.graph_counter = 0
+        self.cache_entries = cache_entries
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self.cache = OrderedDict()  # graph number -> (graph, size of its pickle), least recently used first
+        self.cached_bytes = 0
+        self.pinned_graphs = pinned_graphs
+        self.pinned = OrderedDict()  # Numbers of the most recently added graphs, oldest first
+        self.cache_hits = 0
+        self.cache_misses = 0
 
-    def add_to_corpus(self, graphs):
+    def add_to_corpus(self, graphs, exec_time=None, new_coverage=None, parent=None):
+        """Add graphs with the metadata known about them and return the number of the last one."""
         if not isinstance(graphs, list):
             graphs = [graphs]  # Ensure graphs is a list
 
         for graph in graphs:
             self.graph_counter += 1
-            filename = f"graph_{self.graph_counter}.pkl"
-            file_path = os.path.join(self.folder_name, filename)
-            with open(file_path, 'wb') as f:
-                pickle.dump(graph, f)
+            data = GraphFormat.dumps(graph)
+            timestamp = time.time()
+            record = self.store.append(data, timestamp)  # Record graph_counter - 1
+            self.index.add(self.graph_counter, record, graph, timestamp, exec_time, new_coverage, parent)
+            self.pin(self.graph_counter)
+            # A copy, in case the caller goes on changing the graph it added
+            self.cache_graph(self.graph_counter, self.copy(graph), len(data))
+        return self.graph_counter
 
-    def get_graph(self):
+    @staticmethod
+    def copy(graph):
+        return graph.share() if isinstance(graph, GraphOverlay) else graph.copy()
+
+    def pin(self, number):
+        self.pinned[number] = None
+        while len(self.pinned) > self.pinned_graphs:
+            self.pinned.popitem(last=False)  # Stays cached, as a regular entry
+
+    def cache_graph(self, number, graph, size):
+        self.cache[number] = (graph, size)
+        self.cached_bytes += size
+        # Evict the least recently used graphs that are not pinned
+        for old_number in list(self.cache):
+            if len(self.cache) <= self.cache_entries and self.cached_bytes <= self.cache_bytes:
+                break
+            if old_number not in self.pinned:
+                self.cached_bytes -= self.cache.pop(old_number)[1]
+
+    def load_graph(self, number):
+        """Return graph `number`, from the cache or else from its file, caching it."""
+        entry = self.cache.get(number)
+        if entry is not None:
+            self.cache_hits += 1
+            self.cache.move_to_end(number)
+            return entry[0]
+        self.cache_misses += 1
+        data = self.store.read(number - 1)
+        graph = pickle.loads(data)
+        self.cache_graph(number, graph, len(data))
+        return graph
+
+    def pick(self):
+        """Return (number, graph) of a graph picked uniformly from the corpus."""
         if self.graph_counter == 0:
             raise ValueError("No graphs available in memory.")
 
-        random_index = random.randint(1, self.graph_counter)
-        file_path = os.path.join(self.folder_name, f"graph_{random_index}.pkl")
-        with open(file_path, 'rb') as f:
-            return pickle.load(f)
+        number = random.randint(1, self.graph_counter)
+        return number, self.load_graph(number)
+
+    def pick_seed(self):
+        """Return (number, graph) of the next graph to mutate, matching seed_query if one does."""
+        if not self.seed_query:
+            return self.pick()
+        number = self.index.random_id(**self.seed_query)
+        if number is None:
+            self.query_misses += 1
+            return self.pick()
+        return number, self.load_graph(number)
+
+    def get_graph(self):
+        return self.pick()[1]
 
     def close_current_file(self):
-        # This method is not required in this context
-        pass
+        # Commit the graphs and rows added since the last group commit
+        self.store.sync()
+        self.index.commit()
 
     def iterate_graphs(self):
-        # Iterate over all graphs in the folder and yield them along with their filenames
+        # Iterate over all graphs in the order they were added
         for i in range(1, self.graph_counter + 1):
-            file_path = os.path.join(self.folder_name, f"graph_{i}.pkl")
-            with open(file_path, 'rb') as f:
-                graph = pickle.load(f)
-                yield graph
+            entry = self.cache.get(i)
+            yield self.copy(entry[0]) if entry is not None else pickle.loads(self.store.read(i - 1))
 
 
 # Example usage
@@ -63,3 +152,8 @@ if __name__ == "__main__":
     # Iterate over all graphs
     for graph in scheduler.iterate_graphs():
         print("Iterated Graph:", graph)
+
+    # Pick the graph to mutate among the small graphs only
+    scheduler.seed_query = {'max_nodes': 4}
+    print("Small Graph:", scheduler.pick_seed()[1])
+    scheduler.close_current_file()
@@ -1,20 +1,95 @@
+import mmap
 import os
 import pickle
+import struct
 import time
 import uuid
+from bisect import bisect_right
 
 import networkx as nx
 import random
 
+from Utils import GraphFormat
+
+# Byte offsets of the records in a batch's sidecar index, one little-endian uint64 per record
+OFFSET_FORMAT = '<Q'
+OFFSET_SIZE = struct.calcsize(OFFSET_FORMAT)
+
+
+def index_path(batch_path):
+    return os.path.splitext(batch_path)[0] + '.idx'
+
+
+class BatchFile:
+    """Read side of a batch file: a record is found through the sidecar index and read through mmap.
+
+    The writer appends each record's offset to the index once the record is
+    flushed, so every offset in the index points to a complete record, also
+    while the batch is still being written. Both files are mapped read-only;
+    concurrent readers share the page cache instead of each reading the file,
+    and the maps are renewed when the files have grown.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = index_path(path)
+        self.data = None
+        self.index = None
+        self.indexed = 0  # Records covered by the current maps
+
+    @staticmethod
+    def map(path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else None
+
+    def refresh(self):
+        # The data is mapped after the index, so it holds every record the index lists
+        self.close()
+        self.index = self.map(self.index_path)
+        self.data = self.map(self.path)
+        self.indexed = len(self.index) // OFFSET_SIZE if self.index is not None else 0
+
+    def __len__(self):
+        if os.path.getsize(self.index_path) // OFFSET_SIZE != self.indexed:
+            self.refresh()
+        return self.indexed
+
+    def record(self, position):
+        """Return the (counter, timestamp, graph) record at a position of the batch."""
+        if position >= self.indexed:
+            self.refresh()
+            if position >= self.indexed:
+                raise IndexError(f"{self.path} has no record {position}.")
+        offset = struct.unpack_from(OFFSET_FORMAT, self.index, position * OFFSET_SIZE)[0]
+        self.data.seek(offset)
+        return pickle.load(self.data)
+
+    def records(self, start=0, stop=None):
+        """Yield the records from position start up to stop (the end of the batch if None)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for position in range(start, stop):
+            yield self.record(position)
+
+    def close(self):
+        for mapped in (self.data, self.index):
+            if mapped is not None:
+                mapped.close()
+        self.data = self.index = None
+        self.indexed = 0
+
 
 class RandomDiskSchedulerUpdated:
     def __init__(self, batch_prefix, start_time, batch_size=1000, corpus_dir='../Corpus_Data'):
         self.current_file = None
+        self.current_index = None  # Sidecar index of the current batch
         self.batch_size = batch_size
         self.batch_prefix = batch_prefix
         self.corpus_dir = corpus_dir
         self.batch_id = 1
         self.graph_counter = 0
+        self.batch_starts = []  # Counter of the first graph of each batch, batch_id - 1 -> counter
+        self.batch_files = {}  # batch_id -> BatchFile, opened on first read
         self.start_time = start_time
         self.ensure_corpus_dir()
         self.instance_id = uuid.uuid4().hex[:10]
@@ -24,90 +99,100 @@ class RandomDiskSchedulerUpdated:
         if not os.path.exists(self.corpus_dir):
             os.makedirs(self.corpus_dir)
 
-    def add_to_corpus(self, graph):
+    def batch_path(self, batch_id):
+        return os.path.join(self.corpus_dir, f'{self.batch_prefix}_{self.instance_id}_batch_{batch_id}.pkl')
+
+    def add_to_corpus(self, graphs):
+        if not isinstance(graphs, list):
+            graphs = [graphs]  # Ensure graphs is a list
+
+        for graph in graphs:
+            self.add_graph(graph)
+
+    def add_graph(self, graph):
         timestamp = time.time() - self.start_time
         self.graph_counter += 1
         # print(f'self.graph_counter{self.graph_counter}')
 
         # Open a new file if starting a new batch
         if self.graph_counter % self.batch_size == 1 or self.current_file is None:
-            if self.current_file is not None:
-                self.current_file.close()
-            file_path = os.path.join(self.corpus_dir,
-                                     f'{self.batch_prefix}_{self.instance_id}_batch_{self.batch_id}.pkl')
+            self.close_current_file()
+            file_path = self.batch_path(self.batch_id)
             self.current_file = open(file_path, 'wb')
+            self.current_index = open(index_path(file_path), 'wb')
+            self.batch_starts.append(self.graph_counter)
             self.batch_id += 1
 
-        # Write the graph to the file
-        pickle.dump((self.graph_counter, timestamp, graph), self.current_file)
+        # Write the graph to the file, then its offset to the index once the record is complete
+        offset = self.current_file.tell()
+        GraphFormat.dump((self.graph_counter, timestamp, graph), self.current_file)
         self.current_file.flush()
+        self.current_index.write(struct.pack(OFFSET_FORMAT, offset))
+        self.current_index.flush()
 
         # Close the file if the batch is complete
         if self.graph_counter % self.batch_size == 0:
-            self.current_file.close()
-            self.current_file = None
+            self.close_current_file()
 
     def close_current_file(self):
         if self.current_file is not None:
             self.current_file.close()
+            self.current_index.close()
             self.current_file = None
+            self.current_index = None
+
+    def batch_file(self, batch_id):
+        batch = self.batch_files.get(batch_id)
+        if batch is None:
+            file_path = self.batch_path(batch_id)
+            if not os.path.exists(file_path) or not os.path.exists(index_path(file_path)):
+                raise ValueError("Selected batch file does not exist.")
+            batch = self.batch_files[batch_id] = BatchFile(file_path)
+        return batch
+
+    def locate(self, number):
+        """Return (batch_id, position in the batch) of the graph with counter `number`."""
+        batch_id = bisect_right(self.batch_starts, number)
+        return batch_id, number - self.batch_starts[batch_id - 1]
 
     def get_graph(self):
         if self.graph_counter == 0:
             raise ValueError("No graphs available.")
 
-        # Randomly select a batch file
-        selected_batch_id = random.randint(1, self.batch_id - 1)
-        file_name = f'{self.batch_prefix}_{self.instance_id}_batch_{selected_batch_id}.pkl'
-        file_path = os.path.join(self.corpus_dir, file_name)
-
-        if os.path.exists(file_path):
-            with open(file_path, 'rb') as f:
-                # Load all graphs from the selected file
-                graphs = []
-                while True:
-                    try:
-                        _, _, graph = pickle.load(f)
-                        graphs.append(graph)
-                    except EOFError:
-                        break
-
-                # Randomly select a graph from the loaded graphs
-                if graphs:
-                    graph = random.choice(graphs)
-                    return graph
-                else:
-                    # print(file_name)
-                    raise ValueError("Selected batch file is empty.")
-
-        else:
-            raise ValueError("Selected batch file does not exist.")
-
-    def iterate_graphs(self):
-        # Iterate over all saved files and yield graphs along with their timestamps
-        for batch_id in range(1, self.batch_id):
-            file_name = f'{self.batch_prefix}_{self.instance_id}_batch_{batch_id}.pkl'
-            file_path = os.path.join(self.corpus_dir, file_name)
-            if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    graph_count = 0
-                    while True:
-                        try:
-                            _, timestamp, graph = pickle.load(f)
-                            graph_count += 1
-                            batch_graph_id = f"Batch {batch_id}, Graph {graph_count}"
-                            yield timestamp, graph, batch_graph_id
-                        except EOFError:
-                            #  print("EOFError")
-                            break
+        # Every graph is equally likely, and reading it is one seek in the mapped batch file
+        batch_id, position = self.locate(random.randint(1, self.graph_counter))
+        return self.batch_file(batch_id).record(position)[2]
+
+    def iterate_graphs(self, start=0, stop=None):
+        """Yield (timestamp, graph, batch_graph_id) for the graphs numbered start up to stop, in the order added.
+
+        Graphs are numbered from 0 like a list; the scan starts at `start`
+        through the index instead of reading the batches before it.
+        """
+        stop = self.graph_counter if stop is None else min(stop, self.graph_counter)
+        number = start + 1
+        while number <= stop:
+            batch_id, position = self.locate(number)
+            next_start = self.batch_starts[batch_id] if batch_id < len(self.batch_starts) else self.graph_counter + 1
+            count = min(next_start, stop + 1) - number
+            try:
+                batch = self.batch_file(batch_id)
+            except ValueError:
+                number += count  # The batch file was removed
+                continue
+            for graph_count, (_, timestamp, graph) in enumerate(batch.records(position, position + count),
+                                                                position + 1):
+                batch_graph_id = f"Batch {batch_id}, Graph {graph_count}"
+                yield timestamp, graph, batch_graph_id
+            number += count
 
 # Usage
 # scheduler = RandomDiskScheduler(batch_prefix='stpl', start_time=time.time())
 # for _ in range(12000):  # Adding 12000 graphs for demonstration
 #     scheduler.add_to_corpus(nx.gnm_random_graph(5, 10))
 # scheduler.close_current_file()  # Close the file after adding all graphs
-# for timestamp, graph in scheduler.iterate_graphs():
+# for timestamp, graph, batch_graph_id in scheduler.iterate_graphs(start=0, stop=100):
 #     print(f"Timestamp: {timestamp}, Graph: {graph}")
 # Get a random graph
-# timestamp, graph = scheduler.get_graph()
-# print(f"Timestamp: {timestamp}, Graph: {graph}")
+# graph = scheduler.get_graph()
+# print(f"Graph: {graph}")
@@ -0,0 +1,186 @@
+import os
+import re
+import struct
+import time
+import zlib
+
+# Header of a record in a segment: payload length, CRC-32 of the payload, timestamp
+RECORD_HEADER = struct.Struct('<IId')
+# Entry of a segment's index: offset and length of the record's payload, timestamp
+INDEX_ENTRY = struct.Struct('<QId')
+SEGMENT_PATTERN = re.compile(r'segment_(\d+)\.dat$')
+
+
+def segment_path(folder, segment):
+    return os.path.join(folder, f"segment_{segment:06d}.dat")
+
+
+def segment_index_path(folder, segment):
+    return os.path.join(folder, f"segment_{segment:06d}.idx")
+
+
+class SegmentStore:
+    """Append-only store of byte records, packed into a few large segment files instead of one file per record.
+
+    Each record is written at the end of the current segment with a header
+    holding its length, a CRC-32 of its payload and its timestamp, and its
+    (offset, length, timestamp) is then appended to the segment's index. A
+    segment is sealed once it reaches segment_mb and the next one is started.
+    Writes go straight to the page cache, where readers see them at once;
+    fsync is group-committed every sync_records records or sync_seconds
+    seconds, whichever comes first, and when the store is closed.
+
+    Sealed segments were synced before the next one was started. On opening,
+    the last segment is scanned instead of trusting its index: records are
+    kept up to the first one that is torn or fails its CRC, and the index is
+    rebuilt from them. A writer then truncates the torn tail; a read-only
+    store only ignores it.
+    """
+
+    def __init__(self, folder, segment_mb=64, sync_records=64, sync_seconds=1.0, read_only=False):
+        self.folder = folder
+        self.segment_bytes = segment_mb * 1024 * 1024
+        self.sync_records = sync_records
+        self.sync_seconds = sync_seconds
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(self.folder, exist_ok=True)
+        self.entries = []  # Record number -> (segment, offset, length, timestamp)
+        self.readers = {}  # segment -> file descriptor open for reading
+        self.data = None  # File descriptors of the segment being written and of its index
+        self.index = None
+        self.segment = 0  # Segment being written
+        self.segment_size = 0
+        self.unsynced = 0  # Records written since the last fsync
+        self.last_sync = time.monotonic()
+        self.recovered = 0  # Bytes of torn records dropped from the tail when the store was opened
+        self.open_segments()
+
+    @staticmethod
+    def exists(folder):
+        return os.path.isdir(folder) and any(SEGMENT_PATTERN.match(name) for name in os.listdir(folder))
+
+    @staticmethod
+    def clear(folder):
+        """Remove the segments of a store, so that a new store starts empty."""
+        if not os.path.isdir(folder):
+            return
+        for name in os.listdir(folder):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                os.remove(os.path.join(folder, name))
+                index = segment_index_path(folder, int(match.group(1)))
+                if os.path.exists(index):
+                    os.remove(index)
+
+    def open_segments(self):
+        segments = sorted(int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(self.folder))
+                          if match) if os.path.isdir(self.folder) else []
+        for segment in segments[:-1]:
+            self.load_index(segment)
+        if segments:
+            self.segment = segments[-1]
+            self.recover(self.segment)
+        if not self.read_only:
+            self.open_writer(self.segment)
+
+    def load_index(self, segment):
+        with open(segment_index_path(self.folder, segment), 'rb') as f:
+            index = f.read()
+        for position in range(0, len(index) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+            self.entries.append((segment,) + INDEX_ENTRY.unpack_from(index, position))
+
+    def recover(self, segment):
+        """Rebuild the index of the last segment from its valid records, dropping a torn tail."""
+        path = segment_path(self.folder, segment)
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        entries = []
+        while offset + RECORD_HEADER.size <= len(data):
+            length, checksum, timestamp = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > len(data) or zlib.crc32(data[start:start + length]) != checksum:
+                break
+            entries.append((start, length, timestamp))
+            offset = start + length
+        self.entries.extend((segment,) + entry for entry in entries)
+        self.segment_size = offset
+        self.recovered = len(data) - offset
+        if self.read_only:
+            return
+        if self.recovered:
+            print(f"Dropping {self.recovered} bytes of torn records at the end of {path}.")
+            os.truncate(path, offset)
+        with open(segment_index_path(self.folder, segment), 'wb') as f:
+            f.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def open_writer(self, segment):
+        self.segment = segment
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        self.data = os.open(segment_path(self.folder, segment), flags)
+        self.index = os.open(segment_index_path(self.folder, segment), flags)
+        self.segment_size = os.fstat(self.data).st_size
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, payload, timestamp=None):
+        """Append a record and return its number; it is durable once the next group commit has run."""
+        if self.read_only:
+            raise ValueError(f"The store in {self.folder} was opened read-only.")
+        if self.segment_size >= self.segment_bytes:
+            self.seal()
+        timestamp = time.time() if timestamp is None else timestamp
+        offset = self.segment_size + RECORD_HEADER.size
+        os.write(self.data, RECORD_HEADER.pack(len(payload), zlib.crc32(payload), timestamp) + payload)
+        os.write(self.index, INDEX_ENTRY.pack(offset, len(payload), timestamp))
+        self.segment_size = offset + len(payload)
+        self.entries.append((self.segment, offset, len(payload), timestamp))
+        self.unsynced += 1
+        if self.unsynced >= self.sync_records or time.monotonic() - self.last_sync >= self.sync_seconds:
+            self.sync()
+        return len(self.entries) - 1
+
+    def sync(self):
+        """Group commit: flush every record written since the last one to disk."""
+        if self.data is not None and self.unsynced:
+            os.fsync(self.data)
+            os.fsync(self.index)
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def seal(self):
+        self.sync()
+        os.close(self.data)
+        os.close(self.index)
+        self.open_writer(self.segment + 1)
+
+    def reader(self, segment):
+        fd = self.readers.get(segment)
+        if fd is None:
+            fd = self.readers[segment] = os.open(segment_path(self.folder, segment), os.O_RDONLY)
+        return fd
+
+    def read(self, number):
+        """Return the payload of record `number`."""
+        segment, offset, length, _ = self.entries[number]
+        return os.pread(self.reader(segment), length, offset)
+
+    def timestamp(self, number):
+        return self.entries[number][3]
+
+    def iterate(self, start=0):
+        """Yield (number, timestamp, payload) for the records from `start` on, in the order they were added."""
+        for number in range(start, len(self.entries)):
+            yield number, self.entries[number][3], self.read(number)
+
+    def close(self):
+        self.sync()
+        for fd in [self.data, self.index] + list(self.readers.values()):
+            if fd is not None:
+                os.close(fd)
+        self.data = self.index = None
+        self.readers = {}
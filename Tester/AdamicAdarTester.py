@@ -9,7 +9,7 @@ import pickle
 from matplotlib import pyplot as plt
 
 from Utils.FileUtils import save_discrepancy
-from Utils.GraphConverter import GraphConverter
+from Utils.ConversionCache import conversion_cache
 
 
 class AdamicAdarTester:
@@ -41,8 +41,7 @@ class AdamicAdarTester:
         nx_pairs = nx.adamic_adar_index(G, ebunch=all_pairs)
 
         # Convert NetworkX graph to iGraph
-        converter = GraphConverter(G)
-        G_ig = converter.to_igraph()
+        G_ig = conversion_cache.to_igraph(G)
 
         # iGraph Adamic-Adar
         # mode = "in" if G.is_directed() else "all"
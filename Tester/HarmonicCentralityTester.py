@@ -7,7 +7,7 @@ import igraph as ig
 import pickle
 
 from Utils.FileUtils import save_discrepancy
-from Utils.GraphConverter import GraphConverter
+from Utils.ConversionCache import conversion_cache
 
 
 class HarmonicCentralityTester:
@@ -17,8 +17,8 @@ class HarmonicCentralityTester:
         self.uuid = uuid.uuid4().hex[:8]
         print(f'Bug file id: {self.uuid}')
 
-    def test_single_graph(self, G):
-        discrepancies = self.test_harmonic_centrality_algorithms(G)
+    def test_single_graph(self, G, nx_centrality=None):
+        discrepancies = self.test_harmonic_centrality_algorithms(G, nx_centrality)
         if discrepancies:
             discrepancy_count = len(discrepancies)  # Count the discrepancies
             discrepancy_msg = f"Results of NetworkX and iGraph are different for a graph!"
@@ -27,8 +27,8 @@ class HarmonicCentralityTester:
             return discrepancy_msg, G, discrepancy_count
         return None, None, None
 
-    def test_harmonic_centrality_algorithms(self, G):
-        """Test harmonic centrality between networkx and igraph."""
+    def test_harmonic_centrality_algorithms(self, G, nx_centrality=None):
+        """Test harmonic centrality between networkx and igraph, reusing nx_centrality if it was already computed."""
 
         def contains_negative_or_nan_weight(graph):
             for u, v, data in graph.edges(data=True):
@@ -44,13 +44,13 @@ class HarmonicCentralityTester:
             return discrepancies
         else:
             # Compute harmonic centrality with networkx
-            nx_centrality = nx.harmonic_centrality(G, distance='weight')
+            if nx_centrality is None:
+                nx_centrality = nx.harmonic_centrality(G, distance='weight')
             # print(nx_centrality)
             # print(f"{nx.harmonic_centrality(G, distance='weight')}")
 
             # Convert NetworkX graph to iGraph
-            converter = GraphConverter(G)
-            G_ig = converter.to_igraph()
+            G_ig = conversion_cache.to_igraph(G)
 
             # Determine the mode based on whether the graph is directed or not
             mode = "in" if G.is_directed() else "all"
@@ -6,7 +6,7 @@ import igraph as ig
 import pickle
 
 from Utils.FileUtils import save_discrepancy
-from Utils.GraphConverter import GraphConverter
+from Utils.ConversionCache import conversion_cache
 
 class JaccardSimilarityTester:
 
@@ -31,16 +31,12 @@ class JaccardSimilarityTester:
         nx_jaccard = list(nx.jaccard_coefficient(G))
 
         # Convert NetworkX graph to iGraph
-        converter = GraphConverter(G)
-        G_ig = converter.to_igraph()
+        conversion = conversion_cache.get(G)
+        G_ig = conversion.igraph
 
         # Compute Jaccard similarity with igraph for each pair (u, v) in nx_jaccard
         # The similarity_jaccard function in igraph expects vertex IDs, so need to map node names to IDs
-        if len(G_ig.vs) == 0:
-            # print("empty")
-            vertex_id_map = {}
-        else:
-            vertex_id_map = {str(node): idx for idx, node in enumerate(G_ig.vs['name'])}
+        vertex_id_map = conversion.name_index
         ig_jaccard_results = []
         for u, v, p in nx_jaccard:
             u_id, v_id = vertex_id_map[str(u)], vertex_id_map[str(v)]
@@ -7,7 +7,7 @@ import pickle
 from networkx.algorithms.flow import edmonds_karp, shortest_augmenting_path, dinitz, boykov_kolmogorov, preflow_push
 
 from Utils.FileUtils import save_discrepancies
-from Utils.GraphConverter import GraphConverter
+from Utils.ConversionCache import conversion_cache
 
 
 class MAXFVTester:
@@ -62,12 +62,12 @@ class MAXFVTester:
         }
         results = {}
 
-        # Convert NetworkX graph to iGraph
-        converter = GraphConverter(G)
-        G_ig = converter.to_igraph()
+        # Convert NetworkX graph to iGraph; the conversion is shared by all runs on G
+        conversion = conversion_cache.get(G)
+        G_ig = conversion.igraph
         # Find iGraph indices for source and target
-        source_ig = G_ig.vs.find(name=str(source)).index
-        target_ig = G_ig.vs.find(name=str(target)).index
+        source_ig = conversion.node_index[source]
+        target_ig = conversion.node_index[target]
 
         for algo_name, algo_func in algorithms.items():
             try:
@@ -6,7 +6,7 @@ import pickle
 import igraph as ig
 
 from Utils.FileUtils import save_discrepancies, save_discrepancy
-from Utils.GraphConverter import GraphConverter
+from Utils.ConversionCache import conversion_cache
 
 
 class MaxMatchingTester:
@@ -32,14 +32,10 @@ class MaxMatchingTester:
         types = [node in sets[0] for node in nx_graph.nodes()]
 
         # Convert NetworkX graph to iGraph
-        converter = GraphConverter(nx_graph)
-        g = converter.to_igraph()
+        g = conversion_cache.to_igraph(nx_graph)
 
-        # Set the 'type' attribute for each vertex in iGraph
-        g.vs['type'] = types
-
-        # Compute the maximum bipartite matching
-        matching = g.maximum_bipartite_matching()
+        # Compute the maximum bipartite matching; the types are passed in, the cached graph must not be modified
+        matching = g.maximum_bipartite_matching(types=types)
         matching_size = sum(1 for i in range(g.vcount()) if matching.is_matched(i))
         return matching_size
 
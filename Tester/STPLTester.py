@@ -6,7 +6,7 @@ import networkx as nx
 import pickle
 
 from Utils.FileUtils import save_discrepancies, save_discrepancy
-from Utils.GraphConverter import GraphConverter
+from Utils.ConversionCache import conversion_cache
 
 
 class STPLTester:
@@ -140,11 +140,11 @@ class STPLTester:
         for u, v, data in G.edges(data=True):
             data.setdefault('weight', 1)
 
-        # Convert NetworkX graph to iGraph, if necessary
-        converter = GraphConverter(G)
-        G_ig = converter.to_igraph()
-        source_ig = G_ig.vs.find(name=str(source)).index
-        target_ig = G_ig.vs.find(name=str(target)).index
+        # Convert NetworkX graph to iGraph; the conversion is shared by all pairs tested on G
+        conversion = conversion_cache.get(G)
+        G_ig = conversion.igraph
+        source_ig = conversion.node_index[source]
+        target_ig = conversion.node_index[target]
 
         for algo_name, algo_func in algorithms.items():
             try:
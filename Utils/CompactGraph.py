@@ -0,0 +1,260 @@
+import igraph as ig
+import networkx as nx
+import numpy as np
+
+from Utils.GraphConverter import GraphConverter
+
+
+class CompactGraph:
+    """Array-backed graph the fuzzer mutates instead of networkx graphs.
+
+    Node ids live in one int64 array and the edges in parallel arrays (src,
+    dst, weight, a mask of the edges that carry a weight and, for multigraphs,
+    the networkx edge key). Undirected edges are stored once. Node attributes,
+    which only a few corpora use, are kept in a dict per node.
+
+    The arrays are never written in place: every mutation replaces the arrays
+    it changes. A copy can therefore share all of them, which makes copy() O(1),
+    and a mutation costs a few vectorized array operations instead of walking
+    the dict-of-dicts of a networkx graph. Graphs are materialized with
+    to_networkx() (or to_igraph()) only when they are executed.
+    """
+
+    __slots__ = ('nodes', 'src', 'dst', 'weight', 'weighted', 'keys', 'directed', 'multigraph', 'node_attrs',
+                 'graph')
+
+    def __init__(self, directed=False, multigraph=False):
+        self.nodes = np.empty(0, dtype=np.int64)
+        self.src = np.empty(0, dtype=np.int64)
+        self.dst = np.empty(0, dtype=np.int64)
+        self.weight = np.empty(0, dtype=np.int64)  # Switches to float64 once a non-integer weight is stored
+        self.weighted = np.empty(0, dtype=bool)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.directed = directed
+        self.multigraph = multigraph
+        self.node_attrs = {}  # node -> attribute dict, only for nodes that have attributes
+        self.graph = {}  # Graph attributes, as in networkx
+
+    @classmethod
+    def from_networkx(cls, G):
+        compact = cls(directed=G.is_directed(), multigraph=G.is_multigraph())
+        compact.nodes = np.fromiter(G.nodes(), dtype=np.int64, count=len(G))
+        compact.node_attrs = {node: dict(data) for node, data in G.nodes(data=True) if data}
+        compact.graph = dict(G.graph)
+        if G.is_multigraph():
+            edges = list(G.edges(keys=True, data=True))
+            compact.keys = np.fromiter((key for _, _, key, _ in edges), dtype=np.int64, count=len(edges))
+            edge_data = [data for _, _, _, data in edges]
+        else:
+            edges = list(G.edges(data=True))
+            compact.keys = np.zeros(len(edges), dtype=np.int64)
+            edge_data = [data for _, _, data in edges]
+        if any(len(data) > (1 if 'weight' in data else 0) for data in edge_data):
+            raise ValueError("CompactGraph only keeps the 'weight' attribute of edges.")
+        compact.src = np.fromiter((edge[0] for edge in edges), dtype=np.int64, count=len(edges))
+        compact.dst = np.fromiter((edge[1] for edge in edges), dtype=np.int64, count=len(edges))
+        compact.weighted = np.fromiter(('weight' in data for data in edge_data), dtype=bool, count=len(edges))
+        weights = [data.get('weight', 0) for data in edge_data]
+        integral = all(isinstance(weight, (int, np.integer)) for weight in weights)
+        compact.weight = np.array(weights, dtype=np.int64 if integral else np.float64)
+        return compact
+
+    def to_networkx(self, create_using=None):
+        """Build the networkx graph, of class create_using if given (it must match directed and multigraph)."""
+        if create_using is not None:
+            G = create_using()
+        elif self.multigraph:
+            G = nx.MultiDiGraph() if self.directed else nx.MultiGraph()
+        else:
+            G = nx.DiGraph() if self.directed else nx.Graph()
+        G.graph.update(self.graph)
+        if self.weighted.all():
+            edge_data = [{'weight': weight} for weight in self.weight.tolist()]
+        elif not self.weighted.any():
+            edge_data = [{} for _ in range(len(self.weighted))]
+        else:
+            edge_data = [{'weight': weight} if weighted else {}
+                         for weight, weighted in zip(self.weight.tolist(), self.weighted.tolist())]
+        if self.multigraph:
+            G.add_nodes_from(self.nodes.tolist())
+            for node, data in self.node_attrs.items():
+                G.nodes[node].update(data)
+            G.add_edges_from(zip(self.src.tolist(), self.dst.tolist(), self.keys.tolist(), edge_data))
+            return G
+        # Fill the dicts of the simple graph directly, the way add_edges_from would, at a fraction of its cost
+        nodes = self.nodes.tolist()
+        G._node.update({node: {} for node in nodes})
+        for node, data in self.node_attrs.items():
+            G._node[node].update(data)
+        G._adj.update({node: {} for node in nodes})
+        successors = G._adj
+        if self.directed:
+            predecessors = G._pred
+            predecessors.update({node: {} for node in nodes})
+        else:
+            predecessors = successors
+        for u, v, data in zip(self.src.tolist(), self.dst.tolist(), edge_data):
+            successors[u][v] = data
+            predecessors[v][u] = data
+        return G
+
+    def to_igraph(self):
+        """Convert to iGraph the way GraphConverter.to_igraph does, straight from the arrays."""
+        if self.multigraph:
+            # Parallel edges are consolidated into weight lists; keep the one implementation of that
+            return GraphConverter(self.to_networkx()).to_igraph()
+        n = len(self.nodes)
+        vertex_attrs = {}
+        if n:
+            names = [str(node) for node in self.nodes.tolist()]
+            vertex_attrs['name'] = names
+            position = {node: index for index, node in enumerate(self.nodes.tolist())}
+            for attr_name in dict.fromkeys(attr_name for data in self.node_attrs.values() for attr_name in data):
+                values = list(names) if attr_name == 'name' else [None] * n
+                for node, data in self.node_attrs.items():
+                    if attr_name in data:
+                        values[position[node]] = data[attr_name]
+                vertex_attrs[attr_name] = values
+        edges = np.column_stack((self.positions(self.src), self.positions(self.dst)))
+        edge_attrs = {}
+        if len(edges):
+            edge_attrs['weight'] = np.where(self.weighted, self.weight, 1).tolist()
+        return ig.Graph(n=n, edges=edges.tolist(), directed=self.directed, vertex_attrs=vertex_attrs,
+                        edge_attrs=edge_attrs)
+
+    def copy(self):
+        # The arrays and the node attribute dict are replaced, never modified, so they can be shared
+        other = CompactGraph.__new__(CompactGraph)
+        for name in CompactGraph.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.graph = dict(self.graph)
+        return other
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return len(self.src)
+
+    def is_directed(self):
+        return self.directed
+
+    def is_multigraph(self):
+        return self.multigraph
+
+    def positions(self, ids):
+        """Return the positions of node ids in the nodes array."""
+        order = np.argsort(self.nodes, kind='stable')
+        return order[np.searchsorted(self.nodes, ids, sorter=order)]
+
+    def degrees(self):
+        """Return the degree of every node, in the order of the nodes array (self-loops count twice)."""
+        ends = np.concatenate((self.positions(self.src), self.positions(self.dst)))
+        return np.bincount(ends, minlength=len(self.nodes))
+
+    def edge_mask(self, u, v):
+        mask = (self.src == u) & (self.dst == v)
+        if not self.directed:
+            mask |= (self.src == v) & (self.dst == u)
+        return mask
+
+    def has_node(self, node):
+        return bool((self.nodes == node).any())
+
+    def has_edge(self, u, v):
+        return bool(self.edge_mask(u, v).any())
+
+    def add_node(self, node):
+        if not self.has_node(node):
+            self.nodes = np.append(self.nodes, np.int64(node))
+
+    def remove_nodes(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        self.nodes = self.nodes[~np.isin(self.nodes, nodes)]
+        self.keep_edges(~(np.isin(self.src, nodes) | np.isin(self.dst, nodes)))
+        if self.node_attrs:
+            removed = set(nodes.tolist())
+            self.node_attrs = {node: data for node, data in self.node_attrs.items() if node not in removed}
+
+    def add_edge(self, u, v, weight=None):
+        """Add an edge like networkx does: missing nodes are added, and an existing edge of a simple graph is updated."""
+        u, v = int(u), int(v)
+        self.add_node(u)
+        self.add_node(v)
+        mask = self.edge_mask(u, v)
+        if self.multigraph:
+            used = set(self.keys[mask].tolist())
+            key = len(used)
+            while key in used:
+                key += 1
+        elif mask.any():
+            if weight is not None:
+                self.set_weight(int(np.flatnonzero(mask)[0]), weight)
+            return
+        else:
+            key = 0
+        self.src = np.append(self.src, np.int64(u))
+        self.dst = np.append(self.dst, np.int64(v))
+        self.weight = np.append(self.weight, weight if weight is not None else 0)
+        self.weighted = np.append(self.weighted, weight is not None)
+        self.keys = np.append(self.keys, np.int64(key))
+
+    def set_weight(self, index, weight):
+        self.weight = np.array(self.weight, dtype=np.result_type(self.weight, np.asarray(weight)))
+        self.weight[index] = weight
+        self.weighted = self.weighted.copy()
+        self.weighted[index] = True
+
+    def remove_edge(self, index):
+        mask = np.ones(len(self.src), dtype=bool)
+        mask[index] = False
+        self.keep_edges(mask)
+
+    def keep_edges(self, mask):
+        self.src = self.src[mask]
+        self.dst = self.dst[mask]
+        self.weight = self.weight[mask]
+        self.weighted = self.weighted[mask]
+        self.keys = self.keys[mask]
+
+    def all_edges_weighted(self):
+        return bool(self.weighted.all())
+
+    def has_negative_weight(self):
+        return bool((self.weight[self.weighted] < 0).any())
+
+    def disjoint_union(self, other):
+        """Return the union with the nodes of both graphs relabeled to 0..n-1, like nx.disjoint_union."""
+        offset = len(self.nodes)
+        union = CompactGraph(directed=self.directed, multigraph=self.multigraph)
+        union.nodes = np.arange(offset + len(other.nodes), dtype=np.int64)
+        union.src = np.concatenate((self.positions(self.src), other.positions(other.src) + offset))
+        union.dst = np.concatenate((self.positions(self.dst), other.positions(other.dst) + offset))
+        union.weight = np.concatenate((self.weight, other.weight))
+        union.weighted = np.concatenate((self.weighted, other.weighted))
+        union.keys = np.concatenate((self.keys, other.keys))
+        for graph, first in ((self, 0), (other, offset)):
+            if graph.node_attrs:
+                position = {node: index for index, node in enumerate(graph.nodes.tolist())}
+                union.node_attrs.update({position[node] + first: dict(data) for node, data in graph.node_attrs.items()})
+        union.graph = {**self.graph, **other.graph}
+        if not union.multigraph and not union.directed and other.directed:
+            union.merge_duplicate_edges()
+        return union
+
+    def merge_duplicate_edges(self):
+        # The edges of a directed graph added to an undirected one may come in both directions;
+        # networkx keeps the first position and the data of the last occurrence
+        codes = np.minimum(self.src, self.dst) * (int(self.nodes.max(initial=0)) + 1) + np.maximum(self.src, self.dst)
+        _, first = np.unique(codes, return_index=True)
+        if len(first) == len(codes):
+            return
+        _, last_reversed = np.unique(codes[::-1], return_index=True)
+        last = len(codes) - 1 - last_reversed
+        order = np.argsort(first, kind='stable')
+        first, last = first[order], last[order]
+        self.src, self.dst, self.keys = self.src[first], self.dst[first], self.keys[first]
+        self.weight, self.weighted = self.weight[last], self.weighted[last]
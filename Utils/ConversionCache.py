@@ -0,0 +1,84 @@
+import weakref
+from collections import OrderedDict
+
+from Utils.GraphConverter import GraphConverter
+
+# Key in G.graph of the counter the mutators bump whenever they change a graph in place
+VERSION_KEY = "mutation_version"
+
+
+def graph_version(G):
+    return G.graph.get(VERSION_KEY, 0)
+
+
+def bump_version(G):
+    """Mark G as mutated so that its cached conversions are no longer used."""
+    G.graph[VERSION_KEY] = graph_version(G) + 1
+    conversion_cache.invalidate(G)
+    return G
+
+
+class Conversion:
+    """The iGraph form of a networkx graph, with the mappings the testers derive from it."""
+
+    def __init__(self, G):
+        self.igraph, self.node_index = GraphConverter(G).to_igraph_indexed()
+        # Vertex name (str(node)) -> vertex index, the last vertex winning like a dict built from vs['name']
+        self.name_index = {name: index for index, name in enumerate(self.igraph.vs['name'])} if len(G) else {}
+
+
+class ConversionCache:
+    """Small LRU of graph conversions, shared by all testers of a process.
+
+    A tester checks a mutant against igraph several times (STPL once per
+    source/target pair, MAXFV once per run, ...), and every check used to
+    convert the graph again. Entries are keyed on the identity of the graph,
+    its mutation version and its size; the graph itself is only referenced
+    weakly, and its entries go away with it.
+
+    The cached iGraph object is shared: callers must not modify it.
+    """
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (weakref to the graph, Conversion)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(G):
+        # The size guards against in-place changes made without bumping the version
+        return id(G), graph_version(G), G.number_of_nodes(), G.number_of_edges()
+
+    def get(self, G):
+        key = self.key(G)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0]() is G:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        conversion = Conversion(G)
+        self.entries[key] = (weakref.ref(G, lambda ref, key=key: self.discard(key, ref)), conversion)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return conversion
+
+    def to_igraph(self, G):
+        return self.get(G).igraph
+
+    def discard(self, key, ref):
+        # Called when a graph is collected; its id may already be reused by a newer entry
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is ref:
+            del self.entries[key]
+
+    def invalidate(self, G):
+        for key in [key for key in self.entries if key[0] == id(G)]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+
+conversion_cache = ConversionCache()
@@ -6,6 +6,10 @@ import coverage
 import re
 import networkx as nx
 
+from Scheduler.CorpusIndex import CorpusIndex
+from Scheduler.RandomDiskSchedulerUpdated import BatchFile, index_path
+from Scheduler.SegmentStore import SegmentStore
+
 
 class CoverageCalculator:
     def __init__(self, first_graph_timestamp):
@@ -47,12 +51,44 @@ class CoverageCalculator:
                     executed_lines.add((filename, line))
         return executed_lines
 
+    @staticmethod
+    def load_graphs_from_index(folder, since=None, until=None):
+        """Load the graphs of a RandomDiskScheduler folder added between since and until seconds after its first one.
+
+        Only the records in the range are read, looked up in the corpus index.
+        Returns the graphs and the timestamp of the first graph of the corpus.
+        """
+        index = CorpusIndex(folder, read_only=True)
+        start = index.first_timestamp()
+        rows = index.time_range(start + since if since is not None else None,
+                                start + until if until is not None else None) if start is not None else []
+        index.close()
+        store = SegmentStore(folder, read_only=True)
+        graphs = [(pickle.loads(store.read(record)), f"graph {number}", timestamp)
+                  for number, record, timestamp in rows if record < len(store)]
+        store.close()
+        return graphs, start
+
     @staticmethod
     def load_graphs_from_folder(folder):
+        if SegmentStore.exists(folder):
+            # The segments of RandomDiskScheduler, streamed in the order the graphs were added
+            store = SegmentStore(folder, read_only=True)
+            graphs = [(pickle.loads(data), f"graph {number + 1}", timestamp)
+                      for number, timestamp, data in store.iterate()]
+            store.close()
+            return graphs
         graphs = []
         for filename in sorted(os.listdir(folder), key=lambda x: int(re.search(r'\d+', x).group())):
             if filename.endswith(".pkl"):
                 file_path = os.path.join(folder, filename)
+                if os.path.exists(index_path(file_path)):
+                    # A batch of RandomDiskSchedulerUpdated: read all of its records through the mapped file
+                    batch = BatchFile(file_path)
+                    for counter, timestamp, graph in batch.records():
+                        graphs.append((graph, f"{filename}:{counter}", timestamp))
+                    batch.close()
+                    continue
                 with open(file_path, 'rb') as file:
                     graph = pickle.load(file)
                     file_stat = os.stat(file_path)
@@ -73,15 +109,26 @@ def main():
 
     parser = argparse.ArgumentParser(description="Calculate line coverage for graphs in a folder and print new coverage lines.")
     parser.add_argument("folder", type=str, help="The folder containing the graph files.")
+    parser.add_argument("--since", type=float, default=None,
+                        help="Only check the graphs added at least this many seconds after the first one.")
+    parser.add_argument("--until", type=float, default=None,
+                        help="Only check the graphs added less than this many seconds after the first one.")
     args = parser.parse_args()
 
-    graphs = CoverageCalculator.load_graphs_from_folder(args.folder)
+    if CorpusIndex.exists(args.folder) and SegmentStore.exists(args.folder):
+        graphs, first_graph_timestamp = CoverageCalculator.load_graphs_from_index(args.folder, args.since, args.until)
+    else:
+        graphs = CoverageCalculator.load_graphs_from_folder(args.folder)
+        # Use the timestamp of the first graph as the start time
+        first_graph_timestamp = graphs[0][2] if graphs else None
+        if args.since is not None or args.until is not None:
+            graphs = [(graph, graph_id, timestamp) for graph, graph_id, timestamp in graphs
+                      if (args.since is None or timestamp >= first_graph_timestamp + args.since) and
+                      (args.until is None or timestamp < first_graph_timestamp + args.until)]
     if not graphs:
         print(f"No graphs found in folder: {args.folder}")
         return
 
-    # Use the timestamp of the first graph as the start time
-    first_graph_timestamp = graphs[0][2]
     print(f"Start time (based on first graph): {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first_graph_timestamp))}")
 
     calculator = CoverageCalculator(first_graph_timestamp)
@@ -97,5 +144,5 @@ if __name__ == "__main__":
     main()
 
 
-## Usage
-## python3 Utils/CoverageCalculator.py Parallel_log/graphs_folder_3
\ No newline at end of file
+## Usage, from the repository root
+## python3 -m Utils.CoverageCalculator Parallel_log/graphs_folder_3
\ No newline at end of file
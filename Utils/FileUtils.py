@@ -1,9 +1,13 @@
 import os
 import pickle
 import site
+import tempfile
+import time
 
 import networkx as nx
 
+from Utils import GraphFormat
+
 
 def save_discrepancies(discrepancy_data, file_path, max_discrepancies_per_msg=100):
     """Save the discrepancy graphs to a pickle file."""
@@ -26,7 +30,7 @@ def save_discrepancies(discrepancy_data, file_path, max_discrepancies_per_msg=10
             existing_discrepancy_data.append((msg, graph))
 
     with open(discrepancy_file_path, "wb") as f:
-        pickle.dump(existing_discrepancy_data, f)
+        GraphFormat.dump(existing_discrepancy_data, f, compress=True)
 
 
 def save_discrepancy(discrepancy_data, file_path, max_discrepancies_per_msg=100):
@@ -54,8 +58,31 @@ def save_discrepancy(discrepancy_data, file_path, max_discrepancies_per_msg=100)
     if discrepancy_messages.count(msg) < max_discrepancies_per_msg:
         existing_discrepancy_data.append((msg, graph, timestamp))
 
-    with open(discrepancy_file_path, "wb") as f:
-        pickle.dump(existing_discrepancy_data, f)
+    # Replace the file in one step, so that a worker killed while writing cannot leave it truncated
+    with tempfile.NamedTemporaryFile(dir=log_dir, prefix=f"{file_path}.", suffix=".tmp", delete=False) as f:
+        temporary_path = f.name
+    try:
+        with open(temporary_path, "wb") as f:
+            GraphFormat.dump(existing_discrepancy_data, f, compress=True)
+        os.replace(temporary_path, discrepancy_file_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def remove_stale_temporary_files(max_age=60):
+    """Remove the temporary files that workers killed in save_discrepancy left in Log."""
+    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Log")
+    if not os.path.isdir(log_dir):
+        return
+    for name in os.listdir(log_dir):
+        path = os.path.join(log_dir, name)
+        try:
+            # Files younger than max_age may belong to another fuzzer writing to the same Log
+            if name.endswith(".tmp") and time.time() - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
 
 
 def save_exception_graphs(exception_graphs, prefix):
@@ -69,10 +96,25 @@ def save_exception_graphs(exception_graphs, prefix):
     filename = f"{prefix}_exceptions.pkl"
     file_path = os.path.join(log_dir, filename)
     with open(file_path, 'wb') as file:
-        pickle.dump(exception_graphs, file)
+        GraphFormat.dump(exception_graphs, file, compress=True)
     print(f"Exception graphs saved to {file_path}")
 
 
+def save_slot_map(slot_locations, prefix, map_size):
+    """Saves the slot -> file:line mapping of the instrumented coverage counters to a text file."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(script_dir)
+    log_dir = os.path.join(parent_dir, "Log")
+
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    file_path = os.path.join(log_dir, f"{prefix}_slot_map.txt")
+    with open(file_path, 'w') as file:
+        for index, (filename, line) in enumerate(slot_locations):
+            file.write(f"{index % map_size}\t{filename}:{line}\n")
+    print(f"Slot map saved to {file_path}")
+
+
 # def update_coveragerc(filepaths):
 #     # Convert filepaths to a list if it's a single path
 #     if isinstance(filepaths, str):
@@ -188,9 +230,9 @@ def save_graphs(graphs, file_name):
 
     # Check if the file already exists
     if not os.path.exists(file_path):
-        # Save the graphs using pickle
+        # Save the graphs as compact graph records
         with open(file_path, 'wb') as f:
-            pickle.dump(graphs, f)
+            GraphFormat.dump(graphs, f, compress=True)
         print(f"Saved graphs to {file_name}")
     else:
         print(f"File {file_name} already exists. Skipping save.")
@@ -0,0 +1,182 @@
+import os
+import random
+import resource
+import signal
+import socket
+import struct
+import sys
+from multiprocessing.connection import Connection
+
+
+class ForkServer:
+    """Run jobs in forked worker processes that can be killed on timeout.
+
+    start() forks a server process from the caller once everything expensive
+    (networkx, igraph, the tester) has been imported and set up. For every
+    batch the server forks a worker from that warm image, so a worker starts in
+    microseconds and shares the already imported modules copy-on-write.
+
+    Jobs and replies are pickled over a socket pair between the caller and the
+    worker. A worker that does not answer within `timeout` seconds is killed
+    with SIGKILL, and the next job gets a fresh worker. Workers run under
+    RLIMIT_AS (memory_limit_mb) and RLIMIT_CPU, and retire after batch_size
+    jobs or once their peak RSS goes past rss_limit_mb.
+    """
+
+    def __init__(self, handler, timeout=20, batch_size=100, memory_limit_mb=None, rss_limit_mb=2048):
+        self.handler = handler  # Called with each job inside the worker, its return value is the reply
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.memory_limit_mb = memory_limit_mb
+        self.rss_limit_mb = rss_limit_mb
+        self.control = None  # Socket to the server process
+        self.server_pid = None
+        self.worker = None  # Connection to the current worker
+        self.worker_pid = None
+        self.worker_jobs = 0
+        self.workers_started = 0
+        self.workers_killed = 0
+
+    def start(self):
+        parent_control, server_control = socket.socketpair()
+        # Anything still buffered would otherwise be written again by the children
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            parent_control.close()
+            try:
+                self.serve(server_control)
+            finally:
+                os._exit(0)
+        server_control.close()
+        self.control = parent_control
+        self.server_pid = pid
+
+    def serve(self, control):
+        # Ctrl+C reaches the whole process group; only the caller should react to it
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Workers are reaped automatically
+        while True:
+            try:
+                msg, fds, _, _ = socket.recv_fds(control, 1, 1)
+            except OSError:
+                return
+            if not msg or not fds:
+                return  # The caller asked to quit or closed the control socket
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                control.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                try:
+                    self.work(Connection(fds[0]))
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(0)
+            os.close(fds[0])
+            control.sendall(struct.pack('i', pid))
+
+    def set_limits(self):
+        if self.memory_limit_mb:
+            limit = self.memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        # Backstop for the whole batch; the wall clock timeout normally fires first
+        cpu_limit = int(self.timeout * self.batch_size) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
+
+    def work(self, conn):
+        self.set_limits()
+        random.seed()  # Every worker would otherwise replay the random choices of the first one
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                return
+            try:
+                reply = ("ok", self.handler(job))
+            except Exception as e:
+                reply = ("error", str(e) or type(e).__name__)
+            # ru_maxrss is in kilobytes on Linux
+            retire = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss > self.rss_limit_mb * 1024
+            sys.stdout.flush()
+            try:
+                conn.send(reply + (retire,))
+            except Exception as e:
+                conn.send(("error", f"Unpicklable reply: {e}", retire))
+            if retire:
+                return
+
+    def spawn_worker(self):
+        parent_end, worker_end = socket.socketpair()
+        socket.send_fds(self.control, [b'F'], [worker_end.fileno()])
+        worker_end.close()
+        self.worker_pid = struct.unpack('i', self.recv_exactly(4))[0]
+        self.worker = Connection(parent_end.detach())
+        self.worker_jobs = 0
+        self.workers_started += 1
+
+    def recv_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.control.recv(size - len(data))
+            if not chunk:
+                raise RuntimeError("Fork server exited unexpectedly.")
+            data += chunk
+        return data
+
+    def retire_worker(self, kill=False):
+        if self.worker is None:
+            return
+        if kill:
+            try:
+                os.kill(self.worker_pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.worker.close()  # A live worker sees EOF and exits
+        self.worker = None
+        self.worker_pid = None
+
+    def run(self, job):
+        """Run a job in a worker.
+
+        Returns (status, value): ("ok", reply), ("error", message) when the
+        handler raised, ("timeout", None) when the worker was killed after
+        `timeout` seconds, or ("crash", None) when the worker died (memory or
+        CPU limit, segfault in a C extension, ...).
+        """
+        if self.worker is None:
+            self.spawn_worker()
+        try:
+            self.worker.send(job)
+            if not self.worker.poll(self.timeout):
+                self.retire_worker(kill=True)
+                self.workers_killed += 1
+                return "timeout", None
+            status, value, retire = self.worker.recv()
+        except (EOFError, OSError):
+            self.retire_worker(kill=True)
+            return "crash", None
+        self.worker_jobs += 1
+        if retire or self.worker_jobs >= self.batch_size:
+            self.retire_worker()
+        return status, value
+
+    def close(self):
+        self.retire_worker(kill=True)
+        if self.control is not None:
+            # Ask explicitly: processes forked by the caller may hold copies of the socket, so EOF might never come
+            try:
+                self.control.sendall(b'Q')
+            except OSError:
+                pass  # The server is already gone
+            self.control.close()
+            self.control = None
+            try:
+                os.waitpid(self.server_pid, 0)
+            except ChildProcessError:
+                pass
+            self.server_pid = None
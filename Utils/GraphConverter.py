@@ -25,53 +25,44 @@ class GraphConverter:
             ig.plot(igraph_graph, **visual_style)
 
     def to_igraph(self):
-        # Create a new iGraph graph instance
-        igraph_graph = ig.Graph(directed=self.networkx_graph.is_directed())
-
-        # Add vertices
-        for node in self.networkx_graph.nodes():
-            igraph_graph.add_vertex(name=str(node))
-
-        # Handle MultiGraph: consolidating multiple edges
-        if isinstance(self.networkx_graph, nx.MultiGraph) or isinstance(self.networkx_graph, nx.MultiDiGraph):
-            edge_attrs = {}
-            for u, v, key, data in self.networkx_graph.edges(keys=True, data=True):
-                # Use a tuple of nodes as a key for edge attributes
-                edge_key = (u, v)
-
-                # Initialize the list of attributes for this edge
-                if edge_key not in edge_attrs:
-                    edge_attrs[edge_key] = {'weight': []}
-
-                # Append the weight of the current edge
-                edge_attrs[edge_key]['weight'].append(data.get('weight', 1))
-
-            # Add consolidated edges to iGraph
-            for edge_key, attrs in edge_attrs.items():
-                igraph_graph.add_edge(edge_key[0], edge_key[1])
-                for attr_name, attr_list in attrs.items():
-                    igraph_graph.es[-1][attr_name] = attr_list
+        """Convert to an iGraph graph whose vertices are named str(node), in one bulk construction.
+
+        Parallel edges of a multigraph are consolidated into one iGraph edge
+        whose 'weight' is the list of their weights.
+        """
+        return self.to_igraph_indexed()[0]
+
+    def to_igraph_indexed(self):
+        """Like to_igraph, but also return the node -> vertex index mapping used for the conversion."""
+        G = self.networkx_graph
+        nodes = list(G.nodes())
+        # Map every node to its vertex index once instead of searching the vertices by name
+        node_index = {node: index for index, node in enumerate(nodes)}
+
+        if G.is_multigraph():
+            # Handle MultiGraph: consolidating multiple edges
+            consolidated = {}
+            for u, v, data in G.edges(data=True):
+                consolidated.setdefault((u, v), []).append(data.get('weight', 1))
+            edges = [(node_index[u], node_index[v]) for u, v in consolidated]
+            weights = list(consolidated.values())
         else:
-            # Prepare a list of edges with vertex indices in iGraph
-            edges_with_indices = [(igraph_graph.vs.find(name=str(u)).index, igraph_graph.vs.find(name=str(v)).index) for
-                                  u, v in self.networkx_graph.edges()]
-
-            # Add edges to iGraph by indices
-            igraph_graph.add_edges(edges_with_indices)
-
-            # Transfer edge attributes
-            if self.networkx_graph.edges(data=True):
-                igraph_graph.es['weight'] = [
-                    self.networkx_graph[u][v]['weight'] if 'weight' in self.networkx_graph[u][v] else 1 for u, v in
-                    self.networkx_graph.edges()]
-
-        # Transfer node attributes
-        for node in self.networkx_graph.nodes():
-            ig_node = igraph_graph.vs.find(name=str(node))
-            for attr_name, attr_value in self.networkx_graph.nodes[node].items():
-                ig_node[attr_name] = attr_value
-
-        return igraph_graph
+            edges = [(node_index[u], node_index[v]) for u, v in G.edges()]
+            weights = [data.get('weight', 1) for _, _, data in G.edges(data=True)]
+
+        # Transfer node attributes; a vertex without an attribute gets None, as with per-vertex assignment
+        vertex_attrs = {}
+        if nodes:
+            vertex_attrs['name'] = [str(node) for node in nodes]
+            for attr_name in dict.fromkeys(attr_name for _, data in G.nodes(data=True) for attr_name in data):
+                default = vertex_attrs.get(attr_name)
+                vertex_attrs[attr_name] = [data[attr_name] if attr_name in data else
+                                           (default[index] if default else None)
+                                           for index, (_, data) in enumerate(G.nodes(data=True))]
+
+        igraph_graph = ig.Graph(n=len(nodes), edges=edges, directed=G.is_directed(), vertex_attrs=vertex_attrs,
+                                edge_attrs={'weight': weights} if edges else {})
+        return igraph_graph, node_index
 
     def to_igraph_default(self):
         return ig.Graph.from_networkx(self.networkx_graph)
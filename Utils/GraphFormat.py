@@ -0,0 +1,419 @@
+import argparse
+import io
+import os
+import pickle
+import struct
+import sys
+import time
+import zlib
+from operator import itemgetter
+
+import networkx as nx
+import numpy as np
+
+from Utils.CompactGraph import CompactGraph
+from Utils.GraphOverlay import GraphOverlay, OverlayGraph, OverlayDiGraph
+
+# Header of a graph record: magic, format version, flags, padding, number of nodes, number of edges (24 bytes,
+# so that the arrays after an uncompressed header stay 8-byte aligned)
+MAGIC = b'GFG'
+VERSION = 1
+HEADER = struct.Struct('<3sBH2xQQ')
+
+# Flags of the header
+DIRECTED = 0x1
+MULTIGRAPH = 0x2
+COMPRESSED = 0x4  # Everything after the header is one zlib stream
+WIDE_IDS = 0x8  # Node ids, endpoints and keys are int64 instead of int32
+FLOAT_WEIGHTS = 0x10  # Weights are float64
+WIDE_WEIGHTS = 0x20  # Integer weights are int64 instead of int32
+ALL_WEIGHTED = 0x40  # Every edge has a weight
+SOME_WEIGHTED = 0x80  # A packed mask of the weighted edges follows the weights; with neither flag none has one
+EXTRAS = 0x100  # A pickle of the graph and node attributes ends the record
+AS_COMPACT = 0x200  # The record was a CompactGraph and loads as one
+AS_OVERLAY = 0x400  # The record was a GraphOverlay and loads as one
+
+COMPRESS_LEVEL = 1
+INT32 = np.iinfo(np.int32)
+
+# networkx class of a record, indexed by its DIRECTED and MULTIGRAPH flags
+NETWORKX_CLASSES = (nx.Graph, nx.DiGraph, nx.MultiGraph, nx.MultiDiGraph)
+NATIVE_LITTLE_ENDIAN = sys.byteorder == 'little'  # Arrays can then be read with memoryview.cast
+# Types of the node ids, keys and weights the format holds; they load as the same types, so NumPy scalars and
+# bools are not among them
+INTEGER_TYPES = {int}
+FLOAT_TYPES = {float}
+
+
+def fits_int32(array):
+    return not len(array) or (array.min() >= INT32.min and array.max() <= INT32.max)
+
+
+def compact_form(graph):
+    """Return the CompactGraph a graph is stored as and its flags, or raise ValueError if the format cannot hold it."""
+    if isinstance(graph, CompactGraph):
+        return graph, AS_COMPACT
+    if type(graph) not in NETWORKX_CLASSES + (OverlayGraph, OverlayDiGraph):
+        raise ValueError(f"{type(graph).__name__} is not a networkx graph class the format knows.")
+    if not all(type(node) in INTEGER_TYPES for node in graph._node):
+        raise ValueError("Only graphs with integer node ids can be stored.")
+    compact, edge_data = ordered_compact_form(graph)
+    weight_types = {type(data['weight']) for data in edge_data if 'weight' in data}
+    if not (weight_types <= INTEGER_TYPES or weight_types <= FLOAT_TYPES):
+        raise ValueError("Only graphs whose weights are all Python integers or all Python floats can be stored.")
+    return compact, AS_OVERLAY if isinstance(graph, GraphOverlay) else 0
+
+
+def ordered_compact_form(graph):
+    # CompactGraph.from_networkx, with the edges in an order that keeps the order of the adjacency dicts
+    compact = CompactGraph(directed=graph.is_directed(), multigraph=graph.is_multigraph())
+    compact.nodes = np.fromiter(graph._node, dtype=np.int64, count=len(graph._node))
+    compact.node_attrs = {node: dict(data) for node, data in graph._node.items() if data}
+    compact.graph = dict(graph.graph)
+    src, dst = adjacency_order(graph)
+    successors = graph._adj
+    if compact.multigraph:
+        # The other edges between two nodes follow the first one in the order of their keys; only the first edge
+        # to a neighbor places it in the adjacency dict of a node
+        keys, edge_data, pairs = [], [], zip(src, dst)
+        src, dst = [], []
+        for u, v in pairs:
+            for key, data in successors[u][v].items():
+                src.append(u)
+                dst.append(v)
+                keys.append(key)
+                edge_data.append(data)
+        if not all(type(key) in INTEGER_TYPES for key in keys):
+            raise ValueError("Only multigraphs with integer keys can be stored.")
+    else:
+        keys = [0] * len(src)
+        edge_data = [successors[u][v] for u, v in zip(src, dst)]
+    weighted = ['weight' in data for data in edge_data]
+    if sum(map(len, edge_data)) != sum(weighted):
+        raise ValueError("CompactGraph only keeps the 'weight' attribute of edges.")
+    compact.src = np.array(src, dtype=np.int64)
+    compact.dst = np.array(dst, dtype=np.int64)
+    compact.keys = np.array(keys, dtype=np.int64)
+    compact.weighted = np.array(weighted, dtype=bool)
+    if all(weighted):
+        weights = list(map(itemgetter('weight'), edge_data))
+    else:
+        weights = [data.get('weight', 0) for data in edge_data]
+    compact.weight = np.array(weights, dtype=np.int64 if set(map(type, weights)) <= INTEGER_TYPES else np.float64)
+    return compact, edge_data
+
+
+def adjacency_order(graph):
+    """Return the (src, dst) lists of the adjacent pairs of a graph, in an order that rebuilds its adjacency dicts.
+
+    loads_graph inserts each pair u -> v at the end of the successors of u
+    and of the predecessors of v (of u and v when undirected), so the pairs
+    are merged the way a topological sort merges chains: a pair is taken
+    when it comes next in the dicts of both its endpoints. networkx graphs
+    are built by inserting edges in some order, so one always exists; a
+    graph whose dicts were reordered by hand may have none, and raises
+    ValueError.
+    """
+    directed = graph.is_directed()
+    successors = {node: list(neighbors) for node, neighbors in graph._adj.items()}
+    predecessors = {node: list(neighbors) for node, neighbors in graph._pred.items()} if directed else successors
+    # Position of the next pair in the successors and predecessors of each node
+    next_successor = dict.fromkeys(successors, 0)
+    next_predecessor = dict.fromkeys(successors, 0) if directed else next_successor
+    src, dst = [], []
+    stack = list(reversed(successors))
+    push = stack.append
+    while stack:
+        u = stack.pop()
+        neighbors = successors[u]
+        position = next_successor[u]
+        # Take the pairs of u in order while each one is also next for its other endpoint; an undirected
+        # self-loop is listed once, at u
+        while position < len(neighbors):
+            v = neighbors[position]
+            if v != u or directed:
+                sources = predecessors[v]
+                head = next_predecessor[v]
+                if sources[head] != u:
+                    break  # u -> v waits for the pairs listed before it at v
+                head += 1
+                next_predecessor[v] = head
+                if head < len(sources):
+                    push(sources[head])  # The pair now next at v may have been waiting for this one
+            position += 1
+            src.append(u)
+            dst.append(v)
+        next_successor[u] = position
+    if any(next_successor[node] < len(successors[node]) for node in successors):
+        raise ValueError("No order of the edges rebuilds the adjacency dicts of the graph.")
+    return src, dst
+
+
+def dumps_graph(graph, compress=False):
+    """Encode a networkx graph or a CompactGraph as a compact graph record.
+
+    Raises ValueError, TypeError or OverflowError for a graph the format cannot
+    hold exactly: node ids that are not Python integers, edge attributes other
+    than 'weight', weights that mix integers and floats or are NumPy scalars,
+    ids beyond int64, adjacency dicts no order of the edges rebuilds, ...
+    """
+    compact, flags = compact_form(graph)
+    if compact.directed:
+        flags |= DIRECTED
+    if compact.multigraph:
+        flags |= MULTIGRAPH
+    ids = [compact.nodes, compact.src, compact.dst]
+    if compact.multigraph:
+        ids.append(compact.keys)
+    if not all(fits_int32(array) for array in ids):
+        flags |= WIDE_IDS
+    id_type = '<i8' if flags & WIDE_IDS else '<i4'
+    parts = [array.astype(id_type).tobytes() for array in ids]
+    if compact.weighted.any():
+        if compact.weight.dtype.kind == 'f':
+            flags |= FLOAT_WEIGHTS
+            parts.append(compact.weight.astype('<f8').tobytes())
+        elif fits_int32(compact.weight):
+            parts.append(compact.weight.astype('<i4').tobytes())
+        else:
+            flags |= WIDE_WEIGHTS
+            parts.append(compact.weight.astype('<i8').tobytes())
+        if compact.weighted.all():
+            flags |= ALL_WEIGHTED
+        else:
+            flags |= SOME_WEIGHTED
+            parts.append(np.packbits(compact.weighted).tobytes())
+    if compact.graph or compact.node_attrs:
+        flags |= EXTRAS
+        parts.append(pickle.dumps((compact.graph, compact.node_attrs), protocol=pickle.HIGHEST_PROTOCOL))
+    payload = b''.join(parts)
+    if compress:
+        flags |= COMPRESSED
+        payload = zlib.compress(payload, COMPRESS_LEVEL)
+    return HEADER.pack(MAGIC, VERSION, flags, len(compact.nodes), len(compact.src)) + payload
+
+
+def record_payload(data):
+    """Check the header of a record; return its flags, node and edge counts and the (decompressed) payload."""
+    magic, version, flags, num_nodes, num_edges = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a compact graph record.")
+    if version > VERSION:
+        raise ValueError(f"Compact graph format version {version} is newer than the supported version {VERSION}.")
+    payload = memoryview(data)[HEADER.size:]
+    if flags & COMPRESSED:
+        payload = memoryview(zlib.decompress(payload))
+    return flags, num_nodes, num_edges, payload
+
+
+def array_layout(flags, num_nodes, num_edges):
+    """Return the (name, struct format, length) of the arrays of a record, in the order they are stored."""
+    id_format = 'q' if flags & WIDE_IDS else 'i'
+    layout = [('nodes', id_format, num_nodes), ('src', id_format, num_edges), ('dst', id_format, num_edges)]
+    if flags & MULTIGRAPH:
+        layout.append(('keys', id_format, num_edges))
+    if flags & (ALL_WEIGHTED | SOME_WEIGHTED):
+        weight_format = 'd' if flags & FLOAT_WEIGHTS else 'q' if flags & WIDE_WEIGHTS else 'i'
+        layout.append(('weight', weight_format, num_edges))
+    if flags & SOME_WEIGHTED:
+        layout.append(('weighted', 'B', (num_edges + 7) // 8))
+    return layout
+
+
+def read_arrays(payload, layout, as_lists):
+    """Read the arrays of a payload as NumPy arrays over its buffer, or as lists; also return where they end."""
+    arrays = {}
+    offset = 0
+    for name, array_format, length in layout:
+        size = struct.calcsize(array_format) * length
+        view = payload[offset:offset + size]
+        if as_lists and NATIVE_LITTLE_ENDIAN:
+            arrays[name] = view.cast(array_format).tolist()
+        else:
+            array = np.frombuffer(view, dtype='<' + array_format)
+            arrays[name] = array.tolist() if as_lists else array
+        offset += size
+    return arrays, offset
+
+
+def loads_compact(data):
+    """Decode a compact graph record into a CompactGraph, whose arrays are read with np.frombuffer."""
+    flags, num_nodes, num_edges, payload = record_payload(data)
+    arrays, offset = read_arrays(payload, array_layout(flags, num_nodes, num_edges), as_lists=False)
+    compact = CompactGraph(directed=bool(flags & DIRECTED), multigraph=bool(flags & MULTIGRAPH))
+    # int64 arrays are used as they are read; the arrays of a CompactGraph are never written in place
+    compact.nodes = arrays['nodes'].astype(np.int64, copy=False)
+    compact.src = arrays['src'].astype(np.int64, copy=False)
+    compact.dst = arrays['dst'].astype(np.int64, copy=False)
+    compact.keys = arrays['keys'].astype(np.int64, copy=False) if 'keys' in arrays else \
+        np.zeros(num_edges, dtype=np.int64)
+    if 'weight' in arrays:
+        compact.weight = arrays['weight'].astype(np.float64 if flags & FLOAT_WEIGHTS else np.int64, copy=False)
+    else:
+        compact.weight = np.zeros(num_edges, dtype=np.int64)
+    if flags & SOME_WEIGHTED:
+        compact.weighted = np.unpackbits(arrays['weighted'], count=num_edges).astype(bool)
+    else:
+        compact.weighted = np.full(num_edges, bool(flags & ALL_WEIGHTED))
+    if flags & EXTRAS:
+        compact.graph, compact.node_attrs = pickle.loads(payload[offset:])
+    return compact
+
+
+def loads_graph(data):
+    """Decode a compact graph record into the kind of graph it was made from."""
+    flags, num_nodes, num_edges, payload = record_payload(data)
+    if flags & AS_COMPACT:
+        return loads_compact(data)
+    if flags & AS_OVERLAY:
+        graph_class = OverlayDiGraph if flags & DIRECTED else OverlayGraph
+    else:
+        graph_class = NETWORKX_CLASSES[flags & (DIRECTED | MULTIGRAPH)]
+    if flags & MULTIGRAPH:
+        return loads_compact(data).to_networkx(create_using=graph_class)
+
+    # A simple graph is built straight from lists of the arrays, like CompactGraph.to_networkx does
+    arrays, offset = read_arrays(payload, array_layout(flags, num_nodes, num_edges), as_lists=True)
+    if flags & ALL_WEIGHTED:
+        edge_data = [{'weight': weight} for weight in arrays['weight']]
+    elif flags & SOME_WEIGHTED:
+        weighted = np.unpackbits(np.array(arrays['weighted'], dtype=np.uint8), count=num_edges).tolist()
+        edge_data = [{'weight': weight} if is_weighted else {}
+                     for weight, is_weighted in zip(arrays['weight'], weighted)]
+    else:
+        edge_data = [{} for _ in range(num_edges)]
+    G = graph_class()
+    nodes = arrays['nodes']
+    G._node.update({node: {} for node in nodes})
+    G._adj.update({node: {} for node in nodes})
+    successors = G._adj
+    if flags & DIRECTED:
+        predecessors = G._pred
+        predecessors.update({node: {} for node in nodes})
+    else:
+        predecessors = successors
+    for u, v, data in zip(arrays['src'], arrays['dst'], edge_data):
+        successors[u][v] = data
+        predecessors[v][u] = data
+    if flags & EXTRAS:
+        graph_attrs, node_attrs = pickle.loads(payload[offset:])
+        G.graph.update(graph_attrs)
+        for node, attrs in node_attrs.items():
+            G._node[node].update(attrs)
+    return G
+
+
+class GraphPickler(pickle.Pickler):
+    """Pickler that stores every graph it meets as a compact graph record.
+
+    The graphs can sit anywhere in the pickled object (a corpus list, the
+    (message, graph, timestamp) tuples of a discrepancy file, the keys of the
+    exception dict, a scheduler record, ...), and the file is read back with
+    a plain pickle.load, which calls loads_graph on each record. A graph the
+    format cannot hold is pickled as usual.
+    """
+
+    def __init__(self, file, compress=False):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.compress = compress
+
+    def reducer_override(self, obj):
+        if isinstance(obj, (nx.Graph, CompactGraph)):
+            try:
+                return loads_graph, (dumps_graph(obj, self.compress),)
+            except (ValueError, TypeError, OverflowError):
+                pass
+        return NotImplemented
+
+
+def dump(obj, file, compress=False):
+    """pickle.dump obj to a file, with its graphs as compact graph records."""
+    GraphPickler(file, compress).dump(obj)
+
+
+def dumps(obj, compress=False):
+    buffer = io.BytesIO()
+    dump(obj, buffer, compress)
+    return buffer.getvalue()
+
+
+def read_records(path):
+    """Return every pickle of a file: one for most files, one per graph for the batch files of the schedulers."""
+    records = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            records.append(pickle.load(f))
+    return records
+
+
+def convert_file(path, compress):
+    """Rewrite a file of pickled graphs in the compact format; return the sizes and load times before and after."""
+    # Imported here: the schedulers import this module
+    from Scheduler.RandomDiskSchedulerUpdated import OFFSET_FORMAT, index_path
+
+    size_before = os.path.getsize(path)
+    started = time.perf_counter()
+    records = read_records(path)
+    load_before = time.perf_counter() - started
+
+    offsets = []
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as f:
+        for record in records:
+            offsets.append(f.tell())
+            dump(record, f, compress)
+    os.replace(temporary_path, path)
+    # A batch file keeps the offsets of its records in a sidecar index
+    if len(records) > 1 or os.path.exists(index_path(path)):
+        with open(index_path(path), 'wb') as f:
+            f.write(b''.join(struct.pack(OFFSET_FORMAT, offset) for offset in offsets))
+
+    started = time.perf_counter()
+    read_records(path)
+    load_after = time.perf_counter() - started
+    return size_before, os.path.getsize(path), load_before, load_after
+
+
+def corpus_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if not name.endswith(('.idx', '.tmp', '.dat', '.txt')):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert pickled graph files (corpora, scheduler graphs and batches, discrepancy and "
+                    "exception logs) to the compact graph format, in place.")
+    parser.add_argument("paths", nargs='+', help="Files or folders to convert.")
+    parser.add_argument("--no_compress", action="store_true", help="Do not zlib-compress the graph records.")
+    args = parser.parse_args()
+
+    # Run with -m this module is __main__, and the records must point to loads_graph in Utils.GraphFormat
+    from Utils.GraphFormat import convert_file
+
+    total_before = total_after = 0
+    for path in corpus_files(args.paths):
+        try:
+            size_before, size_after, load_before, load_after = convert_file(path, not args.no_compress)
+        except (pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError) as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+            continue
+        total_before += size_before
+        total_after += size_after
+        print(f"{path}: {size_before} -> {size_after} bytes, "
+              f"load {load_before * 1000:.1f} -> {load_after * 1000:.1f} ms")
+    print(f"Total: {total_before} -> {total_after} bytes")
+
+
+if __name__ == "__main__":
+    main()
+
+
+## Usage
+## python3 -m Utils.GraphFormat Corpus_Data Log graphs_folder
@@ -0,0 +1,387 @@
+import argparse
+import importlib
+import math
+import os
+import pickle
+import random
+from itertools import permutations
+from multiprocessing import TimeoutError, get_context
+
+import networkx as nx
+
+from Feedback.FeedbackTools import FeedbackTools
+from Utils import GraphFormat
+
+# Fuzzer name -> (prefix of its discrepancy files, its corpus name, its tester class, the tester's comparison method)
+TARGETS = {
+    'AdamicAdar': ('aa', 'aa_corpus', 'AdamicAdarTester', 'test_adamic_adar_algorithms'),
+    'BCC': ('bcc', 'bcc_corpus', 'BCCTester', 'test_bcc_algorithms'),
+    'HarmonicCentrality': ('hc', 'hc_corpus', 'HarmonicCentralityTester', 'test_harmonic_centrality_algorithms'),
+    'JaccardSimilarity': ('js', 'js_corpus', 'JaccardSimilarityTester', 'test_jaccard_similarity_algorithms'),
+    'MAXFV': ('maxfv', 'maxfv_corpus', 'MAXFVTester', 'test_maxfv_algorithms'),
+    'MST': ('mst', 'mst_corpus', 'MSTTester', 'test_mst_algorithms'),
+    'MaxMatching': ('max_matching', 'max_matching_corpus', 'MaxMatchingTester', 'test_max_matching_algorithms'),
+    'SCC': ('scc', 'scc_corpus', 'SCCTester', 'test_scc_algorithms'),
+    'STPL': ('stpl', 'stpl_corpus', 'STPLTester', 'test_stpl_algorithms_updated'),
+}
+# Fuzzers whose comparison takes a source and a target node
+PAIR_TARGETS = ('MAXFV', 'STPL')
+# Message of the testers whose comparison returns the list of differing results
+NETWORKX_IGRAPH_MESSAGE = "Results of NetworkX and iGraph are different for a graph!"
+# A pair comparison tries every ordered pair of graphs up to this size, and this many random pairs on larger ones
+PAIR_SEARCH_NODES = 20
+PAIR_SEARCH_TRIES = 50
+
+_testers = {}  # Tester of each fuzzer, created once per process
+
+
+def tester_for(fuzzer):
+    if fuzzer not in _testers:
+        class_name = TARGETS[fuzzer][2]
+        module = importlib.import_module(f"Tester.{class_name}")
+        _testers[fuzzer] = getattr(module, class_name)()
+    return _testers[fuzzer]
+
+
+class DiscrepancyCheck:
+    """Predicate: does a graph still make the fuzzer's tester report `message`?
+
+    It calls the tester's comparison method rather than test_single_graph,
+    which would save every candidate to the Log folder. For STPL and MAXFV,
+    which compare the algorithms between two nodes, the check first tries
+    the pair that reproduced the discrepancy last and then searches the
+    pairs of the graph.
+    """
+
+    def __init__(self, fuzzer, message):
+        self.fuzzer = fuzzer
+        self.message = message
+        self.pair = None
+
+    def __call__(self, graph):
+        graph = graph.copy()  # Some testers set default weights on the graph they check
+        if self.fuzzer not in PAIR_TARGETS:
+            return self.message in self.messages(graph)
+        return self.find_pair(graph) is not None
+
+    def messages(self, graph, source=None, target=None):
+        """Return the discrepancy messages the tester reports for graph (between source and target)."""
+        tester = tester_for(self.fuzzer)
+        compare = getattr(tester, TARGETS[self.fuzzer][3])
+        try:
+            result = compare(graph) if source is None else compare(graph, source, target)
+        except Exception:
+            return []  # The candidate broke the tester itself, which is not the discrepancy
+        if isinstance(result, tuple):
+            message = result[0]
+            if not message:
+                return []
+            return [f"Discrepancy: {message}" if self.fuzzer == 'MAXFV' else message]
+        return [NETWORKX_IGRAPH_MESSAGE] if result else []
+
+    def find_pair(self, graph):
+        """Return a (source, target) pair of graph that reproduces the message, or None."""
+        if len(graph) < 2:
+            return None
+        if self.pair is not None and all(node in graph for node in self.pair):
+            candidates = [self.pair]
+        else:
+            candidates = []
+        if len(graph) <= PAIR_SEARCH_NODES:
+            candidates += list(permutations(graph.nodes(), 2))
+        else:
+            nodes = list(graph.nodes())
+            candidates += [tuple(random.sample(nodes, 2)) for _ in range(PAIR_SEARCH_TRIES)]
+        for source, target in candidates:
+            if self.message in self.messages(graph, source, target):
+                return source, target
+        return None
+
+
+class ExceptionCheck:
+    """Predicate: does the fuzzer's executor still raise an exception of the class it raised on the original graph?
+
+    Given a message, the exception must also format to it (as FeedbackTools records it).
+    """
+
+    def __init__(self, fuzzer, exception_class, message=None):
+        self.fuzzer = fuzzer
+        self.exception_class = exception_class
+        self.message = message
+
+    @staticmethod
+    def raised(fuzzer, graph):
+        """Return the exception the fuzzer's executor raises on graph, or None."""
+        module = importlib.import_module(f"Fuzzer.{fuzzer}Fuzzer")
+        fuzzer_class = getattr(module, f"{fuzzer}Fuzzer")
+        # The executors only read the graph, so the fuzzer does not need its corpus and feedback state
+        executor = fuzzer_class.__new__(fuzzer_class).executor
+        try:
+            executor(graph.copy())
+        except Exception as e:
+            return e
+        return None
+
+    def __call__(self, graph):
+        exception = self.raised(self.fuzzer, graph)
+        if exception is None or type(exception).__name__ != self.exception_class:
+            return False
+        return self.message is None or FeedbackTools.exception_message(exception) == self.message
+
+
+class GraphMinimizer:
+    """Shrink a graph to a small one that still satisfies a predicate (the same discrepancy, the same exception).
+
+    The reduction runs delta debugging (ddmin) over the nodes and then over
+    the edges until neither removes anything, then simplifies the edge
+    weights to 1, 0 or -1 where it can, drops the attributes the predicate
+    does not need and relabels the nodes 0..n-1. Every step only keeps a
+    candidate the predicate accepts, so the result reproduces the input's
+    behaviour. The candidates of one ddmin round are independent, and they
+    are checked in a pool of `workers` processes; a batch that runs past
+    `timeout` seconds counts as failing and the pool is replaced.
+
+    The predicate must be picklable: DiscrepancyCheck and ExceptionCheck are.
+    """
+
+    def __init__(self, predicate, workers=None, timeout=60):
+        self.predicate = predicate
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.pool = None
+        self.checks = 0  # Candidates checked
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def check_batch(self, candidates):
+        """Return the predicate's verdict on each candidate."""
+        self.checks += len(candidates)
+        if self.workers <= 1 or len(candidates) == 1:
+            return [self.predicate(candidate) for candidate in candidates]
+        if self.pool is None:
+            self.pool = get_context("fork").Pool(self.workers)
+        try:
+            return self.pool.map_async(self.predicate, candidates).get(self.timeout)
+        except TimeoutError:
+            print(f"A batch of {len(candidates)} candidates exceeded {self.timeout} seconds, restarting the pool.")
+            self.close()
+            return [False] * len(candidates)
+
+    def first_passing(self, candidates):
+        """Return the index of the first candidate the predicate accepts, or None."""
+        for start in range(0, len(candidates), self.workers):
+            for offset, passed in enumerate(self.check_batch(candidates[start:start + self.workers])):
+                if passed:
+                    return start + offset
+        return None
+
+    def ddmin(self, graph, items, remove):
+        """Remove as many of items from graph as the predicate allows; remove(graph, chunk) builds a candidate."""
+        chunks = 2
+        while len(items) >= 1:
+            size = math.ceil(len(items) / chunks)
+            parts = [items[start:start + size] for start in range(0, len(items), size)]
+            candidates = [remove(graph, part) for part in parts]
+            index = self.first_passing(candidates)
+            if index is not None:
+                graph = candidates[index]
+                removed = set(parts[index])
+                items = [item for item in items if item not in removed]
+                chunks = max(chunks - 1, 2)
+            elif size == 1:
+                break
+            else:
+                chunks = min(chunks * 2, len(items))
+        return graph
+
+    @staticmethod
+    def without_nodes(graph, nodes):
+        candidate = graph.copy()
+        candidate.remove_nodes_from(nodes)
+        return candidate
+
+    @staticmethod
+    def without_edges(graph, edges):
+        candidate = graph.copy()
+        candidate.remove_edges_from(edges)
+        return candidate
+
+    @staticmethod
+    def edges(graph):
+        return list(graph.edges(keys=True)) if graph.is_multigraph() else list(graph.edges())
+
+    @staticmethod
+    def with_weights(graph, weights):
+        """Return a copy of graph with the weights of the given edges ({edge: weight}) replaced."""
+        candidate = graph.copy()
+        for edge, weight in weights.items():
+            candidate.edges[edge]['weight'] = weight
+        return candidate
+
+    @staticmethod
+    def simpler_weights(weight):
+        values = [1, 0]
+        if isinstance(weight, (int, float)) and weight < 0:
+            values.insert(1, -1)
+        if isinstance(weight, float) and math.isfinite(weight) and weight != int(weight):
+            values.append(int(weight))
+        return [value for value in values if not value == weight]
+
+    def simplify_weights(self, graph):
+        weighted = [edge for edge in self.edges(graph) if 'weight' in graph.edges[edge]]
+        if not weighted:
+            return graph
+        candidate = self.with_weights(graph, {edge: 1 for edge in weighted})
+        if self.check_batch([candidate])[0]:
+            return candidate
+        for edge in weighted:
+            candidates = [self.with_weights(graph, {edge: value})
+                          for value in self.simpler_weights(graph.edges[edge]['weight'])]
+            index = self.first_passing(candidates)
+            if index is not None:
+                graph = candidates[index]
+        return graph
+
+    def drop_attributes(self, graph):
+        candidate = graph.copy()
+        for _, data in candidate.nodes(data=True):
+            data.clear()
+        for edge in self.edges(candidate):
+            data = candidate.edges[edge]
+            for key in [key for key in data if key != 'weight']:
+                del data[key]
+        candidate.graph.clear()
+        if self.check_batch([candidate])[0]:
+            return candidate
+        # Node attributes can matter (e.g. the side of a bipartite graph); try the edge and graph ones only
+        candidate.add_nodes_from(graph.nodes(data=True))
+        return candidate if self.check_batch([candidate])[0] else graph
+
+    def relabel(self, graph):
+        candidate = nx.convert_node_labels_to_integers(graph)
+        if list(candidate) == list(graph) or not self.check_batch([candidate])[0]:
+            return graph
+        return candidate
+
+    def minimize(self, graph):
+        """Return the smallest graph found that satisfies the predicate; graph itself must satisfy it."""
+        while True:
+            size = (graph.number_of_nodes(), graph.number_of_edges())
+            graph = self.ddmin(graph, list(graph.nodes()), self.without_nodes)
+            graph = self.ddmin(graph, self.edges(graph), self.without_edges)
+            if (graph.number_of_nodes(), graph.number_of_edges()) == size:
+                break
+        graph = self.simplify_weights(graph)
+        graph = self.drop_attributes(graph)
+        return self.relabel(graph)
+
+
+def fuzzer_of(path):
+    """Return the fuzzer whose discrepancy or exception file path is, from its name."""
+    filename = os.path.basename(path)
+    for fuzzer, (prefix, corpus_name, _, _) in TARGETS.items():
+        if filename.startswith(f"{prefix}_discrepancy") or filename == f"{corpus_name}_exceptions.pkl":
+            return fuzzer
+    return None
+
+
+def reproducers(data, fuzzer, exact=False):
+    """Return (entry, graph, predicate) for the graphs of a loaded discrepancy or exception file.
+
+    A discrepancy file holds (message, graph[, timestamp]) entries, an exception
+    file a {graph: message} dict. An exception is reproduced by running the
+    executor on the graph: those that came from the tester or from a timeout
+    cannot be, and are skipped.
+    """
+    reproducers = []
+    if isinstance(data, dict):
+        for graph, message in data.items():
+            exception = ExceptionCheck.raised(fuzzer, graph)
+            if exception is None:
+                print(f"Skipping \"{message}\": the executor does not raise it on its graph.")
+                continue
+            predicate = ExceptionCheck(fuzzer, type(exception).__name__, message if exact else None)
+            reproducers.append((message, graph, predicate))
+        return reproducers
+    for entry in data:
+        message, graph = entry[0], entry[1]
+        predicate = DiscrepancyCheck(fuzzer, message)
+        if fuzzer in PAIR_TARGETS:
+            predicate.pair = predicate.find_pair(graph)
+        reproducers.append((entry, graph, predicate))
+    return reproducers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimize the graphs of a discrepancy or exception file from Log.")
+    parser.add_argument("path", type=str, help="A Log/*_discrepancy_*.pkl or Log/*_exceptions.pkl file.")
+    parser.add_argument("--fuzzer", type=str, default=None,
+                        help="Fuzzer that wrote the file (default: guessed from the file name).")
+    parser.add_argument("--all", action="store_true",
+                        help="Minimize every graph of the file instead of the first one of each message.")
+    parser.add_argument("--exact", action="store_true",
+                        help="Require the same exception message, not only the same exception class.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes checking candidates in parallel (default: one per CPU).")
+    parser.add_argument("--timeout", type=int, default=60,
+                        help="Seconds a batch of candidates may take before they count as failing (default: 60).")
+    parser.add_argument("--output", type=str, default=None,
+                        help="File to write the minimized graphs to (default: <path>_min.pkl).")
+    args = parser.parse_args()
+
+    fuzzer = args.fuzzer or fuzzer_of(args.path)
+    if fuzzer not in TARGETS:
+        print(f"Error: Could not tell the fuzzer of {args.path}, pass it with --fuzzer.")
+        return
+
+    try:
+        with open(args.path, "rb") as f:
+            data = pickle.load(f)
+    except (EOFError, pickle.UnpicklingError):
+        print(f"Error: {args.path} is empty or truncated.")
+        return
+    exceptions = isinstance(data, dict)
+    minimized = {} if exceptions else []
+    seen = set()
+    with GraphMinimizer(None, args.workers, args.timeout) as minimizer:
+        for entry, graph, predicate in reproducers(data, fuzzer, args.exact):
+            message = entry if exceptions else entry[0]
+            if message in seen and not args.all:
+                continue
+            seen.add(message)
+            minimizer.predicate = predicate
+            minimizer.checks = 0
+            if minimizer.check_batch([graph])[0]:
+                smallest = minimizer.minimize(graph)
+            else:
+                print(f"\"{message}\" was not reproduced, its graph is kept as it is.")
+                smallest = graph
+            print(f"\"{message}\": {len(graph)} nodes, {graph.number_of_edges()} edges -> "
+                  f"{len(smallest)} nodes, {smallest.number_of_edges()} edges ({minimizer.checks} checks)")
+            if exceptions:
+                minimized[smallest] = message
+            else:
+                minimized.append((message, smallest) + tuple(entry[2:]))
+
+    output = args.output or f"{os.path.splitext(args.path)[0]}_min.pkl"
+    with open(output, "wb") as f:
+        GraphFormat.dump(minimized, f, compress=True)
+    print(f"Minimized graphs saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
+
+
+## Usage, from the repository root
+## python3 -m Utils.GraphMinimizer Log/stpl_discrepancy_1a2b3c4d.pkl --workers 4
@@ -0,0 +1,158 @@
+import networkx as nx
+
+
+class GraphOverlay:
+    """Copy-on-write networkx graph: share() copies only the outer dicts and keeps the parent's per-node dicts.
+
+    A networkx copy rebuilds the attribute dict of every node and every edge,
+    and for a mutant that only differs from its parent in a handful of nodes
+    and edges that copy is most of the cost of a mutation. share() instead
+    returns a graph whose node and adjacency dicts map to the same inner dicts
+    as the parent, plus the set of nodes whose dicts are still shared. The
+    first write through a node (an edge added, removed or re-weighted at it, a
+    neighbour removed, ...) gives that node private copies, and an existing
+    edge gets a private attribute dict before it is updated. The mutant thus
+    holds a reference to the parent plus its own delta, is a regular networkx
+    graph for the executor and the tester, and is dropped without any work
+    when it is not interesting.
+
+    Parent and mutant are protected from each other as long as both are
+    changed through the graph methods (add_edge, remove_node, ...); writing
+    into G[u][v] or G.nodes[n] directly would change both. The mutators and
+    the corpus only use the methods, and the testers get a pickled copy in
+    the sandbox. Multigraphs are not supported: overlay_graph() leaves them
+    as they are and they are copied as usual.
+    """
+
+    def __init__(self, incoming_graph_data=None, **attr):
+        self._shared = set()  # Nodes whose attribute and adjacency dicts may also belong to another graph
+        super().__init__(incoming_graph_data, **attr)
+
+    def __getstate__(self):
+        # A pickled graph owns all of its dicts once it is loaded
+        state = dict(self.__dict__)
+        state['_shared'] = set()
+        return state
+
+    def share(self):
+        """Return a copy of the graph that shares the dicts of every node with it until either one writes them."""
+        other = self.__class__()
+        other.graph.update(self.graph)
+        other._node = dict(self._node)
+        other._adj = dict(self._adj)
+        if self.is_directed():
+            other._succ = other._adj
+            other._pred = dict(self._pred)
+        self._shared = set(self._node)
+        other._shared = set(self._shared)
+        return other
+
+    def own(self, node):
+        """Give a node private copies of its attribute and adjacency dicts before they are written."""
+        if node in self._shared:
+            self._shared.discard(node)
+            self._node[node] = dict(self._node[node])
+            self._adj[node] = dict(self._adj[node])
+            if self.is_directed():
+                self._pred[node] = dict(self._pred[node])
+
+    def own_neighborhood(self, node):
+        # Removing a node deletes it from the adjacency dicts of all its neighbours
+        if node not in self._node:
+            return
+        self.own(node)
+        for neighbor in self._adj[node]:
+            self.own(neighbor)
+        if self.is_directed():
+            for neighbor in self._pred[node]:
+                self.own(neighbor)
+
+    def own_edge(self, u, v):
+        self.own(u)
+        self.own(v)
+        data = self._adj.get(u, {}).get(v)
+        if data is not None:
+            data = dict(data)
+            self._adj[u][v] = data
+            if self.is_directed():
+                self._pred[v][u] = data
+            else:
+                self._adj[v][u] = data
+
+    def add_node(self, node_for_adding, **attr):
+        self.own(node_for_adding)
+        super().add_node(node_for_adding, **attr)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        nodes_for_adding = list(nodes_for_adding)
+        for node in nodes_for_adding:
+            try:
+                self.own(node)
+            except TypeError:
+                self.own(node[0])  # A (node, attribute dict) pair
+        super().add_nodes_from(nodes_for_adding, **attr)
+
+    def remove_node(self, n):
+        self.own_neighborhood(n)
+        self._shared.discard(n)
+        super().remove_node(n)
+
+    def remove_nodes_from(self, nodes):
+        nodes = list(nodes)
+        for node in nodes:
+            self.own_neighborhood(node)
+        self._shared.difference_update(nodes)
+        super().remove_nodes_from(nodes)
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        self.own_edge(u_of_edge, v_of_edge)
+        super().add_edge(u_of_edge, v_of_edge, **attr)
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        ebunch_to_add = list(ebunch_to_add)
+        for edge in ebunch_to_add:
+            if len(edge) in (2, 3):  # networkx reports malformed edges
+                self.own_edge(edge[0], edge[1])
+        super().add_edges_from(ebunch_to_add, **attr)
+
+    def remove_edge(self, u, v):
+        self.own(u)
+        self.own(v)
+        super().remove_edge(u, v)
+
+    def remove_edges_from(self, ebunch):
+        ebunch = list(ebunch)
+        for edge in ebunch:
+            if len(edge) >= 2:
+                self.own(edge[0])
+                self.own(edge[1])
+        super().remove_edges_from(ebunch)
+
+    def clear_edges(self):
+        for node in list(self._shared):
+            self.own(node)
+        super().clear_edges()
+
+    def clear(self):
+        super().clear()
+        self._shared.clear()
+
+
+class OverlayGraph(GraphOverlay, nx.Graph):
+    pass
+
+
+class OverlayDiGraph(GraphOverlay, nx.DiGraph):
+    pass
+
+
+def overlay_graph(G):
+    """Return a copy of a networkx graph that can be shared copy-on-write, or G itself for a multigraph."""
+    if isinstance(G, GraphOverlay) or G.is_multigraph():
+        return G
+    overlay = OverlayDiGraph() if G.is_directed() else OverlayGraph()
+    # The same construction as G.copy(), so nodes and edges keep their order
+    overlay.graph.update(G.graph)
+    overlay.add_nodes_from((node, data.copy()) for node, data in G._node.items())
+    overlay.add_edges_from((u, v, data.copy()) for u, neighbors in G._adj.items() for v, data in neighbors.items())
+    return overlay
@@ -0,0 +1,92 @@
+import argparse
+import importlib
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+# Run from anywhere: the fuzzer modules are imported from the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from Mutator.ExtendedMutator import ExtendedMutator
+from Scheduler.RandomMemScheduler import RandomMemScheduler
+
+OPERATORS = ["add_node", "delete_node", "add_edge", "delete_edge", "modify_edge_weight", "trim_graph_advanced",
+             "combine_graphs"]
+
+
+def time_operators(mutator, totals):
+    """Wrap the operators of a mutator so that the time spent in each one is added to totals."""
+    for name in OPERATORS:
+        operator = getattr(mutator, name)
+
+        def timed(graph, operator=operator, name=name):
+            started = time.perf_counter()
+            result = operator(graph)
+            totals[name][0] += time.perf_counter() - started
+            totals[name][1] += 1
+            return result
+
+        setattr(mutator, name, timed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time full fuzzing iterations (copy, stacked mutation, execution) "
+                                                 "of a fuzzer on its initial corpus, without feedback or tester.")
+    parser.add_argument("fuzzer", type=str, help="Fuzzer name, e.g. STPL.")
+    parser.add_argument("--mutants", type=int, default=5000, help="Number of mutants to build (default: 5000).")
+    parser.add_argument("--num_iterations", type=int, default=100,
+                        help="Mutants built from a seed before the next seed is picked (default: 100).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+
+    fuzzer_class = getattr(importlib.import_module(f"Fuzzer.{args.fuzzer}Fuzzer"), f"{args.fuzzer}Fuzzer")
+    fuzzer = fuzzer_class(num_iterations=args.num_iterations, use_multiple_graphs=True,
+                          feedback_check_type="none", scheduler=RandomMemScheduler(start_time=time.time()))
+    graphs = fuzzer.create_multiple_graphs()
+    scheduler = RandomMemScheduler(start_time=time.time())
+    scheduler.add_to_corpus(graphs)
+    mutator = ExtendedMutator(scheduler)
+    # Revisions before the mutation contexts have no Mutator.copy
+    copy = getattr(mutator, "copy", lambda graph: graph.copy())
+    totals = defaultdict(lambda: [0.0, 0])
+    time_operators(mutator, totals)
+
+    random.seed(args.seed)
+    copy_time = mutate_time = execute_time = 0.0
+    built = 0
+    while built < args.mutants:
+        graph = scheduler.get_graph()
+        for _ in range(min(args.num_iterations, args.mutants - built)):
+            started = time.perf_counter()
+            mutant = copy(graph)
+            copied = time.perf_counter()
+            mutant = mutator.stacked_mutate(mutant)
+            mutated = time.perf_counter()
+            try:
+                fuzzer.executor(mutant)
+            except Exception:
+                pass  # Exceptions of the target are part of fuzzing, not of this benchmark
+            copy_time += copied - started
+            mutate_time += mutated - copied
+            execute_time += time.perf_counter() - mutated
+            built += 1
+
+    total = copy_time + mutate_time + execute_time
+    print(f"{args.fuzzer}: {built} mutants of {len(graphs)} seeds in {total:.2f} s, {built / total:.0f} mutants/s")
+    print(f"  copy:           {copy_time / built * 1e6:6.1f} us per mutant")
+    print(f"  stacked_mutate: {mutate_time / built * 1e6:6.1f} us per mutant")
+    print(f"  execution:      {execute_time / built * 1e6:6.1f} us per mutant")
+    for name in OPERATORS:
+        spent, calls = totals[name]
+        if calls:
+            print(f"  {name:20s} {calls:7d} calls, {spent / calls * 1e6:8.1f} us per call, {spent:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
+
+
+## Usage, from the repository root
+## python3 experiments/throughput/benchmark_iterations.py STPL --mutants 5000
@@ -5,8 +5,11 @@ import sys
 import time
 import uuid
 
-from Scheduler.RandomDiskScheduler import RandomDiskScheduler
-from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Feedback import Instrumentation
+from Scheduler.CorpusIndex import parse_query
+
+# The schedulers and fuzzers import networkx, so they are only imported in main(),
+# once networkx may have been instrumented
 
 
 def get_fuzzer_class(fuzzer_name):
@@ -58,23 +61,77 @@ def main():
     parser.add_argument("--num_iterations", type=int, default=60,
                         help="The number of iterations the fuzzer should run.")
     parser.add_argument("--use_multiple_graphs", action="store_true", help="Use multiple graphs for the fuzzer.")
-    parser.add_argument("--feedback_check_type", type=str, choices=["regular", "coverage", "combination", "branch", "none"],
+    parser.add_argument("--feedback_check_type", type=str,
+                        choices=["regular", "coverage", "combination", "branch", "hitcount", "tiered", "none"],
                         default="regular", help="The type of feedback check to use: "
                                                 "'regular' for standard checks, "
                                                 "'coverage' for line coverage-based checks, "
                                                 "'combination' for both regular and coverage, "
                                                 "'branch' for branch coverage-based checks, "
+                                                "'hitcount' for AFL-style bucketed block hit counts, "
+                                                "'tiered' for cheap result and structure signals first and line "
+                                                "coverage only on the mutants they flag, "
                                                 "'none' to disable feedback checks.")
+    parser.add_argument("--coverage_backend", type=str, default="coverage",
+                        choices=["coverage", "self_disabling", "instrument"],
+                        help="Backend used to collect line coverage: "
+                             "'coverage' for coverage.py, "
+                             "'self_disabling' for a tracer that stops tracing lines it has already seen, "
+                             "'instrument' for networkx instrumented at import time with block counters.")
     parser.add_argument("--output", type=str, default="console", choices=["file", "console"],
                         help="Output mode: 'file' to save the log to a file, 'console' to print to the console.")
-    parser.add_argument("--scheduler", type=str, default="mem", choices=["mem", "disk"],
-                        help="Scheduler type: 'mem' for RandomMemScheduler, 'disk' for RandomDiskScheduler.")
+    parser.add_argument("--scheduler", type=str, default="mem", choices=["mem", "disk", "tiered"],
+                        help="Scheduler type: 'mem' for RandomMemScheduler, 'disk' for RandomDiskScheduler, "
+                             "'tiered' for TieredScheduler.")
     parser.add_argument("--folder", type=str, default="graphs_folder",
-                        help="Folder name for saving graphs when using RandomDiskScheduler.")
+                        help="Folder name for saving graphs when using RandomDiskScheduler or TieredScheduler.")
+    parser.add_argument("--corpus_mem_mb", "--corpus-mem-mb", type=int, default=512,
+                        help="Memory budget in MB of the graphs TieredScheduler keeps in memory before spilling "
+                             "the least recently used ones to disk (default: 512).")
+    parser.add_argument("--seed_query", type=parse_query, default=None,
+                        help="Pick the graphs to mutate among those of the disk corpus matching these filters, "
+                             "e.g. 'max_nodes=50,max_exec_time=0.01,min_new_coverage=1' (default: any graph).")
     parser.add_argument("--timeout", type=int, default=20, help="Timeout for each operation in seconds (default: 20).")
+    parser.add_argument("--memory_limit", type=int, default=None,
+                        help="Address space limit of the sandbox workers in MB (default: no limit).")
+    parser.add_argument("--rss_limit", type=int, default=2048,
+                        help="Recycle a sandbox worker once its RSS exceeds this many MB (default: 2048).")
+    parser.add_argument("--tiered_sample_rate", type=float, default=0.02,
+                        help="Fraction of the mutants 'tiered' traces although no cheap signal flagged them "
+                             "(default: 0.02).")
+    parser.add_argument("--async_coverage", type=int, default=0, metavar="QUEUE_SIZE",
+                        help="Measure line coverage for 'coverage' and 'combination' in a side process fed "
+                             "through a queue of this size; candidates are dropped while it is full "
+                             "(default: 0, measure in the fuzzing loop).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes sharing one corpus and coverage state (default: 1).")
+    parser.add_argument("--compact_graphs", action="store_true",
+                        help="Keep the corpus as compact array-backed graphs and mutate those; "
+                             "networkx graphs are only built to execute a mutant.")
+    parser.add_argument("--overlay_graphs", action="store_true",
+                        help="Keep the corpus as copy-on-write networkx graphs; a mutant shares the dicts of "
+                             "its parent and only copies those of the nodes and edges it changes.")
+
+    parser.add_argument("--mutation_batch", type=int, default=1,
+                        help="Draw this many mutants of the current graph at once, with all their random "
+                             "decisions drawn as NumPy arrays (default: 1, one mutant per iteration).")
+    parser.add_argument("--adaptive_operators", action="store_true",
+                        help="Weight the mutation operators and the stack depth by the new coverage or "
+                             "discrepancies they yield per second, and report the weights at the end.")
+    parser.add_argument("--no_mutation_profile", action="store_true",
+                        help="Mutate without the fuzzer's mutation profile, letting mutants break the "
+                             "preconditions of the target (bipartite, positive weights, ...).")
 
     args = parser.parse_args()
 
+    # networkx has to be instrumented before the scheduler and fuzzer modules import it
+    if args.coverage_backend == "instrument" or args.feedback_check_type == "hitcount":
+        Instrumentation.install()
+
+    from Scheduler.RandomDiskScheduler import RandomDiskScheduler
+    from Scheduler.RandomMemScheduler import RandomMemScheduler
+    from Scheduler.TieredScheduler import TieredScheduler
+
     fuzzer_class = get_fuzzer_class(args.fuzzer)
     if fuzzer_class is None:
         print(f"Error: Fuzzer {args.fuzzer} could not be found.")
@@ -83,17 +140,33 @@ def main():
     if args.scheduler == "mem":
         scheduler = RandomMemScheduler(start_time=time.time())
     elif args.scheduler == "disk":
-        scheduler = RandomDiskScheduler(args.folder)
+        scheduler = RandomDiskScheduler(args.folder, seed_query=args.seed_query)
+    elif args.scheduler == "tiered":
+        scheduler = TieredScheduler(args.folder, mem_mb=args.corpus_mem_mb)
     else:
         print(f"Error: Unknown scheduler type {args.scheduler}")
         return
+    if args.seed_query and args.scheduler != "disk":
+        print("--seed_query needs the disk scheduler, ignoring it.")
 
     # Pass the timeout argument to the fuzzer instance
     fuzzer = fuzzer_class(num_iterations=args.num_iterations,
                           use_multiple_graphs=args.use_multiple_graphs,
                           feedback_check_type=args.feedback_check_type,
                           scheduler=scheduler,
-                          timeout_duration=args.timeout) 
+                          timeout_duration=args.timeout,
+                          coverage_backend=args.coverage_backend,
+                          memory_limit_mb=args.memory_limit,
+                          rss_limit_mb=args.rss_limit,
+                          workers=args.workers)
+    fuzzer.tiered_sample_rate = args.tiered_sample_rate
+    fuzzer.async_coverage_queue = args.async_coverage
+    fuzzer.compact_graphs = args.compact_graphs
+    fuzzer.overlay_graphs = args.overlay_graphs
+    fuzzer.mutation_batch = args.mutation_batch
+    fuzzer.adaptive_operators = args.adaptive_operators
+    if args.no_mutation_profile:
+        fuzzer.mutation_profile = None
 
     run_fuzzer(fuzzer, args.output)
 
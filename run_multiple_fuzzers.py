@@ -5,24 +5,26 @@ import sys
 import time
 import multiprocessing
 import signal
-from multiprocessing import Lock
 import networkx as nx
 import igraph
 
 from Scheduler.RandomDiskScheduler import RandomDiskScheduler
 from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Scheduler.TieredScheduler import TieredScheduler
 from Feedback.FeedbackTools import FeedbackTools
 
 
 class RunMultipleFuzzers:
-    def __init__(self, fuzzer_configs, num_iterations=60, use_multiple_graphs=False, scheduler_type="mem", timeout=None, enable_none=False):
+    def __init__(self, fuzzer_configs, num_iterations=60, use_multiple_graphs=False, scheduler_type="mem", timeout=None, enable_none=False,
+                 coverage_backend="coverage", corpus_mem_mb=512):
         self.fuzzer_configs = fuzzer_configs
         self.num_iterations = num_iterations
         self.use_multiple_graphs = use_multiple_graphs
         self.scheduler_type = scheduler_type
         self.timeout = timeout
         self.enable_none = enable_none
-        self.shared_lock = Lock()
+        self.coverage_backend = coverage_backend
+        self.corpus_mem_mb = corpus_mem_mb
 
     def get_fuzzer_class(self, fuzzer_name):
         module_name = f"Fuzzer.{fuzzer_name}Fuzzer"
@@ -66,11 +68,14 @@ class RunMultipleFuzzers:
                 scheduler = RandomMemScheduler(start_time=time.time())
             elif self.scheduler_type == "disk":
                 scheduler = RandomDiskScheduler(instance_folder)
+            elif self.scheduler_type == "tiered":
+                scheduler = TieredScheduler(instance_folder, mem_mb=self.corpus_mem_mb)
             else:
                 print(f"Error: Unknown scheduler type {self.scheduler_type}")
                 return
 
-        feedback_tool = FeedbackTools(start_time=time.time(), lock=self.shared_lock)
+        # Each instance measures its own coverage, nothing is shared between the feedback types
+        feedback_tool = FeedbackTools(start_time=time.time(), coverage_backend=self.coverage_backend)
 
         # Instantiate the fuzzer with the feedback_tool
         fuzzer = fuzzer_class(num_iterations=self.num_iterations,
@@ -78,7 +83,7 @@ class RunMultipleFuzzers:
                               feedback_check_type=feedback_check_type,
                               scheduler=scheduler)
 
-        # Set the feedback tool with the shared lock
+        # Set the feedback tool
         fuzzer.feedback_tool = feedback_tool
 
         # Determine the log file path based on feedback type
@@ -119,9 +124,13 @@ def main():
     parser.add_argument("fuzzers", type=str, nargs='+', help="The names of the fuzzers to run and their respective output folders.")
     parser.add_argument("--num_iterations", type=int, default=60, help="The number of iterations the fuzzers should run.")
     parser.add_argument("--use_multiple_graphs", action="store_true", help="Use multiple graphs for the fuzzers.")
-    parser.add_argument("--scheduler", type=str, default="mem", choices=["mem", "disk"], help="Scheduler type: 'mem' or 'disk'.")
+    parser.add_argument("--scheduler", type=str, default="mem", choices=["mem", "disk", "tiered"], help="Scheduler type: 'mem', 'disk' or 'tiered'.")
+    parser.add_argument("--corpus_mem_mb", "--corpus-mem-mb", type=int, default=512,
+                        help="Memory budget in MB of each instance's in-memory corpus with the 'tiered' scheduler.")
     parser.add_argument("--timeout", type=int, default=None, help="Timeout in seconds for each instance.")
     parser.add_argument("--enable_none", action="store_true", help="Enable running with --feedback_check_type none using mem scheduler.")
+    parser.add_argument("--coverage_backend", type=str, default="coverage", choices=["coverage", "self_disabling"],
+                        help="Backend used to collect line coverage: 'coverage' or 'self_disabling'.")
 
     args = parser.parse_args()
 
@@ -137,7 +146,9 @@ def main():
         use_multiple_graphs=args.use_multiple_graphs,
         scheduler_type=args.scheduler,
         timeout=args.timeout,
-        enable_none=args.enable_none
+        enable_none=args.enable_none,
+        coverage_backend=args.coverage_backend,
+        corpus_mem_mb=args.corpus_mem_mb
     )
     runner.start()
 
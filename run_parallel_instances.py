@@ -6,12 +6,13 @@ import time
 import uuid
 import multiprocessing
 import signal
-from multiprocessing import Lock
 
 from Scheduler.RandomDiskScheduler import RandomDiskScheduler
 from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Scheduler.TieredScheduler import TieredScheduler
 
 from Feedback.FeedbackTools import FeedbackTools
+from Feedback.SharedCoverageMap import SharedCoverageMap
 
 def get_fuzzer_class(fuzzer_name):
     module_name = f"Fuzzer.{fuzzer_name}Fuzzer"
@@ -40,7 +41,7 @@ def run_fuzzer(fuzzer, log_file):
         sys.stderr = original_stderr
 
 
-def run_instance(fuzzer_name, output_folder, num_iterations, use_multiple_graphs, feedback_check_type, scheduler_type, instance_index, shared_lock):
+def run_instance(fuzzer_name, output_folder, num_iterations, use_multiple_graphs, feedback_check_type, scheduler_type, instance_index, shared_coverage, coverage_backend, adaptive_operators, corpus_mem_mb):
     fuzzer_class = get_fuzzer_class(fuzzer_name)
     if fuzzer_class is None:
         print(f"Error: Fuzzer {fuzzer_name} could not be found.")
@@ -49,12 +50,15 @@ def run_instance(fuzzer_name, output_folder, num_iterations, use_multiple_graphs
     instance_folder = os.path.join(output_folder, f"graphs_folder_{instance_index}")
     os.makedirs(instance_folder, exist_ok=True)
 
-    feedback_tool = FeedbackTools(start_time=time.time(), lock=shared_lock)
+    feedback_tool = FeedbackTools(start_time=time.time(), coverage_backend=coverage_backend,
+                                  shared_coverage=shared_coverage)
 
     if scheduler_type == "mem":
         scheduler = RandomMemScheduler(start_time=time.time())
     elif scheduler_type == "disk":
         scheduler = RandomDiskScheduler(instance_folder)
+    elif scheduler_type == "tiered":
+        scheduler = TieredScheduler(instance_folder, mem_mb=corpus_mem_mb)
     else:
         print(f"Error: Unknown scheduler type {scheduler_type}")
         return
@@ -65,8 +69,9 @@ def run_instance(fuzzer_name, output_folder, num_iterations, use_multiple_graphs
                           feedback_check_type=feedback_check_type,
                           scheduler=scheduler)
 
-    # Set the feedback tool with the shared lock
+    # Set the feedback tool, which may share its coverage with the other instances
     fuzzer.feedback_tool = feedback_tool
+    fuzzer.adaptive_operators = adaptive_operators
 
     instance_log_file_path = os.path.join(output_folder, f"{fuzzer_name.lower()}_{instance_index}_log.txt")
     with open(instance_log_file_path, "a", buffering=1) as log_file:
@@ -86,9 +91,20 @@ def main():
                                                 "'coverage' for coverage-based checks, "
                                                 "'combination' for both, "
                                                 "'none' to disable feedback checks.")
-    parser.add_argument("--scheduler", type=str, default="mem", choices=["mem", "disk"],
-                        help="Scheduler type: 'mem' for RandomMemScheduler, 'disk' for RandomDiskScheduler.")
+    parser.add_argument("--scheduler", type=str, default="mem", choices=["mem", "disk", "tiered"],
+                        help="Scheduler type: 'mem' for RandomMemScheduler, 'disk' for RandomDiskScheduler, "
+                             "'tiered' for TieredScheduler.")
+    parser.add_argument("--corpus_mem_mb", "--corpus-mem-mb", type=int, default=512,
+                        help="Memory budget in MB of each instance's in-memory corpus with the 'tiered' scheduler.")
+    parser.add_argument("--coverage_backend", type=str, default="coverage", choices=["coverage", "self_disabling"],
+                        help="Backend used to collect line coverage: 'coverage' or 'self_disabling'.")
     parser.add_argument("--timeout", type=int, default=None, help="Timeout in seconds for each instance.")
+    parser.add_argument("--shared_coverage", action="store_true",
+                        help="Let the instances of a fuzzer share one coverage map, so that a line or branch "
+                             "covered by one instance is no longer new to the others.")
+    parser.add_argument("--adaptive_operators", action="store_true",
+                        help="Weight the mutation operators and the stack depth of every instance by the new "
+                             "coverage or discrepancies they yield per second.")
 
     args = parser.parse_args()
 
@@ -105,17 +121,21 @@ def main():
         num_instances = int(args.fuzzers[i+2])
         fuzzer_configs.append((fuzzer_name, output_folder, num_instances))
 
-    # Create a shared lock for all fuzzers
-    shared_lock = Lock()
-
     # Run multiple fuzzers in parallel with their respective instances
     processes = []
+    shared_maps = []
     for fuzzer_name, output_folder, num_instances in fuzzer_configs:
         os.makedirs(output_folder, exist_ok=True)
+        # Each instance measures its own coverage; with --shared_coverage the instances of a fuzzer
+        # also publish it to one map in shared memory, which is written without any lock
+        shared_coverage = SharedCoverageMap() if args.shared_coverage else None
+        if shared_coverage is not None:
+            shared_maps.append(shared_coverage)
         for i in range(1, num_instances + 1):
             p = multiprocessing.Process(target=run_instance, args=(
                 fuzzer_name, output_folder, args.num_iterations, args.use_multiple_graphs,
-                args.feedback_check_type, args.scheduler, i, shared_lock))
+                args.feedback_check_type, args.scheduler, i, shared_coverage, args.coverage_backend,
+                args.adaptive_operators, args.corpus_mem_mb))
             processes.append(p)
             p.start()
 
@@ -129,6 +149,9 @@ def main():
     for p in processes:
         p.join()
 
+    for shared_coverage in shared_maps:
+        shared_coverage.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,21 @@
+import networkx as nx
+import numpy as np
+
+from Mutator.CompactMutator import CompactMutator
+from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Utils.CompactGraph import CompactGraph
+
+
+def one_node_graph():
+    graph = nx.Graph()
+    graph.add_node(3)
+    return CompactGraph.from_networkx(graph)
+
+
+def test_add_edge_on_one_node_is_a_self_loop_in_both_paths():
+    mutator = CompactMutator(RandomMemScheduler(start_time=0))
+    for mutant in (mutator.add_edge(one_node_graph()),
+                   mutator.add_edge_batched(one_node_graph(), np.full(8, 0.5))):
+        graph = mutant.to_networkx()
+        assert sorted(graph.nodes) == [3, 4]
+        assert list(graph.edges) == [(3, 3)]
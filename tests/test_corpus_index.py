@@ -0,0 +1,29 @@
+import random
+
+import networkx as nx
+
+from Scheduler.CorpusIndex import CorpusIndex
+from Scheduler.RandomDiskScheduler import RandomDiskScheduler
+
+
+def test_random_id_follows_added_rows(tmp_path):
+    index = CorpusIndex(str(tmp_path))
+    for number in range(1, 21):
+        index.add(number, number - 1, nx.path_graph(number), float(number))
+    assert index.random_id(max_nodes=0) is None
+    assert {index.random_id(max_nodes=5) for _ in range(200)} == {1, 2, 3, 4, 5}
+    # Rows added after a pick are matched against the cached filters
+    index.add(21, 20, nx.path_graph(2), 21.0)
+    index.add(22, 21, nx.path_graph(9), 22.0)
+    assert {index.random_id(max_nodes=5) for _ in range(300)} == {1, 2, 3, 4, 5, 21}
+    assert {index.random_id(max_nodes=0) for _ in range(10)} == {None}
+    index.close()
+
+
+def test_seed_query_filters_only_the_seeds(tmp_path):
+    random.seed(0)
+    scheduler = RandomDiskScheduler(str(tmp_path), seed_query={'max_nodes': 3})
+    scheduler.add_to_corpus([nx.path_graph(number) for number in range(1, 11)])
+    assert {scheduler.pick_seed()[1].number_of_nodes() for _ in range(100)} == {1, 2, 3}
+    assert len({scheduler.get_graph().number_of_nodes() for _ in range(200)}) == 10
+    scheduler.close_current_file()
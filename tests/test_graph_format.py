@@ -0,0 +1,93 @@
+import pickle
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from Utils import GraphFormat
+from Utils.GraphOverlay import overlay_graph
+
+
+def shuffled_graph(graph_class, seed):
+    """A graph whose nodes and edges were added in random orders, with some edges removed and added again."""
+    random.seed(seed)
+    graph = graph_class()
+    nodes = list(range(30))
+    random.shuffle(nodes)
+    graph.add_nodes_from(nodes)
+    for _ in range(120):
+        u, v = random.randrange(30), random.randrange(30)
+        graph.add_edge(u, v, weight=random.randint(-50, 50))
+    for u, v in random.sample(list(graph.edges()), 20):
+        graph.remove_edge(u, v)
+        graph.add_edge(v, u, weight=random.randint(-50, 50))
+    return graph
+
+
+def typed_edges(graph):
+    return [(u, v, {key: (value, type(value)) for key, value in data.items()}) for u, v, data in graph.edges(data=True)]
+
+
+def assert_same_graph(graph, loaded):
+    assert type(loaded) is type(graph)
+    assert list(loaded.nodes) == list(graph.nodes)
+    for node in graph:
+        assert list(loaded.adj[node]) == list(graph.adj[node])
+        if graph.is_multigraph():
+            assert all(list(loaded.adj[node][v]) == list(keys) for v, keys in graph.adj[node].items())
+        if graph.is_directed():
+            assert list(loaded.pred[node]) == list(graph.pred[node])
+    assert typed_edges(loaded) == typed_edges(graph)
+    assert [type(node) for node in loaded] == [type(node) for node in graph]
+
+
+def round_trip(graph):
+    return pickle.loads(GraphFormat.dumps(graph, compress=True))
+
+
+def test_adjacency_order_is_kept():
+    graph = nx.Graph()
+    graph.add_nodes_from([0, 1, 2])
+    graph.add_edges_from([(1, 2), (0, 1)])
+    assert list(round_trip(graph).adj[1]) == [2, 0]
+
+
+@pytest.mark.parametrize("graph_class", [nx.Graph, nx.DiGraph, nx.MultiGraph, nx.MultiDiGraph])
+@pytest.mark.parametrize("seed", range(5))
+def test_round_trip_keeps_adjacency_order(graph_class, seed):
+    graph = shuffled_graph(graph_class, seed)
+    assert_same_graph(graph, round_trip(graph))
+
+
+def test_round_trip_of_overlay_keeps_adjacency_order():
+    graph = overlay_graph(shuffled_graph(nx.DiGraph, 0))
+    graph.add_edge(3, 4, weight=7)
+    assert_same_graph(graph, round_trip(graph))
+
+
+@pytest.mark.parametrize("graph", [
+    nx.Graph([(np.int64(0), np.int64(1))]),
+    nx.Graph([(0, 1, {'weight': np.int64(3)})]),
+    nx.Graph([(0, 1, {'weight': np.float64(0.5)})]),
+    nx.Graph([(0, 1, {'weight': True})]),
+])
+def test_numpy_scalars_keep_their_types(graph):
+    with pytest.raises(ValueError):
+        GraphFormat.dumps_graph(graph)
+    assert_same_graph(graph, round_trip(graph))
+
+
+def test_compact_record_is_used_for_plain_graphs():
+    graph = shuffled_graph(nx.DiGraph, 1)
+    assert GraphFormat.dumps_graph(graph).startswith(GraphFormat.MAGIC)
+
+
+def test_adjacency_no_edge_order_rebuilds_is_pickled():
+    graph = nx.Graph([(0, 1), (1, 2), (2, 0)])
+    # 0 lists 1 before 2, 1 lists 2 before 0 and 2 lists 0 before 1: no insertion order does that
+    graph._adj[1] = {2: graph._adj[1][2], 0: graph._adj[1][0]}
+    graph._adj[2] = {0: graph._adj[2][0], 1: graph._adj[2][1]}
+    with pytest.raises(ValueError):
+        GraphFormat.dumps_graph(graph)
+    assert_same_graph(graph, round_trip(graph))
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs main() in a fresh interpreter, since networkx is already imported in this one,
+# and checks the fuzzer it builds instead of running it
+CHECK_MAIN = textwrap.dedent("""
+    import sys
+
+    import main
+    from Feedback import Instrumentation
+
+    def check(fuzzer, output_mode):
+        assert Instrumentation.is_instrumented(sys.modules['networkx.classes.graph'])
+        from Utils import GraphFormat
+        nx = sys.modules[type(fuzzer).__module__].nx
+        assert GraphFormat.nx is nx
+        record = GraphFormat.dumps([nx.path_graph(3)])
+        assert GraphFormat.MAGIC in record
+        print("checked")
+
+    main.run_fuzzer = check
+    sys.argv = ["main.py"] + sys.argv[1:]
+    main.main()
+""")
+
+
+@pytest.mark.parametrize("flags", [["--coverage_backend", "instrument"], ["--feedback_check_type", "hitcount"]])
+def test_main_instruments_networkx_before_importing_it(flags, tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, "-c", CHECK_MAIN, "BCC", "--num_iterations", "1"] + flags,
+                            cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "checked" in result.stdout
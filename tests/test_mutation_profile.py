@@ -0,0 +1,68 @@
+import random
+
+import networkx as nx
+import pytest
+
+from Mutator.ExtendedMutator import ExtendedMutator
+from Mutator.MutationProfile import MutationProfile
+from Scheduler.RandomMemScheduler import RandomMemScheduler
+
+
+def test_added_edge_closing_negative_cycle_is_raised():
+    graph = nx.DiGraph()
+    nx.add_path(graph, [5, 7, 29], weight=-40)
+    graph.add_edge(7, 29, weight=-43)  # 5 -> 29 weighs -83
+    profile = MutationProfile(no_negative_cycles=True)
+    for weight in (-17, 17, None):
+        u, v, attr = profile.admit_edge(graph, 29, 5, {'weight': weight})
+        graph.add_edge(u, v, **attr)
+        assert not nx.negative_edge_cycle(graph)
+        assert graph[29][5]['weight'] == 83
+
+
+def test_reweighted_edge_keeps_no_negative_cycles():
+    graph = nx.DiGraph([(0, 1, {'weight': 3}), (1, 2, {'weight': -5}), (2, 0, {'weight': 4})])
+    profile = MutationProfile(no_negative_cycles=True)
+    u, v, attr = profile.admit_edge(graph, 2, 0, {'weight': -100})
+    graph.add_edge(u, v, **attr)
+    assert graph[2][0]['weight'] == 2
+    assert not nx.negative_edge_cycle(graph)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mutants_keep_no_negative_cycles(seed):
+    random.seed(seed)
+    graph = nx.gnp_random_graph(12, 0.3, seed=seed, directed=True)
+    for u, v in graph.edges():
+        graph[u][v]['weight'] = random.randint(-200, 200)
+    profile = MutationProfile(no_negative_cycles=True)
+    profile.conform(graph)
+    scheduler = RandomMemScheduler(start_time=0)
+    scheduler.add_to_corpus([graph.copy()])
+    mutator = ExtendedMutator(scheduler)
+    mutator.profile = profile
+    for _ in range(50):
+        graph = mutator.stacked_mutate(mutator.copy(graph))
+        assert not nx.negative_edge_cycle(graph)
+
+
+@pytest.mark.parametrize("graph_class", [nx.MultiGraph, nx.MultiDiGraph])
+def test_conform_breaks_negative_cycles_of_multigraphs(graph_class):
+    graph = graph_class()
+    graph.add_edge(0, 1, weight=5)
+    graph.add_edge(0, 1, weight=-7)
+    graph.add_edge(1, 2, weight=1)
+    graph.add_edge(2, 0, weight=2)
+    MutationProfile(no_negative_cycles=True).conform(graph)
+    assert graph.number_of_edges() == 4
+    assert sorted(weight for _, _, weight in graph.edges(data='weight')) == [1, 2, 5, 7]
+    if graph.is_directed():
+        assert not nx.negative_edge_cycle(graph)
+
+
+def test_conform_reweights_parallel_edges_in_place():
+    graph = nx.MultiDiGraph([(0, 1, {'weight': -3}), (0, 1, {'weight': 4}), (1, 0)])
+    MutationProfile(positive_weights=True).conform(graph)
+    assert graph.number_of_edges() == 3
+    assert all(weight > 0 for _, _, weight in graph.edges(data='weight'))
+    assert graph[0][1][0]['weight'] == 3
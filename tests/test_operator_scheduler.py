@@ -0,0 +1,48 @@
+import random
+from collections import Counter
+
+import networkx as nx
+
+from Mutator.ExtendedMutator import ExtendedMutator
+from Mutator.MutationProfile import MutationProfile
+from Mutator.OperatorScheduler import OperatorScheduler
+from Scheduler.RandomMemScheduler import RandomMemScheduler
+
+
+def test_batch_credits_every_mutant_its_own_stack():
+    random.seed(0)
+    graph = nx.gnp_random_graph(12, 0.3, seed=0, directed=True)
+    scheduler = RandomMemScheduler(start_time=0)
+    scheduler.add_to_corpus([graph.copy()])
+    mutator = ExtendedMutator(scheduler)
+    mutator.profile = MutationProfile(no_negative_cycles=True)  # Makes the batch fall back to stacked_mutate
+    mutator.operator_scheduler = operator_scheduler = OperatorScheduler()
+
+    mutants = mutator.stacked_mutate_batch(graph, 5)
+    assert len(mutants) == len(operator_scheduler.pending) == 5
+    stacks = list(operator_scheduler.pending)
+    found = [True, False, False, True, False]
+    for mutant_found in found:
+        operator_scheduler.record(1.0, mutant_found)
+
+    assert not operator_scheduler.pending
+    uses = Counter(name for names, _, _ in stacks for name in names)
+    assert {name: stats[0] for name, stats in operator_scheduler.operators.items() if stats[0]} == uses
+    depths = Counter(depth for _, depth, _ in stacks)
+    assert {depth: stats[0] for depth, stats in operator_scheduler.depths.items() if stats[0]} == depths
+    finds = Counter(depth for (_, depth, _), mutant_found in zip(stacks, found) if mutant_found)
+    assert {depth: stats[2] for depth, stats in operator_scheduler.depths.items() if stats[2]} == finds
+
+
+def test_dropped_batch_is_not_credited():
+    operator_scheduler = OperatorScheduler()
+    graph = nx.path_graph(4)
+    for _ in range(3):
+        operator_scheduler.stack(graph, [nx.Graph.copy])
+    first_names, first_depth, _ = operator_scheduler.pending[0]
+    operator_scheduler.record(1.0, True)
+    operator_scheduler.drop_pending()
+    operator_scheduler.record(1.0, True)  # Nothing left to credit
+    assert operator_scheduler.operators["copy"][0] == len(first_names)
+    assert sum(stats[0] for stats in operator_scheduler.depths.values()) == 1
+    assert operator_scheduler.depths[first_depth][0] == 1
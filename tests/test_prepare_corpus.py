@@ -0,0 +1,98 @@
+import importlib
+import random
+
+import networkx as nx
+import pytest
+
+from Scheduler.RandomMemScheduler import RandomMemScheduler
+from Utils.CompactGraph import CompactGraph
+from Utils.GraphOverlay import overlay_graph
+
+FUZZERS = ["AdamicAdar", "BCC", "HarmonicCentrality", "JaccardSimilarity", "MAXFV", "MaxMatching", "MST", "SCC",
+           "STPL"]
+
+
+def make_fuzzer(name, use_multiple_graphs):
+    fuzzer_class = getattr(importlib.import_module(f"Fuzzer.{name}Fuzzer"), f"{name}Fuzzer")
+    return fuzzer_class(num_iterations=1, use_multiple_graphs=use_multiple_graphs, feedback_check_type="regular",
+                        scheduler=RandomMemScheduler(start_time=0))
+
+
+@pytest.mark.parametrize("use_multiple_graphs", [False, True])
+@pytest.mark.parametrize("name", FUZZERS)
+def test_prepare_corpus(name, use_multiple_graphs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The fuzzer writes its .coveragerc to the working directory
+    fuzzer = make_fuzzer(name, use_multiple_graphs)
+    graphs = fuzzer.prepare_corpus()
+    assert graphs and all(isinstance(graph, nx.Graph) for graph in graphs)
+    corpus = [graph for _, graph, _ in fuzzer.scheduler.iterate_graphs()]
+    assert len(corpus) == len(graphs)
+    assert all(isinstance(graph, nx.Graph) for graph in corpus)
+
+
+def test_compact_corpus_keeps_graphs_a_compact_graph_cannot_hold(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fuzzer = make_fuzzer("BCC", False)
+    fuzzer.compact_graphs = True
+    colored = nx.path_graph(4)
+    nx.set_edge_attributes(colored, "red", "color")  # Only 'weight' fits in a CompactGraph
+    monkeypatch.setattr(fuzzer, "create_initial_graphs", lambda: [colored, nx.cycle_graph(5)])
+    fuzzer.prepare_corpus()
+    corpus = [graph for _, graph, _ in fuzzer.scheduler.iterate_graphs()]
+    assert corpus[0] is colored
+    assert isinstance(corpus[1], CompactGraph)
+    assert fuzzer.compact_fallbacks == 1
+
+    mutator = fuzzer.new_mutator(fuzzer.scheduler)
+    random.seed(0)
+    for batch in (1, 4):
+        fuzzer.mutation_batch = batch
+        for graph in corpus:
+            for _ in range(20):
+                assert isinstance(fuzzer.materialize(fuzzer.next_mutant(mutator, graph, [])), nx.Graph)
+
+
+def test_stpl_weights_set_by_the_tester_stay_on_the_graph(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fuzzer = make_fuzzer("STPL", False)
+    parent = overlay_graph(nx.DiGraph([(0, 1, {'weight': 4}), (1, 2), (2, 3)]))
+    graph = parent.share()
+    try:
+        fuzzer.process_test_results_with_timeout(graph, fuzzer.get_tester(), {}, {}, 0)
+    finally:
+        fuzzer.stop_sandbox()
+    assert [weight for _, _, weight in graph.edges(data='weight')] == [4, 1, 1]
+    assert [weight for _, _, weight in parent.edges(data='weight')] == [4, None, None]
+
+
+def test_stpl_weights_set_by_the_tester_stay_on_the_compact_mutant(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fuzzer = make_fuzzer("STPL", False)
+    fuzzer.compact_graphs = True
+    mutant = fuzzer.corpus_graph(nx.DiGraph([(0, 1, {'weight': 4}), (1, 2), (2, 3)]))
+    mutated_graph = fuzzer.materialize(mutant)
+    try:
+        fuzzer.process_test_results_with_timeout(mutated_graph, fuzzer.get_tester(), {}, {}, 0)
+    finally:
+        fuzzer.stop_sandbox()
+    kept = fuzzer.tested_mutant(mutant, mutated_graph)
+    assert isinstance(kept, CompactGraph)
+    assert [weight for _, _, weight in kept.to_networkx().edges(data='weight')] == [4, 1, 1]
+
+
+@pytest.mark.parametrize("edges, weights", [
+    ([(0, 1), (1, 2), (2, 3)], [1, 1, 1]),
+    ([(0, 1, {'weight': 2.5}), (1, 2, {'weight': float('nan')})], [2.5, 0]),
+])
+def test_mst_weights_set_by_the_tester_stay_on_the_graph(edges, weights, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fuzzer = make_fuzzer("MST", False)
+    parent = overlay_graph(nx.Graph(edges))
+    parent_weights = [weight for _, _, weight in parent.edges(data='weight')]
+    graph = parent.share()
+    try:
+        fuzzer.process_test_results_with_timeout(graph, fuzzer.get_tester(), {}, {}, 0)
+    finally:
+        fuzzer.stop_sandbox()
+    assert [weight for _, _, weight in graph.edges(data='weight')] == weights
+    assert [weight for _, _, weight in parent.edges(data='weight')] == pytest.approx(parent_weights, nan_ok=True)
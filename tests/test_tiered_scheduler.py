@@ -0,0 +1,27 @@
+import os
+
+import networkx as nx
+
+from Scheduler.TieredScheduler import TieredScheduler
+
+
+def test_forked_workers_spill_to_their_own_records(tmp_path):
+    scheduler = TieredScheduler(str(tmp_path), mem_mb=0)
+    scheduler.add_to_corpus(nx.path_graph(3))
+    scheduler.store_fd()  # Opened before the fork, so the workers share the file description
+    pids = []
+    for worker in range(8):
+        pid = os.fork()
+        if pid == 0:
+            ok = True
+            try:
+                # Every graph but the last one added is spilled at once
+                scheduler.add_to_corpus([nx.Graph([(0, 1)], name=(worker, i)) for i in range(1000)])
+                ok = all(scheduler.read_record(number).graph['name'] == (worker, number - 2)
+                         for number in range(2, scheduler.graph_counter))
+            except Exception:
+                ok = False
+            os._exit(0 if ok else 1)
+        pids.append(pid)
+    assert all(os.waitpid(pid, 0)[1] == 0 for pid in pids)
+    scheduler.close_current_file()